@@ -54,6 +54,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'webhooks.middleware.AccountMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -114,6 +115,14 @@ DATABASES = {
 }
 
 
+# Cache
+# Use a Redis URL (e.g. redis://localhost:6379/1) so cached token lookups
+# are shared between workers and can be invalidated.
+CACHES = {
+    'default': env.cache_url('CACHE_URL', default='locmemcache://'),
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -160,12 +169,21 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Django REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'webhooks.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'webhooks.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'webhooks.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
@@ -194,6 +212,25 @@ CELERY_TASK_TIME_LIMIT = 30 * 60  # 30 minutes
 CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
 
 
+# API token authentication: lookups are cached in the Django cache (only
+# when it is shared, i.e. CACHE_URL is set) and, briefly, in process
+# memory (revocations reach other processes within
+# TOKEN_LOCAL_CACHE_TIMEOUT). Tokens expire after TOKEN_EXPIRATION_HOURS
+# (0 keeps them until logout).
+TOKEN_CACHE_TIMEOUT = env.int('TOKEN_CACHE_TIMEOUT', default=60)  # seconds
+TOKEN_LOCAL_CACHE_TIMEOUT = env.int('TOKEN_LOCAL_CACHE_TIMEOUT', default=5)  # seconds
+TOKEN_EXPIRATION_HOURS = env.int('TOKEN_EXPIRATION_HOURS', default=0)
+
+
+# Seconds a user's resolved account (request.account) is cached
+ACCOUNT_CACHE_TIMEOUT = env.int('ACCOUNT_CACHE_TIMEOUT', default=5 * 60)
+
+
+# JSON backend for API responses, request bodies and Celery messages:
+# 'auto' uses orjson when installed, 'json' forces the standard library
+JSON_BACKEND = env('JSON_BACKEND', default='auto')
+
+
 # Webhook Settings
 DEFAULT_WEBHOOK_TIMEOUT = env.int('DEFAULT_WEBHOOK_TIMEOUT', default=30)
 MAX_RETRY_ATTEMPTS = env.int('MAX_RETRY_ATTEMPTS', default=3)
@@ -55,6 +55,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'webhooks.middleware.AccountMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'url_shortener.middleware.MultiDomainMiddleware',
@@ -119,6 +120,14 @@ DATABASES = {
 }
 
 
+# Cache
+# Use a Redis URL in production (e.g. redis://localhost:6379/1) so the
+# redirect cache is shared between workers.
+CACHES = {
+    'default': env.cache_url('CACHE_URL', default='locmemcache://'),
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -165,12 +174,21 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Django REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'webhooks.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'webhooks.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'webhooks.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
@@ -198,6 +216,49 @@ CELERY_TASK_TRACK_STARTED = True
 CELERY_TASK_TIME_LIMIT = 30 * 60  # 30 minutes
 CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
 
+# Built-in periodic tasks (synced into django_celery_beat on startup)
+CELERY_BEAT_SCHEDULE = {
+    'export-nginx-redirect-maps': {
+        'task': 'url_shortener.tasks.export_nginx_redirect_maps',
+        'schedule': 300.0,
+    },
+    'deactivate-expired-short-urls': {
+        'task': 'url_shortener.tasks.deactivate_expired_short_urls',
+        'schedule': 60.0,
+    },
+    'check-short-url-health': {
+        'task': 'url_shortener.tasks.check_short_url_health',
+        'schedule': 900.0,
+    },
+    'maintain-click-partitions': {
+        'task': 'url_shortener.tasks.maintain_click_partitions',
+        'schedule': 6 * 60 * 60.0,
+    },
+    'check-slack-tokens': {
+        'task': 'slack_integration.tasks.check_slack_tokens',
+        'schedule': 6 * 60 * 60.0,
+    },
+}
+
+
+# API token authentication: lookups are cached in the Django cache (only
+# when it is shared, i.e. CACHE_URL is set) and, briefly, in process
+# memory (revocations reach other processes within
+# TOKEN_LOCAL_CACHE_TIMEOUT). Tokens expire after TOKEN_EXPIRATION_HOURS
+# (0 keeps them until logout).
+TOKEN_CACHE_TIMEOUT = env.int('TOKEN_CACHE_TIMEOUT', default=60)  # seconds
+TOKEN_LOCAL_CACHE_TIMEOUT = env.int('TOKEN_LOCAL_CACHE_TIMEOUT', default=5)  # seconds
+TOKEN_EXPIRATION_HOURS = env.int('TOKEN_EXPIRATION_HOURS', default=0)
+
+
+# Seconds a user's resolved account (request.account) is cached
+ACCOUNT_CACHE_TIMEOUT = env.int('ACCOUNT_CACHE_TIMEOUT', default=5 * 60)
+
+
+# JSON backend for API responses, request bodies and Celery messages:
+# 'auto' uses orjson when installed, 'json' forces the standard library
+JSON_BACKEND = env('JSON_BACKEND', default='auto')
+
 
 # Webhook Settings
 DEFAULT_WEBHOOK_TIMEOUT = env.int('DEFAULT_WEBHOOK_TIMEOUT', default=30)
@@ -208,10 +269,86 @@ MAX_RETRY_ATTEMPTS = env.int('MAX_RETRY_ATTEMPTS', default=3)
 SLACK_CLIENT_ID = env('SLACK_CLIENT_ID', default='')
 SLACK_CLIENT_SECRET = env('SLACK_CLIENT_SECRET', default='')
 SLACK_REDIRECT_URI = env('SLACK_REDIRECT_URI', default='https://slack.onsync.ai/oauth/callback')
+SLACK_SIGNING_SECRET = env('SLACK_SIGNING_SECRET', default='')  # Verifies slash command requests
+SLACK_ASYNC_OAUTH_CALLBACK = env.bool('SLACK_ASYNC_OAUTH_CALLBACK', default=False)  # Set when served by config.asgi
+
+# Slack API rate limits are tracked per workspace and method tier in Redis
+# (disabled without it; 429s are still honoured). Calls queue for up to
+# SLACK_RATE_LIMIT_MAX_WAIT seconds before giving up with SlackRateLimited.
+SLACK_RATE_LIMIT_REDIS_URL = env('SLACK_RATE_LIMIT_REDIS_URL', default=env('REDIS_URL', default=''))
+SLACK_RATE_LIMIT_TIMEOUT = env.float('SLACK_RATE_LIMIT_TIMEOUT', default=0.5)  # seconds
+SLACK_RATE_LIMIT_MAX_WAIT = env.float('SLACK_RATE_LIMIT_MAX_WAIT', default=30.0)
+
+# Webhook failures are posted to the account's Slack alert channel as one
+# digest per target host, covering the window (seconds) opened by the
+# first failure. A digest repeating an earlier one for the same host is
+# suppressed for SLACK_FAILURE_DIGEST_SUPPRESS seconds. Failures are counted
+# in the Django cache, so digests need a shared one (CACHE_URL).
+SLACK_FAILURE_DIGEST_WINDOW = env.int('SLACK_FAILURE_DIGEST_WINDOW', default=300)
+SLACK_FAILURE_DIGEST_SUPPRESS = env.int('SLACK_FAILURE_DIGEST_SUPPRESS', default=60 * 60)
+
+# Seconds the /cronhook webhook name index is cached per account
+SLACK_COMMAND_INDEX_TIMEOUT = env.int('SLACK_COMMAND_INDEX_TIMEOUT', default=15 * 60)
+
+# Concurrent auth.test calls in the periodic token sweep
+SLACK_TOKEN_CHECK_CONCURRENCY = env.int('SLACK_TOKEN_CHECK_CONCURRENCY', default=10)
 
 
 ALLOWED_SHORT_URL_DOMAINS = [
     'pay.ao.com',
     'pay.aollc.com',
     # Add other client domains
-]
\ No newline at end of file
+]
+
+# Redirect cache (used only with a shared cache, i.e. CACHE_URL) and click handling
+SHORT_URL_CACHE_TIMEOUT = env.int('SHORT_URL_CACHE_TIMEOUT', default=300)
+SHORT_URL_MISSING_CACHE_TIMEOUT = env.int('SHORT_URL_MISSING_CACHE_TIMEOUT', default=30)
+SHORT_URL_CLICK_TASKS = env.bool('SHORT_URL_CLICK_TASKS', default=True)  # Record clicks in Celery
+SHORT_URL_ASYNC_REDIRECT = env.bool('SHORT_URL_ASYNC_REDIRECT', default=False)  # Set when served by config.asgi
+
+# Expired short URLs are deactivated in chunks of this size
+SHORT_URL_EXPIRY_SWEEP_BATCH_SIZE = env.int('SHORT_URL_EXPIRY_SWEEP_BATCH_SIZE', default=1000)
+
+# nginx redirect maps (see nginx/shorturl.conf). Leave the directory empty
+# to disable the export; the reload command runs after maps change.
+SHORT_URL_NGINX_MAP_DIR = env('SHORT_URL_NGINX_MAP_DIR', default='')
+SHORT_URL_NGINX_RELOAD_COMMAND = env('SHORT_URL_NGINX_RELOAD_COMMAND', default='sudo -n nginx -s reload')
+SHORT_URL_NGINX_MAP_EXPIRY_MARGIN = env.int('SHORT_URL_NGINX_MAP_EXPIRY_MARGIN', default=600)  # seconds
+
+# Destination health checks: links are re-checked after the interval
+# (seconds), with bounded concurrency overall and per destination host.
+SHORT_URL_HEALTH_CHECK_INTERVAL = env.int('SHORT_URL_HEALTH_CHECK_INTERVAL', default=6 * 60 * 60)
+SHORT_URL_HEALTH_CHECK_BATCH_SIZE = env.int('SHORT_URL_HEALTH_CHECK_BATCH_SIZE', default=1000)
+SHORT_URL_HEALTH_CHECK_CONCURRENCY = env.int('SHORT_URL_HEALTH_CHECK_CONCURRENCY', default=100)
+SHORT_URL_HEALTH_CHECK_PER_HOST = env.int('SHORT_URL_HEALTH_CHECK_PER_HOST', default=8)
+SHORT_URL_HEALTH_CHECK_TIMEOUT = env.float('SHORT_URL_HEALTH_CHECK_TIMEOUT', default=10.0)
+
+# CSV of start_ip,end_ip,country ranges (e.g. DB-IP "IP to Country Lite")
+# for geo-targeted redirects and click countries. Loaded into memory per
+# process; leave empty to fall back to GeoIP2 for click countries only.
+SHORT_URL_GEOIP_RANGES_FILE = env('SHORT_URL_GEOIP_RANGES_FILE', default='')
+
+# Redirect rate limiting: clicks beyond these budgets (hits per sliding
+# window, per client IP and per link; 0 disables) are redirected but not
+# recorded. Budgets can be overridden per domain. Disabled without Redis.
+SHORT_URL_RATE_LIMIT_REDIS_URL = env('SHORT_URL_RATE_LIMIT_REDIS_URL', default=env('REDIS_URL', default=''))
+SHORT_URL_RATE_LIMIT_TIMEOUT = env.float('SHORT_URL_RATE_LIMIT_TIMEOUT', default=0.1)  # seconds
+SHORT_URL_RATE_LIMIT = {
+    'window': env.int('SHORT_URL_RATE_LIMIT_WINDOW', default=60),
+    'ip': env.int('SHORT_URL_RATE_LIMIT_PER_IP', default=60),
+    'link': env.int('SHORT_URL_RATE_LIMIT_PER_LINK', default=6000),
+}
+SHORT_URL_RATE_LIMIT_DOMAINS = {
+    # 'pay.ao.com': {'ip': 30},
+}
+
+# Raw click analytics are partitioned by month on PostgreSQL. Partitions
+# are created this many months ahead. Retention is the number of full
+# months kept before the current one (0 keeps everything); older
+# partitions are dropped. Rollups are not affected.
+SHORT_URL_CLICK_PARTITIONS_AHEAD = env.int('SHORT_URL_CLICK_PARTITIONS_AHEAD', default=3)
+SHORT_URL_CLICK_RETENTION_MONTHS = env.int('SHORT_URL_CLICK_RETENTION_MONTHS', default=0)
+
+# Key for the short code permutation. Changing it reshuffles future codes;
+# existing codes stay valid and any clash is skipped on allocation.
+SHORT_CODE_SECRET = env('SHORT_CODE_SECRET', default=SECRET_KEY)
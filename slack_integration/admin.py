@@ -15,10 +15,12 @@ class SlackAccountAdmin(admin.ModelAdmin):
         'workspace_url',
         'client_account',
         'onsync_bot_user_id',
+        'token_status',
         'created_at',
     ]
     
     list_filter = [
+        'token_status',
         'created_at',
         'client_account',
     ]
@@ -31,6 +33,9 @@ class SlackAccountAdmin(admin.ModelAdmin):
     
     readonly_fields = [
         'workspace_id',
+        'token_status',
+        'token_error',
+        'token_checked_at',
         'created_at',
         'updated_at',
     ]
@@ -40,7 +45,10 @@ class SlackAccountAdmin(admin.ModelAdmin):
             'fields': ('workspace_id', 'workspace_name', 'workspace_url')
         }),
         ('Bot Configuration', {
-            'fields': ('slack_access_token', 'onsync_bot_user_id')
+            'fields': ('slack_access_token', 'onsync_bot_user_id', 'alert_channel')
+        }),
+        ('Token Status', {
+            'fields': ('token_status', 'token_error', 'token_checked_at')
         }),
         ('Account Association', {
             'fields': ('client_account',)
@@ -55,4 +63,4 @@ class SlackAccountAdmin(admin.ModelAdmin):
         """Make workspace_id readonly only when editing existing object."""
         if obj:  # Editing existing object
             return self.readonly_fields
-        return ['created_at', 'updated_at']  # Creating new object
+        return ['token_status', 'token_error', 'token_checked_at', 'created_at', 'updated_at']  # Creating new object
@@ -0,0 +1,144 @@
+"""
+Webhook failure digests for Slack.
+
+Failed webhook executions are counted in the Django cache per account and
+target host. The first failure opens a window and schedules one digest
+task for when it closes; later failures in the window only bump a counter
+(and keep a few samples), so an outage producing thousands of failures a
+minute costs a few cache operations each and one Slack message per
+host per window.
+
+A digest with the same host and reasons as one already sent is
+suppressed for a while, so a host that stays down is reported once.
+
+The failing executions and the digest task run in different worker
+processes, so this needs a shared cache (CACHE_URL); with the default
+local memory cache, failures are not recorded.
+"""
+import hashlib
+import logging
+import time
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.cache import cache
+
+from webhooks.caching import cache_is_shared
+
+logger = logging.getLogger('slack_integration')
+
+KEY_PREFIX = 'slack:failures'
+
+# Failures kept per window to show in the digest
+DIGEST_SAMPLE_SIZE = 5
+
+_warned_unshared = False
+
+
+def failure_host(url):
+    return urlsplit(url).hostname or url
+
+
+def _window_key(account_id, host, window_id):
+    return f'{KEY_PREFIX}:{account_id}:{host}:{window_id}'
+
+
+def _open_window(account_id, host, now):
+    """
+    Window id for a failure, and whether this failure opened the window.
+    """
+    open_key = f'{KEY_PREFIX}:open:{account_id}:{host}'
+    window = settings.SLACK_FAILURE_DIGEST_WINDOW
+    for _ in range(2):
+        if cache.add(open_key, int(now), window):
+            return int(now), True
+        window_id = cache.get(open_key)
+        # Otherwise it expired between the two calls; try opening again
+        if window_id is not None:
+            return window_id, False
+    return int(now), False
+
+
+def record_webhook_failure(account_id, url, webhook_name, reason, now=None):
+    """
+    Count a failed webhook execution towards its account's next digest.
+    """
+    global _warned_unshared
+    from .tasks import send_webhook_failure_digest
+    
+    if not cache_is_shared():
+        if not _warned_unshared:
+            logger.warning("⚠️  Slack failure digests need a shared cache (set CACHE_URL); not recording webhook failures")
+            _warned_unshared = True
+        return
+    
+    host = failure_host(url)
+    now = time.time() if now is None else now
+    window = settings.SLACK_FAILURE_DIGEST_WINDOW
+    try:
+        window_id, opened = _open_window(account_id, host, now)
+        key = _window_key(account_id, host, window_id)
+        # Counters outlive the window so the digest task can still read them
+        cache.add(f'{key}:count', 0, window * 2)
+        count = cache.incr(f'{key}:count')
+        if count <= DIGEST_SAMPLE_SIZE:
+            cache.set(f'{key}:sample:{count}', {'name': webhook_name, 'reason': reason}, window * 2)
+    except Exception as e:
+        logger.warning(f"⚠️  Could not record webhook failure for account {account_id}: {str(e)}")
+        return
+    
+    if opened:
+        try:
+            send_webhook_failure_digest.apply_async(args=[account_id, host, window_id], countdown=window)
+        except Exception as e:
+            logger.warning(f"⚠️  Could not schedule failure digest for account {account_id}: {str(e)}")
+
+
+def collect_digest(account_id, host, window_id):
+    """
+    Failure count and samples for a window, or None if it saw no failures.
+    """
+    key = _window_key(account_id, host, window_id)
+    count = cache.get(f'{key}:count')
+    if not count:
+        return None
+    
+    sample_keys = [f'{key}:sample:{n}' for n in range(1, min(count, DIGEST_SAMPLE_SIZE) + 1)]
+    samples = cache.get_many(sample_keys)
+    return {
+        'host': host,
+        'count': count,
+        'samples': [samples[k] for k in sample_keys if k in samples],
+    }
+
+
+def digest_fingerprint(account_id, digest):
+    """Identifies repeats of the same failure for the same host"""
+    reasons = sorted({sample['reason'] for sample in digest['samples']})
+    raw = '\n'.join([str(account_id), digest['host'], *reasons])
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def format_digest(digest):
+    """Slack message text for a digest"""
+    minutes = max(1, round(settings.SLACK_FAILURE_DIGEST_WINDOW / 60))
+    count = digest['count']
+    noun = 'execution' if count == 1 else 'executions'
+    lines = [f":warning: {count} webhook {noun} to *{digest['host']}* failed in the last {minutes} min"]
+    for sample in digest['samples']:
+        lines.append(f"• {sample['name']}: {sample['reason']}")
+    if count > len(digest['samples']):
+        lines.append(f"…and {count - len(digest['samples'])} more")
+    return '\n'.join(lines)
+
+
+def is_suppressed(account_id, digest):
+    return cache.get(f"{KEY_PREFIX}:sent:{digest_fingerprint(account_id, digest)}") is not None
+
+
+def mark_sent(account_id, digest):
+    cache.set(
+        f"{KEY_PREFIX}:sent:{digest_fingerprint(account_id, digest)}",
+        1,
+        settings.SLACK_FAILURE_DIGEST_SUPPRESS,
+    )
@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class SlackIntegrationConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'slack_integration'
+
+    def ready(self):
+        from django.db.models.signals import post_delete, post_save
+        from webhooks.models import Webhook
+        from .commands import webhook_deleted, webhook_saved
+        
+        # Keep the slash command's webhook name index fresh
+        post_save.connect(webhook_saved, sender=Webhook, dispatch_uid='slack_webhook_name_index_save')
+        post_delete.connect(webhook_deleted, sender=Webhook, dispatch_uid='slack_webhook_name_index_delete')
@@ -0,0 +1,168 @@
+"""
+Shared HTTP clients for the Slack Web API.
+
+One pooled requests session per process (keep-alive to slack.com instead
+of a new TLS handshake per call), and one httpx client per event loop for
+async views served by config.asgi.
+
+Calls made with a workspace's token go through SlackClient, which waits
+its turn in the workspace's rate limit bucket and honours Retry-After.
+"""
+import asyncio
+import logging
+import threading
+import time
+
+import httpx
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+from . import ratelimit
+from .ratelimit import SlackRateLimited
+
+logger = logging.getLogger('slack_integration')
+
+SLACK_API_URL = 'https://slack.com/api/'
+
+# Seconds to wait for Slack (connect and read)
+SLACK_API_TIMEOUT = 10
+
+# Keep-alive connections kept open to slack.com per process
+SLACK_POOL_SIZE = 20
+
+_session = None
+_session_lock = threading.Lock()
+_async_client = None
+_async_client_loop = None
+
+
+def get_session():
+    """Pooled requests session shared by views and tasks"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=SLACK_POOL_SIZE)
+                session.mount('https://', adapter)
+                _session = session
+    return _session
+
+
+def get_async_client():
+    """Pooled httpx client bound to the running event loop"""
+    global _async_client, _async_client_loop
+    loop = asyncio.get_running_loop()
+    if _async_client is None or _async_client_loop is not loop:
+        _async_client = httpx.AsyncClient(
+            base_url=SLACK_API_URL,
+            timeout=SLACK_API_TIMEOUT,
+            limits=httpx.Limits(max_connections=SLACK_POOL_SIZE, max_keepalive_connections=SLACK_POOL_SIZE),
+        )
+        _async_client_loop = loop
+    return _async_client
+
+
+def slack_api_call(method, token=None, data=None, params=None, http_method='POST'):
+    """
+    Call a Slack Web API method and return the decoded JSON body.
+    Raises requests.RequestException on network errors.
+    """
+    headers = {'Authorization': f'Bearer {token}'} if token else {}
+    response = get_session().request(
+        http_method,
+        SLACK_API_URL + method,
+        data=data,
+        params=params,
+        headers=headers,
+        timeout=SLACK_API_TIMEOUT,
+    )
+    return response.json()
+
+
+async def aslack_api_call(method, token=None, data=None, params=None, http_method='POST'):
+    """
+    Async counterpart of slack_api_call.
+    Raises httpx.HTTPError on network errors.
+    """
+    headers = {'Authorization': f'Bearer {token}'} if token else {}
+    response = await get_async_client().request(
+        http_method,
+        method,
+        data=data,
+        params=params,
+        headers=headers,
+    )
+    return response.json()
+
+
+class SlackClient:
+    """
+    Slack Web API client for one workspace.
+    
+    Calls queue in the workspace's rate limit bucket for up to max_wait
+    seconds and are retried after a 429 once Retry-After has passed;
+    SlackRateLimited is raised when that would take longer, so Celery
+    tasks can retry later instead of holding a worker.
+    """
+    
+    def __init__(self, workspace_id, token, max_wait=None, max_attempts=3):
+        self.workspace_id = workspace_id
+        self.token = token
+        self.max_wait = settings.SLACK_RATE_LIMIT_MAX_WAIT if max_wait is None else max_wait
+        self.max_attempts = max_attempts
+    
+    @classmethod
+    def for_account(cls, slack_account, **kwargs):
+        return cls(slack_account.workspace_id, slack_account.slack_access_token, **kwargs)
+    
+    def api_call(self, method, data=None, params=None, http_method='POST'):
+        """
+        Call a Slack Web API method and return the decoded JSON body.
+        Raises SlackRateLimited or requests.RequestException.
+        """
+        retry_after = 0
+        for _ in range(self.max_attempts):
+            wait = ratelimit.reserve(self.workspace_id, method, self.max_wait)
+            if wait:
+                time.sleep(wait)
+            
+            response = get_session().request(
+                http_method,
+                SLACK_API_URL + method,
+                data=data,
+                params=params,
+                headers={'Authorization': f'Bearer {self.token}'},
+                timeout=SLACK_API_TIMEOUT,
+            )
+            if response.status_code != 429:
+                return response.json()
+            
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            logger.warning(f"⚠️  Slack rate limited {method} for {self.workspace_id}, retry after {retry_after}s")
+            ratelimit.block(self.workspace_id, method, retry_after)
+            if retry_after > self.max_wait:
+                break
+            # Without Redis the block above is a no-op
+            if not settings.SLACK_RATE_LIMIT_REDIS_URL:
+                time.sleep(retry_after)
+        
+        raise SlackRateLimited(retry_after)
+
+
+def parse_retry_after(value, default=1):
+    """Seconds from a Retry-After header (Slack sends whole seconds)"""
+    try:
+        return max(int(value), 0)
+    except (TypeError, ValueError):
+        return default
+
+
+def reset_clients():
+    """Drop the shared clients (e.g. in tests)"""
+    global _session, _async_client, _async_client_loop
+    with _session_lock:
+        _session = None
+        _async_client = None
+        _async_client_loop = None
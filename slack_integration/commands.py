@@ -0,0 +1,152 @@
+"""
+The /cronhook slash command.
+
+Slack wants an answer within 3 seconds, so the command endpoint only
+verifies the request signature, resolves the webhook by name and
+acknowledges; runs happen in Celery and report back via response_url.
+
+Names resolve through a per-account index (name -> webhook id) kept in
+the Django cache, so a command costs no scan over webhook names. The
+index is dropped when a webhook is saved or deleted, and hits are
+confirmed by primary key, so a stale entry can't reach a webhook that
+has moved to another account.
+"""
+import hashlib
+import hmac
+import logging
+import time
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.cache import cache
+
+from webhooks.models import Webhook
+
+logger = logging.getLogger('slack_integration')
+
+# Requests older than this (seconds) are rejected as possible replays
+SIGNATURE_MAX_AGE = 5 * 60
+
+# Webhook fields the name index depends on
+INDEXED_FIELDS = {'name', 'account'}
+
+# response_url must point here
+RESPONSE_URL_HOSTS = {'hooks.slack.com'}
+
+USAGE = 'Usage: `/cronhook run <webhook name>` or `/cronhook status <webhook name>`'
+
+
+def verify_signature(body, timestamp, signature, secret=None, now=None):
+    """
+    Check Slack's v0 request signature (X-Slack-Signature) over the raw
+    body and X-Slack-Request-Timestamp.
+    """
+    secret = settings.SLACK_SIGNING_SECRET if secret is None else secret
+    if not secret or not timestamp or not signature:
+        return False
+    try:
+        timestamp_value = int(timestamp)
+    except ValueError:
+        return False
+    now = time.time() if now is None else now
+    if abs(now - timestamp_value) > SIGNATURE_MAX_AGE:
+        return False
+    
+    base = b'v0:' + timestamp.encode('ascii') + b':' + body
+    expected = 'v0=' + hmac.new(secret.encode('utf-8'), base, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+
+def parse_command(text):
+    """Split '/cronhook <action> <name>' text into (action, name)"""
+    action, _, name = (text or '').strip().partition(' ')
+    return action.lower(), name.strip()
+
+
+def is_slack_response_url(url):
+    parts = urlsplit(url or '')
+    return parts.scheme == 'https' and parts.hostname in RESPONSE_URL_HOSTS
+
+
+def name_index_key(account_id):
+    return f'slack:webhook-names:{account_id}'
+
+
+def build_name_index(account_id):
+    """
+    Map of case-folded webhook name to id for an account.
+    Names shared by several webhooks map to None.
+    """
+    index = {}
+    for webhook_id, name in Webhook.objects.filter(account_id=account_id).values_list('id', 'name'):
+        key = name.casefold()
+        index[key] = None if key in index else webhook_id
+    return index
+
+
+def get_name_index(account_id):
+    key = name_index_key(account_id)
+    try:
+        index = cache.get(key)
+    except Exception as e:
+        logger.warning(f"⚠️  Webhook name index cache unavailable: {str(e)}")
+        return build_name_index(account_id)
+    
+    if index is None:
+        index = build_name_index(account_id)
+        try:
+            cache.set(key, index, settings.SLACK_COMMAND_INDEX_TIMEOUT)
+        except Exception as e:
+            logger.warning(f"⚠️  Could not cache webhook name index: {str(e)}")
+    return index
+
+
+def resolve_webhook(account_id, name):
+    """
+    Look up a webhook by name in an account.
+    Returns the Webhook (id, name, is_active only), None if the name is
+    ambiguous, or raises Webhook.DoesNotExist.
+    """
+    index = get_name_index(account_id)
+    key = name.casefold()
+    if key not in index:
+        raise Webhook.DoesNotExist(name)
+    if index[key] is None:
+        return None
+    webhook_id = index[key]
+    return Webhook.objects.only('id', 'name', 'is_active').get(pk=webhook_id, account_id=account_id)
+
+
+def invalidate_name_index(account_ids):
+    keys = [name_index_key(account_id) for account_id in account_ids if account_id]
+    if not keys:
+        return
+    try:
+        cache.delete_many(keys)
+    except Exception as e:
+        logger.warning(f"⚠️  Webhook name index invalidation failed: {str(e)}")
+
+
+def webhook_saved(sender, instance, created=False, update_fields=None, **kwargs):
+    """post_save handler: drop the account's index when names may change"""
+    if update_fields is not None and not INDEXED_FIELDS.intersection(update_fields):
+        return
+    invalidate_name_index({instance.account_id})
+
+
+def webhook_deleted(sender, instance, **kwargs):
+    """post_delete handler"""
+    invalidate_name_index({instance.account_id})
+
+
+def format_result(name, result):
+    """Slack message for the outcome of a run"""
+    if not result:
+        return f":x: *{name}* did not complete. Check its execution history for details."
+    status = result['status']
+    code = result.get('response_code')
+    if status == 'success':
+        return f":white_check_mark: *{name}* ran successfully (HTTP {code})."
+    if status == 'retrying':
+        return f":warning: *{name}* failed with HTTP {code} on attempt {result['attempt']}; retrying."
+    return f":x: *{name}* failed with HTTP {code}."
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('slack_integration', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RenameIndex(
+            model_name='slackaccount',
+            new_name='slack_accou_client__3d600b_idx',
+            old_name='slack_accou_client__idx',
+        ),
+        migrations.RenameIndex(
+            model_name='slackaccount',
+            new_name='slack_accou_workspa_fed303_idx',
+            old_name='slack_accou_workspa_idx',
+        ),
+        migrations.AddField(
+            model_name='slackaccount',
+            name='alert_channel',
+            field=models.CharField(blank=True, default='', help_text='Channel ID for webhook failure digests (empty to disable)', max_length=255),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('slack_integration', '0002_slackaccount_alert_channel'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='slackaccount',
+            name='token_checked_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='slackaccount',
+            name='token_error',
+            field=models.CharField(blank=True, help_text='Slack error from the last check', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='slackaccount',
+            name='token_status',
+            field=models.CharField(choices=[('unknown', 'Unknown'), ('valid', 'Valid'), ('invalid', 'Invalid')], default='unknown', max_length=10),
+        ),
+    ]
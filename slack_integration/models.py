@@ -38,6 +38,23 @@ class SlackAccount(models.Model):
         null=True,
         help_text="OnSync bot user ID in this workspace"
     )
+    alert_channel = models.CharField(
+        max_length=255,
+        blank=True,
+        default='',
+        help_text="Channel ID for webhook failure digests (empty to disable)"
+    )
+    
+    # Token validity (maintained by the periodic auth.test sweep)
+    TOKEN_STATUS_CHOICES = [
+        ('unknown', 'Unknown'),
+        ('valid', 'Valid'),
+        ('invalid', 'Invalid'),
+    ]
+    
+    token_status = models.CharField(max_length=10, choices=TOKEN_STATUS_CHOICES, default='unknown')
+    token_error = models.CharField(max_length=255, blank=True, help_text="Slack error from the last check")
+    token_checked_at = models.DateTimeField(blank=True, null=True)
     
     # Link to client account
     client_account = models.ForeignKey(
@@ -65,6 +82,5 @@ class SlackAccount(models.Model):
     
     @property
     def is_token_valid(self):
-        """Check if the access token is still valid"""
-        # You can implement token validation logic here
-        return bool(self.slack_access_token)
+        """Check if the access token is still valid (as of the last sweep)"""
+        return bool(self.slack_access_token) and self.token_status != 'invalid'
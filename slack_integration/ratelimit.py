@@ -0,0 +1,176 @@
+"""
+Slack Web API rate limiting.
+
+Slack limits each method per workspace by tier (tier 1 to 4, plus a
+special limit for chat.postMessage). A token bucket in Redis is kept for
+each (workspace, tier), refilling at the tier's published rate, so every
+process and worker sharing a workspace stays under the ceiling together.
+
+Callers reserve a token rather than test for one: the bucket may go
+negative, and the reservation comes back with how long to wait before
+sending, which queues concurrent callers in arrival order. A 429 from
+Slack blocks the bucket for its Retry-After.
+
+If Redis is unavailable the limiter fails open for a short back-off and
+429s are still honoured by the client.
+"""
+import logging
+import threading
+import time
+
+import redis
+from django.conf import settings
+
+logger = logging.getLogger('slack_integration')
+
+KEY_PREFIX = 'slack:rl'
+
+# Seconds to skip the limiter after Redis errors
+UNAVAILABLE_BACKOFF = 30
+
+# Requests per minute per workspace (https://api.slack.com/docs/rate-limits)
+TIER_RATES = {
+    'tier1': 1,
+    'tier2': 20,
+    'tier3': 50,
+    'tier4': 100,
+    'post_message': 60,
+}
+
+METHOD_TIERS = {
+    'auth.test': 'tier4',
+    'chat.postMessage': 'post_message',
+    'chat.postEphemeral': 'tier4',
+    'chat.update': 'tier3',
+    'conversations.info': 'tier3',
+    'conversations.list': 'tier2',
+    'team.info': 'tier3',
+    'users.info': 'tier4',
+    'users.list': 'tier2',
+}
+
+DEFAULT_TIER = 'tier3'
+
+# KEYS[1] is the bucket hash. ARGV: refill rate (tokens per second),
+# capacity, longest acceptable wait, and a Retry-After block in seconds
+# (0 to reserve a token). Returns {reserved, wait}; the wait is a string
+# because Lua numbers are truncated to integers on return.
+TOKEN_BUCKET_SCRIPT = """
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local max_wait = tonumber(ARGV[3])
+local block = tonumber(ARGV[4])
+
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts', 'blocked')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+local blocked = tonumber(state[3]) or 0
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+
+local reserved = 0
+local wait = 0
+if block > 0 then
+    blocked = math.max(blocked, now + block)
+    tokens = math.min(tokens, 0)
+else
+    wait = math.max(0, blocked - now)
+    if tokens < 1 then
+        wait = math.max(wait, (1 - tokens) / rate)
+    end
+    if wait <= max_wait then
+        tokens = tokens - 1
+        reserved = 1
+    end
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now), 'blocked', tostring(blocked))
+local ttl = math.max(blocked - now, 0) + (capacity - tokens) / rate + 60
+redis.call('EXPIRE', KEYS[1], math.ceil(ttl))
+return {reserved, tostring(wait)}
+"""
+
+_client = None
+_script = None
+_client_lock = threading.Lock()
+_unavailable_until = 0.0
+
+
+class SlackRateLimited(Exception):
+    """A Slack call would have to wait longer than allowed"""
+    
+    def __init__(self, retry_after):
+        self.retry_after = retry_after
+        super().__init__(f'Slack rate limit reached, retry in {retry_after:.1f}s')
+
+
+def _get_script():
+    global _client, _script
+    if _script is None:
+        with _client_lock:
+            if _script is None:
+                _client = redis.Redis.from_url(
+                    settings.SLACK_RATE_LIMIT_REDIS_URL,
+                    socket_timeout=settings.SLACK_RATE_LIMIT_TIMEOUT,
+                    socket_connect_timeout=settings.SLACK_RATE_LIMIT_TIMEOUT,
+                )
+                _script = _client.register_script(TOKEN_BUCKET_SCRIPT)
+    return _script
+
+
+def method_tier(method):
+    return METHOD_TIERS.get(method, DEFAULT_TIER)
+
+
+def bucket_params(tier):
+    """(refill rate per second, burst capacity) for a tier"""
+    per_minute = TIER_RATES[tier]
+    return per_minute / 60.0, max(1, per_minute // 10)
+
+
+def _run(workspace_id, tier, max_wait, block):
+    global _unavailable_until
+    if not settings.SLACK_RATE_LIMIT_REDIS_URL or time.time() < _unavailable_until:
+        return None
+    
+    rate, capacity = bucket_params(tier)
+    try:
+        return _get_script()(
+            keys=[f'{KEY_PREFIX}:{workspace_id}:{tier}'],
+            args=[rate, capacity, max_wait, block],
+        )
+    except redis.RedisError as e:
+        _unavailable_until = time.time() + UNAVAILABLE_BACKOFF
+        logger.warning(f"⚠️  Slack rate limiter unavailable, not throttling: {str(e)}")
+        return None
+
+
+def reserve(workspace_id, method, max_wait):
+    """
+    Reserve a call to a Slack method for a workspace.
+    Returns the seconds to wait before sending it; raises SlackRateLimited
+    (without reserving) if that would be longer than max_wait.
+    """
+    result = _run(workspace_id, method_tier(method), max_wait, 0)
+    if result is None:
+        return 0.0
+    
+    reserved, wait = int(result[0]), float(result[1])
+    if not reserved:
+        raise SlackRateLimited(wait)
+    return wait
+
+
+def block(workspace_id, method, retry_after):
+    """Hold back a workspace's calls in a method's tier after a 429"""
+    _run(workspace_id, method_tier(method), 0, max(retry_after, 1))
+
+
+def reset_rate_limiter():
+    """Drop the client and any back-off (e.g. after settings change)"""
+    global _client, _script, _unavailable_until
+    with _client_lock:
+        _client = None
+        _script = None
+        _unavailable_until = 0.0
@@ -8,7 +8,10 @@ from .models import SlackAccount
 class SlackAccountSerializer(serializers.ModelSerializer):
     """
     Serializer for SlackAccount model.
+    Token validity comes from the last auth.test sweep.
     """
+    is_token_valid = serializers.BooleanField(read_only=True)
+    
     class Meta:
         model = SlackAccount
         fields = [
@@ -16,11 +19,16 @@ class SlackAccountSerializer(serializers.ModelSerializer):
             'workspace_name',
             'workspace_url',
             'onsync_bot_user_id',
+            'alert_channel',
             'client_account',
+            'is_token_valid',
+            'token_status',
+            'token_error',
+            'token_checked_at',
             'created_at',
             'updated_at',
         ]
-        read_only_fields = ['created_at', 'updated_at']
+        read_only_fields = ['token_status', 'token_error', 'token_checked_at', 'created_at', 'updated_at']
     
     def to_representation(self, instance):
         """Customize output - don't expose access token"""
@@ -0,0 +1,116 @@
+"""
+Celery tasks for Slack integration.
+"""
+import logging
+
+import requests
+from celery import shared_task
+
+from .alerts import collect_digest, format_digest, is_suppressed, mark_sent
+from .client import SLACK_API_TIMEOUT, SlackClient, SlackRateLimited, get_session
+from .commands import format_result
+from .models import SlackAccount
+
+logger = logging.getLogger('slack_integration')
+
+
+@shared_task(
+    bind=True,
+    ignore_result=True,
+    autoretry_for=(requests.RequestException,),
+    retry_backoff=True,
+    max_retries=3,
+)
+def fetch_slack_team_info(self, workspace_id):
+    """
+    Fill in the workspace URL of a newly connected Slack account.
+    Queued by the OAuth callback so the redirect doesn't wait on team.info.
+    """
+    account = SlackAccount.objects.filter(workspace_id=workspace_id).only('slack_access_token').first()
+    if account is None:
+        return
+    
+    try:
+        team_info_data = SlackClient.for_account(account).api_call('team.info', http_method='GET')
+    except SlackRateLimited as e:
+        raise self.retry(countdown=e.retry_after)
+    
+    if not team_info_data.get('ok'):
+        logger.warning(f"⚠️  Could not fetch team.info for {workspace_id}: {team_info_data.get('error')}")
+        return
+    
+    domain = team_info_data.get('team', {}).get('domain')
+    if domain:
+        workspace_url = f"{domain}.slack.com"
+        SlackAccount.objects.filter(workspace_id=workspace_id).update(workspace_url=workspace_url)
+        logger.info(f"   Workspace URL for {workspace_id}: {workspace_url}")
+
+
+@shared_task(
+    bind=True,
+    ignore_result=True,
+    autoretry_for=(requests.RequestException,),
+    retry_backoff=True,
+    max_retries=3,
+)
+def send_webhook_failure_digest(self, account_id, host, window_id):
+    """
+    Post the failures of one digest window to the account's Slack alert
+    channels. Scheduled by record_webhook_failure when the window opens.
+    """
+    digest = collect_digest(account_id, host, window_id)
+    if digest is None:
+        return
+    if is_suppressed(account_id, digest):
+        logger.info(f"   Suppressed repeat failure digest for account {account_id} ({host}, {digest['count']} failures)")
+        return
+    
+    slack_accounts = SlackAccount.objects.filter(client_account_id=account_id).exclude(alert_channel='')
+    text = format_digest(digest)
+    sent = False
+    for slack_account in slack_accounts:
+        try:
+            data = SlackClient.for_account(slack_account).api_call(
+                'chat.postMessage',
+                data={'channel': slack_account.alert_channel, 'text': text},
+            )
+        except SlackRateLimited as e:
+            raise self.retry(countdown=e.retry_after)
+        if data.get('ok'):
+            sent = True
+        else:
+            logger.warning(f"⚠️  Could not post failure digest to {slack_account.workspace_id}: {data.get('error')}")
+    
+    if sent:
+        mark_sent(account_id, digest)
+
+
+@shared_task
+def check_slack_tokens():
+    """
+    Check every Slack install's token with auth.test and store the result,
+    so revoked installs are flagged before something fails.
+    """
+    from .tokens import check_slack_tokens as check
+    summary = check()
+    logger.info(f"metric=slack.tokens_checked count={summary['checked']} invalid={summary['invalid']}")
+    return summary
+
+
+@shared_task(
+    ignore_result=True,
+    autoretry_for=(requests.RequestException,),
+    retry_backoff=True,
+    max_retries=3,
+)
+def post_slash_command_result(result, response_url, webhook_name):
+    """
+    Report a /cronhook run back to Slack. Linked to execute_webhook, so
+    ``result`` is its return value.
+    """
+    response = get_session().post(
+        response_url,
+        json={'response_type': 'ephemeral', 'text': format_result(webhook_name, result)},
+        timeout=SLACK_API_TIMEOUT,
+    )
+    response.raise_for_status()
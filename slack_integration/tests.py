@@ -1,3 +1,423 @@
-from django.test import TestCase
+"""
+Tests for slack_integration app.
+"""
+import hashlib
+import hmac
+import time
+from types import SimpleNamespace
+from unittest import mock
+from urllib.parse import urlencode
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+import requests
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase, override_settings
+from rest_framework.test import APITestCase
+from webhooks.models import Account, Webhook, WebhookExecution
+from . import views
+from .alerts import collect_digest, record_webhook_failure
+from .client import SlackClient
+from .commands import get_name_index, name_index_key, verify_signature
+from .models import SlackAccount
+from .ratelimit import SlackRateLimited, bucket_params, method_tier, reserve, reset_rate_limiter
+from .tasks import fetch_slack_team_info, post_slash_command_result, send_webhook_failure_digest
+from .tokens import check_slack_tokens
+
+
+TOKEN_RESPONSE = {
+    'ok': True,
+    'access_token': 'xoxb-token',
+    'bot_user_id': 'U0BOT',
+    'team': {'id': 'T123', 'name': 'Acme'},
+    'authed_user': {'id': 'U0USER'},
+}
+
+
+class SlackOAuthCallbackTest(TestCase):
+    """Test the OAuth callback and the deferred team.info lookup."""
+    
+    def setUp(self):
+        self.account = Account.objects.create(name='Test Account', email='test@example.com')
+        self.callback_url = f'/oauth/callback?code=abc&state=account_{self.account.id}'
+    
+    def test_callback_stores_token_and_queues_team_info(self):
+        """The callback redirects once the token is stored, without calling team.info."""
+        with mock.patch.object(views, 'slack_api_call', return_value=TOKEN_RESPONSE) as api_call, \
+                mock.patch.object(views.fetch_slack_team_info, 'delay') as delay:
+            response = self.client.get(self.callback_url)
+        
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response['Location'], 'https://onsync.ai/slack-app-success')
+        self.assertEqual([call.args[0] for call in api_call.call_args_list], ['oauth.v2.access'])
+        delay.assert_called_once_with('T123')
+        
+        slack_account = SlackAccount.objects.get(workspace_id='T123')
+        self.assertEqual(slack_account.slack_access_token, 'xoxb-token')
+        self.assertEqual(slack_account.client_account_id, self.account.id)
+        self.assertIsNone(slack_account.workspace_url)
+        self.assertEqual(slack_account.token_status, 'valid')
+    
+    def test_callback_survives_broker_outage(self):
+        """A failure to queue the lookup doesn't fail the install."""
+        with mock.patch.object(views, 'slack_api_call', return_value=TOKEN_RESPONSE), \
+                mock.patch.object(views.fetch_slack_team_info, 'delay', side_effect=ConnectionError('down')):
+            response = self.client.get(self.callback_url)
+        
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(SlackAccount.objects.filter(workspace_id='T123').exists())
+    
+    def test_callback_token_error(self):
+        """A failed exchange returns the Slack error."""
+        with mock.patch.object(views, 'slack_api_call', return_value={'ok': False, 'error': 'invalid_code'}):
+            response = self.client.get(self.callback_url)
+        
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error'], 'invalid_code')
+        self.assertFalse(SlackAccount.objects.exists())
+    
+    def test_async_callback(self):
+        """The async callback stores the token the same way."""
+        request = RequestFactory().get(self.callback_url)
+        with mock.patch.object(views, 'aslack_api_call', new=mock.AsyncMock(return_value=TOKEN_RESPONSE)), \
+                mock.patch.object(views.fetch_slack_team_info, 'delay') as delay:
+            response = async_to_sync(views.aslack_oauth_callback)(request)
+        
+        self.assertEqual(response.status_code, 302)
+        delay.assert_called_once_with('T123')
+        self.assertEqual(SlackAccount.objects.get(workspace_id='T123').workspace_name, 'Acme')
+    
+    def test_team_info_task_sets_workspace_url(self):
+        """The background lookup fills in the workspace URL."""
+        SlackAccount.objects.create(
+            workspace_id='T123',
+            workspace_name='Acme',
+            slack_access_token='xoxb-token',
+            client_account=self.account,
+        )
+        team_info = {'ok': True, 'team': {'domain': 'acme'}}
+        with mock.patch.object(SlackClient, 'api_call', return_value=team_info) as api_call:
+            fetch_slack_team_info('T123')
+        
+        api_call.assert_called_once_with('team.info', http_method='GET')
+        self.assertEqual(SlackAccount.objects.get(workspace_id='T123').workspace_url, 'acme.slack.com')
+
+
+def _slack_response(status_code=200, body=None, headers=None):
+    response = mock.Mock(status_code=status_code, headers=headers or {})
+    response.json.return_value = body or {'ok': True}
+    return response
+
+
+@override_settings(SLACK_RATE_LIMIT_REDIS_URL='')
+class SlackRateLimitTest(TestCase):
+    """Test the rate-limit-aware Slack client."""
+    
+    def setUp(self):
+        reset_rate_limiter()
+        self.addCleanup(reset_rate_limiter)
+        self.slack = SlackClient('T123', 'xoxb-token', max_wait=10)
+    
+    def test_buckets_follow_method_tiers(self):
+        """Buckets refill at the tier's per-minute rate with a small burst."""
+        self.assertEqual(method_tier('chat.postMessage'), 'post_message')
+        self.assertEqual(method_tier('some.newMethod'), 'tier3')
+        self.assertEqual(bucket_params('tier2'), (20 / 60.0, 2))
+        self.assertEqual(bucket_params('tier1'), (1 / 60.0, 1))
+    
+    def test_reserve_waits_or_refuses(self):
+        """A reservation returns its wait, or raises when it would be too long."""
+        with override_settings(SLACK_RATE_LIMIT_REDIS_URL='redis://localhost:6379/0'):
+            with mock.patch('slack_integration.ratelimit._get_script', return_value=lambda **kwargs: [1, b'0.4']):
+                self.assertEqual(reserve('T123', 'team.info', 10), 0.4)
+            with mock.patch('slack_integration.ratelimit._get_script', return_value=lambda **kwargs: [0, b'12.5']):
+                with self.assertRaises(SlackRateLimited) as raised:
+                    reserve('T123', 'team.info', 10)
+        self.assertEqual(raised.exception.retry_after, 12.5)
+    
+    @override_settings(SLACK_RATE_LIMIT_REDIS_URL='redis://127.0.0.1:1/0')
+    def test_fails_open_without_redis(self):
+        """An unreachable Redis lets calls through and backs off."""
+        with self.assertLogs('slack_integration', 'WARNING'):
+            self.assertEqual(reserve('T123', 'team.info', 10), 0.0)
+        with mock.patch('slack_integration.ratelimit._get_script') as get_script:
+            self.assertEqual(reserve('T123', 'team.info', 10), 0.0)
+        get_script.assert_not_called()
+    
+    @mock.patch('slack_integration.client.time.sleep')
+    def test_client_honours_retry_after(self, sleep):
+        """A 429 is retried once its Retry-After has passed."""
+        session = mock.Mock()
+        session.request.side_effect = [
+            _slack_response(429, headers={'Retry-After': '2'}),
+            _slack_response(body={'ok': True, 'team': {'domain': 'acme'}}),
+        ]
+        with mock.patch('slack_integration.client.get_session', return_value=session):
+            data = self.slack.api_call('team.info', http_method='GET')
+        
+        self.assertEqual(data['team']['domain'], 'acme')
+        sleep.assert_called_once_with(2)
+        self.assertEqual(session.request.call_count, 2)
+        self.assertEqual(session.request.call_args.kwargs['headers'], {'Authorization': 'Bearer xoxb-token'})
+    
+    @mock.patch('slack_integration.client.time.sleep')
+    def test_client_gives_up_on_long_retry_after(self, sleep):
+        """A Retry-After beyond max_wait is left to the caller."""
+        session = mock.Mock()
+        session.request.return_value = _slack_response(429, headers={'Retry-After': '60'})
+        with mock.patch('slack_integration.client.get_session', return_value=session):
+            with self.assertRaises(SlackRateLimited) as raised:
+                self.slack.api_call('chat.postMessage', data={'channel': 'C1', 'text': 'hi'})
+        
+        self.assertEqual(raised.exception.retry_after, 60)
+        self.assertEqual(session.request.call_count, 1)
+        sleep.assert_not_called()
+
+
+@override_settings(SLACK_FAILURE_DIGEST_WINDOW=300, SLACK_FAILURE_DIGEST_SUPPRESS=3600)
+class WebhookFailureDigestTest(TestCase):
+    """Test coalesced Slack digests of webhook failures."""
+    
+    def setUp(self):
+        cache.clear()
+        # The test cache is local memory; count in it as if it were shared
+        shared = mock.patch('slack_integration.alerts.cache_is_shared', return_value=True)
+        shared.start()
+        self.addCleanup(shared.stop)
+        self.account = Account.objects.create(name='Test Account', email='test@example.com')
+        SlackAccount.objects.create(
+            workspace_id='T123',
+            workspace_name='Acme',
+            slack_access_token='xoxb-token',
+            client_account=self.account,
+            alert_channel='C0ALERTS',
+        )
+    
+    def _fail(self, count, url='https://api.example.com/hook', reason='HTTP 500', now=1000.0):
+        with mock.patch.object(send_webhook_failure_digest, 'apply_async') as apply_async:
+            for i in range(count):
+                record_webhook_failure(self.account.id, url, f'Hook {i}', reason, now=now + i)
+        return apply_async
+    
+    def test_failures_coalesce_per_window(self):
+        """Only the failure opening a window schedules a digest."""
+        apply_async = self._fail(40)
+        
+        apply_async.assert_called_once_with(args=[self.account.id, 'api.example.com', 1000], countdown=300)
+        digest = collect_digest(self.account.id, 'api.example.com', 1000)
+        self.assertEqual(digest['count'], 40)
+        self.assertEqual([sample['name'] for sample in digest['samples']], [f'Hook {i}' for i in range(5)])
+        
+        # Another host gets its own window
+        other = self._fail(1, url='https://other.example.com/hook')
+        other.assert_called_once()
+    
+    def test_digest_sent_once_and_repeats_suppressed(self):
+        """One message per window; the same failure again is not re-posted."""
+        self._fail(12)
+        with mock.patch.object(SlackClient, 'api_call', return_value={'ok': True}) as api_call:
+            send_webhook_failure_digest(self.account.id, 'api.example.com', 1000)
+        
+        api_call.assert_called_once()
+        method = api_call.call_args.args[0]
+        data = api_call.call_args.kwargs['data']
+        self.assertEqual(method, 'chat.postMessage')
+        self.assertEqual(data['channel'], 'C0ALERTS')
+        self.assertIn('12 webhook executions to *api.example.com*', data['text'])
+        self.assertIn('…and 7 more', data['text'])
+        
+        # Next window, same failure: suppressed
+        cache.delete(f'slack:failures:open:{self.account.id}:api.example.com')
+        self._fail(3, now=2000.0)
+        with mock.patch.object(SlackClient, 'api_call', return_value={'ok': True}) as api_call:
+            send_webhook_failure_digest(self.account.id, 'api.example.com', 2000)
+        api_call.assert_not_called()
+    
+    def test_unshared_cache_records_nothing(self):
+        """A per-process cache can't carry counts to the digest task."""
+        with mock.patch('slack_integration.alerts.cache_is_shared', return_value=False):
+            apply_async = self._fail(3)
+        
+        apply_async.assert_not_called()
+        self.assertIsNone(collect_digest(self.account.id, 'api.example.com', 1000))
+    
+    def test_broker_errors_are_swallowed(self):
+        """A failure to schedule the digest doesn't fail the webhook task."""
+        with mock.patch.object(send_webhook_failure_digest, 'apply_async', side_effect=ConnectionError('down')):
+            record_webhook_failure(self.account.id, 'https://api.example.com/hook', 'Hook', 'HTTP 500', now=1000.0)
+        
+        self.assertEqual(collect_digest(self.account.id, 'api.example.com', 1000)['count'], 1)
+    
+    def test_report_skips_webhooks_without_account(self):
+        """Webhooks not tied to an account are not reported."""
+        from webhooks.tasks import _report_failure
+        with mock.patch('slack_integration.alerts.record_webhook_failure') as record:
+            _report_failure(SimpleNamespace(account_id=None), 'HTTP 500')
+            _report_failure(SimpleNamespace(account_id=self.account.id, url='https://api.example.com', name='Hook'), 'HTTP 500')
+        record.assert_called_once_with(self.account.id, 'https://api.example.com', 'Hook', 'HTTP 500')
+
+
+class SlackTokenCheckTest(APITestCase):
+    """Test the auth.test token sweep."""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.account = Account.objects.create(name='Test Account', email='test@example.com')
+        for workspace_id in ('T1', 'T2', 'T3'):
+            SlackAccount.objects.create(
+                workspace_id=workspace_id,
+                workspace_name=workspace_id,
+                slack_access_token=f'xoxb-{workspace_id}',
+                client_account=self.account,
+                token_status='valid',
+            )
+    
+    def test_sweep_stores_token_status(self):
+        """Revoked tokens are flagged; transient errors keep the last verdict."""
+        def auth_test(client, method):
+            self.assertEqual(method, 'auth.test')
+            if client.workspace_id == 'T2':
+                return {'ok': False, 'error': 'token_revoked'}
+            if client.workspace_id == 'T3':
+                raise requests.ConnectionError('reset')
+            return {'ok': True}
+        
+        with mock.patch.object(SlackClient, 'api_call', autospec=True, side_effect=auth_test):
+            summary = check_slack_tokens(concurrency=3)
+        
+        self.assertEqual(summary, {'checked': 3, 'invalid': 1})
+        accounts = {a.workspace_id: a for a in SlackAccount.objects.all()}
+        self.assertEqual(accounts['T1'].token_status, 'valid')
+        self.assertEqual(accounts['T2'].token_status, 'invalid')
+        self.assertEqual(accounts['T2'].token_error, 'token_revoked')
+        self.assertFalse(accounts['T2'].is_token_valid)
+        self.assertEqual(accounts['T3'].token_status, 'valid')
+        self.assertEqual(accounts['T3'].token_error, 'reset')
+        self.assertIsNotNone(accounts['T3'].token_checked_at)
+    
+    def test_list_reports_token_status_without_calling_slack(self):
+        """The accounts list serves the stored verdict."""
+        SlackAccount.objects.filter(workspace_id='T2').update(token_status='invalid')
+        self.client.force_authenticate(user=self.user)
+        with mock.patch.object(SlackClient, 'api_call') as api_call:
+            response = self.client.get('/accounts/', {'token_status': 'invalid'})
+        
+        api_call.assert_not_called()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([a['workspace_id'] for a in response.data], ['T2'])
+        self.assertFalse(response.data[0]['is_token_valid'])
+
+
+SIGNING_SECRET = 'test-signing-secret'
+
+
+@override_settings(SLACK_SIGNING_SECRET=SIGNING_SECRET)
+class SlashCommandTest(TestCase):
+    """Test the /cronhook slash command."""
+    
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.account = Account.objects.create(name='Test Account', email='test@example.com')
+        SlackAccount.objects.create(
+            workspace_id='T123',
+            workspace_name='Acme',
+            slack_access_token='xoxb-token',
+            client_account=self.account,
+        )
+        self.webhook = Webhook.objects.create(
+            user=self.user,
+            account=self.account,
+            name='Nightly Sync',
+            url='https://api.example.com/sync',
+            schedule_type='recurring',
+            cron_expression='0 0 * * *',
+        )
+    
+    def _command(self, text, secret=SIGNING_SECRET, team_id='T123'):
+        body = urlencode({
+            'team_id': team_id,
+            'user_id': 'U0USER',
+            'command': '/cronhook',
+            'text': text,
+            'response_url': 'https://hooks.slack.com/commands/T123/1/abc',
+        }).encode()
+        timestamp = str(int(time.time()))
+        signature = 'v0=' + hmac.new(
+            secret.encode(), b'v0:' + timestamp.encode() + b':' + body, hashlib.sha256
+        ).hexdigest()
+        return self.client.post(
+            '/slack/commands',
+            data=body,
+            content_type='application/x-www-form-urlencoded',
+            HTTP_X_SLACK_REQUEST_TIMESTAMP=timestamp,
+            HTTP_X_SLACK_SIGNATURE=signature,
+        )
+    
+    def test_signature_verification(self):
+        """Forged and replayed requests are rejected."""
+        self.assertEqual(self._command('run Nightly Sync', secret='wrong').status_code, 401)
+        body = b'text=run'
+        timestamp = str(int(time.time()) - 600)
+        signature = 'v0=' + hmac.new(
+            SIGNING_SECRET.encode(), b'v0:' + timestamp.encode() + b':' + body, hashlib.sha256
+        ).hexdigest()
+        self.assertFalse(verify_signature(body, timestamp, signature))
+        self.assertTrue(verify_signature(body, timestamp, signature, now=int(timestamp) + 1))
+    
+    def test_run_acknowledges_and_queues(self):
+        """A run is queued with the result posted back to response_url."""
+        with mock.patch('slack_integration.views.execute_webhook.apply_async') as apply_async:
+            response = self._command('run nightly sync')
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Running *Nightly Sync*', response.json()['text'])
+        apply_async.assert_called_once()
+        self.assertEqual(apply_async.call_args.kwargs['args'], [self.webhook.id])
+        link = apply_async.call_args.kwargs['link']
+        self.assertEqual(link.task, 'slack_integration.tasks.post_slash_command_result')
+        self.assertEqual(link.args, ('https://hooks.slack.com/commands/T123/1/abc', 'Nightly Sync'))
+    
+    def test_status_and_unknown_names(self):
+        """Status reports the latest execution; names are scoped to the account."""
+        WebhookExecution.objects.create(webhook=self.webhook, status='failed', response_code=502)
+        response = self._command('status Nightly Sync')
+        self.assertIn('last run failed (HTTP 502)', response.json()['text'])
+        
+        other = Account.objects.create(name='Other', email='other@example.com')
+        Webhook.objects.create(
+            user=self.user, account=other, name='Other Hook',
+            url='https://example.com', schedule_type='recurring', cron_expression='* * * * *',
+        )
+        self.assertIn('No webhook named', self._command('run Other Hook').json()['text'])
+        self.assertIn('Usage', self._command('delete Nightly Sync').json()['text'])
+    
+    def test_name_index_is_cached_and_invalidated(self):
+        """The index is served from cache until a webhook is renamed."""
+        get_name_index(self.account.id)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_name_index(self.account.id), {'nightly sync': self.webhook.id})
+        
+        # Saves that can't change names keep the index
+        self.webhook.save(update_fields=['last_execution_at'])
+        self.assertIsNotNone(cache.get(name_index_key(self.account.id)))
+        
+        self.webhook.name = 'Hourly Sync'
+        self.webhook.save()
+        self.assertIsNone(cache.get(name_index_key(self.account.id)))
+        self.assertEqual(get_name_index(self.account.id), {'hourly sync': self.webhook.id})
+    
+    def test_result_posted_to_response_url(self):
+        """The linked task reports the run outcome."""
+        session = mock.Mock()
+        with mock.patch('slack_integration.tasks.get_session', return_value=session):
+            post_slash_command_result(
+                {'status': 'success', 'response_code': 200, 'attempt': 1},
+                'https://hooks.slack.com/commands/T123/1/abc',
+                'Nightly Sync',
+            )
+        
+        url = session.post.call_args.args[0]
+        payload = session.post.call_args.kwargs['json']
+        self.assertEqual(url, 'https://hooks.slack.com/commands/T123/1/abc')
+        self.assertIn('*Nightly Sync* ran successfully (HTTP 200)', payload['text'])
@@ -0,0 +1,82 @@
+"""
+Slack token validity sweep.
+
+Every SlackAccount's bot token is checked with auth.test. Checks run on a
+bounded thread pool over the pooled, rate-limited SlackClient; results are
+written back in one bulk update, so revoked installs show up in
+list_slack_accounts without calling Slack on each request.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.conf import settings
+from django.utils import timezone
+
+from .client import SLACK_POOL_SIZE, SlackClient, SlackRateLimited
+from .models import SlackAccount
+
+logger = logging.getLogger('slack_integration')
+
+# auth.test errors meaning the token itself is no good
+INVALID_TOKEN_ERRORS = {
+    'account_inactive',
+    'invalid_auth',
+    'not_authed',
+    'token_expired',
+    'token_revoked',
+}
+
+
+def classify(data):
+    """Token status from an auth.test response ('unknown' on other errors)"""
+    if data.get('ok'):
+        return 'valid'
+    if data.get('error') in INVALID_TOKEN_ERRORS:
+        return 'invalid'
+    return 'unknown'
+
+
+def check_token(slack_account):
+    """
+    Run auth.test for one account.
+    Returns (status, error); status is None when no verdict was reached,
+    so the previous one is kept.
+    """
+    try:
+        # Don't queue behind a busy workspace; the next sweep will get it
+        data = SlackClient.for_account(slack_account, max_wait=5).api_call('auth.test')
+    except (requests.RequestException, SlackRateLimited, ValueError) as e:
+        return None, str(e)[:255]
+    
+    status = classify(data)
+    return (None if status == 'unknown' else status), data.get('error', '')
+
+
+def check_slack_tokens(concurrency=None):
+    """
+    Check every Slack account's token and store the results.
+    Returns a summary with the number checked and found invalid.
+    """
+    concurrency = min(concurrency or settings.SLACK_TOKEN_CHECK_CONCURRENCY, SLACK_POOL_SIZE)
+    accounts = list(SlackAccount.objects.only('workspace_id', 'slack_access_token', 'token_status'))
+    if not accounts:
+        return {'checked': 0, 'invalid': 0}
+    
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(check_token, accounts))
+    
+    now = timezone.now()
+    invalid = 0
+    for account, (status, error) in zip(accounts, results):
+        if status is not None:
+            if status == 'invalid' and account.token_status != 'invalid':
+                logger.warning(f"⚠️  Slack token for {account.workspace_id} is no longer valid: {error}")
+            account.token_status = status
+        invalid += account.token_status == 'invalid'
+        account.token_error = error
+        account.token_checked_at = now
+    
+    # bulk_update leaves updated_at alone; the install itself didn't change
+    SlackAccount.objects.bulk_update(accounts, ['token_status', 'token_error', 'token_checked_at'], batch_size=500)
+    return {'checked': len(accounts), 'invalid': invalid}
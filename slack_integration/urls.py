@@ -1,6 +1,7 @@
 """
 URL patterns for Slack OAuth integration.
 """
+from django.conf import settings
 from django.urls import path
 from . import views
 
@@ -8,9 +9,17 @@ app_name = 'slack_integration'
 
 urlpatterns = [
     # OAuth flow
-    path('oauth/callback', views.slack_oauth_callback, name='oauth-callback'),
+    # Under ASGI (config.asgi) the async variant doesn't hold a worker on Slack
+    path(
+        'oauth/callback',
+        views.aslack_oauth_callback if settings.SLACK_ASYNC_OAUTH_CALLBACK else views.slack_oauth_callback,
+        name='oauth-callback'
+    ),
     path('oauth/install', views.slack_oauth_install, name='oauth-install'),
     
+    # Slash commands
+    path('slack/commands', views.slack_command, name='slash-command'),
+    
     # Account management
     path('accounts/', views.list_slack_accounts, name='list-accounts'),
     path('accounts/<str:workspace_id>/disconnect', views.disconnect_slack_account, name='disconnect-account'),
@@ -1,21 +1,177 @@
 """
 Views for Slack OAuth integration.
 """
+import httpx
 import requests
 import logging
+from asgiref.sync import sync_to_async
 from django.conf import settings
 from django.shortcuts import redirect
+from django.utils import timezone
 from django.http import JsonResponse, HttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework import status
+from webhooks.models import Webhook, WebhookExecution
+from webhooks.tasks import execute_webhook
+from .client import aslack_api_call, slack_api_call
+from .commands import USAGE, is_slack_response_url, parse_command, resolve_webhook, verify_signature
 from .models import SlackAccount
 from .serializers import SlackAccountSerializer
+from .tasks import fetch_slack_team_info, post_slash_command_result
 
 logger = logging.getLogger('slack_integration')
 
 
+def _oauth_error(error, message, status=400):
+    return JsonResponse({
+        'success': False,
+        'error': error,
+        'message': message
+    }, status=status)
+
+
+def _callback_code(request):
+    """
+    Authorization code from Slack's redirect.
+    Returns (code, error_response).
+    """
+    code = request.GET.get('code')
+    error = request.GET.get('error')
+    
+    # Handle authorization denial
+    if error:
+        logger.error(f"❌ Slack OAuth Error: User denied authorization - {error}")
+        return None, _oauth_error(error, 'User denied authorization or authorization failed')
+    
+    if not code:
+        logger.error("❌ Slack OAuth Error: No authorization code received from Slack")
+        return None, _oauth_error('no_code', 'No authorization code received from Slack')
+    
+    logger.info(f"Code Received: {code}")
+    logger.info(f"🔄 Exchanging authorization code for access token...")
+    return code, None
+
+
+def _token_request_data(code):
+    return {
+        'client_id': settings.SLACK_CLIENT_ID,
+        'client_secret': settings.SLACK_CLIENT_SECRET,
+        'code': code,
+        'redirect_uri': settings.SLACK_REDIRECT_URI
+    }
+
+
+def _parse_token_data(token_data):
+    """
+    Account fields from an oauth.v2.access response.
+    Returns (fields, error_response).
+    """
+    if not token_data.get('ok'):
+        error_msg = token_data.get('error', 'unknown_error')
+        logger.error(f"❌ Slack OAuth token exchange failed: {error_msg}")
+        logger.error(f"   Full response: {token_data}")
+        return None, _oauth_error(error_msg, f'Failed to exchange code for token: {error_msg}')
+    
+    access_token = token_data.get('access_token')
+    bot_user_id = token_data.get('bot_user_id')
+    team_info = token_data.get('team', {})
+    workspace_id = team_info.get('id')
+    workspace_name = team_info.get('name')
+    authed_user = token_data.get('authed_user', {})
+    
+    logger.info(f"✅ Successfully obtained access token")
+    logger.info(f"   Workspace: {workspace_name} ({workspace_id})")
+    logger.info(f"   Bot User ID: {bot_user_id}")
+    logger.info(f"   Authorized User: {authed_user.get('id', 'N/A')}")
+    
+    if not all([access_token, workspace_id, workspace_name]):
+        logger.error(f"❌ Missing required data in Slack OAuth response")
+        logger.error(f"   Access Token: {'Present' if access_token else 'Missing'}")
+        logger.error(f"   Workspace ID: {workspace_id or 'Missing'}")
+        logger.error(f"   Workspace Name: {workspace_name or 'Missing'}")
+        return None, _oauth_error('missing_data', 'Incomplete data received from Slack OAuth')
+    
+    return {
+        'workspace_id': workspace_id,
+        'workspace_name': workspace_name,
+        'slack_access_token': access_token,
+        'onsync_bot_user_id': bot_user_id,
+    }, None
+
+
+def _client_account_id(request):
+    """Client account from the state or account_id parameter (default 1)"""
+    state = request.GET.get('state')
+    client_account_id = None
+    
+    # Try to extract from state parameter
+    if state and state.startswith('account_'):
+        try:
+            client_account_id = int(state.replace('account_', ''))
+            logger.info(f"   Client Account ID from state: {client_account_id}")
+        except ValueError:
+            logger.warning(f"⚠️  Invalid account_id in state: {state}")
+    
+    # Fallback to query parameter
+    if not client_account_id:
+        account_id_param = request.GET.get('account_id')
+        if account_id_param:
+            try:
+                client_account_id = int(account_id_param)
+                logger.info(f"   Client Account ID from query: {client_account_id}")
+            except ValueError:
+                logger.warning(f"⚠️  Invalid account_id parameter: {account_id_param}")
+    
+    # Default to account 1 if not specified
+    if not client_account_id:
+        client_account_id = 1
+        logger.warning(f"⚠️  No account_id specified, defaulting to: {client_account_id}")
+    
+    return client_account_id
+
+
+def _save_slack_account(fields, client_account_id):
+    """
+    Store the Slack account and queue the team.info lookup for its
+    workspace URL.
+    """
+    logger.info(f"💾 Saving Slack account to database...")
+    workspace_id = fields['workspace_id']
+    slack_account, created = SlackAccount.objects.update_or_create(
+        workspace_id=workspace_id,
+        defaults={
+            'workspace_name': fields['workspace_name'],
+            'slack_access_token': fields['slack_access_token'],
+            'onsync_bot_user_id': fields['onsync_bot_user_id'],
+            'client_account_id': client_account_id,
+            # Slack just issued this token
+            'token_status': 'valid',
+            'token_error': '',
+            'token_checked_at': timezone.now(),
+        }
+    )
+    
+    action = "created" if created else "updated"
+    logger.info(f"✅ Slack account {action} successfully!")
+    logger.info(f"   Workspace ID: {workspace_id}")
+    logger.info(f"   Workspace Name: {fields['workspace_name']}")
+    logger.info(f"   Bot User ID: {fields['onsync_bot_user_id'] or 'N/A'}")
+    logger.info(f"   Client Account: {client_account_id}")
+    logger.info(f"   Action: {action.upper()}")
+    
+    # The workspace URL is only cosmetic; a broker outage must not fail the install
+    try:
+        fetch_slack_team_info.delay(workspace_id)
+    except Exception as e:
+        logger.warning(f"⚠️  Could not queue team.info lookup for {workspace_id}: {str(e)}")
+    
+    return slack_account
+
+
 @api_view(['GET'])
 @permission_classes([AllowAny])  # OAuth callback doesn't need authentication
 def slack_oauth_callback(request):
@@ -25,173 +181,64 @@ def slack_oauth_callback(request):
     Flow:
     1. User clicks "Add to Slack" button
     2. Slack redirects here with a 'code' parameter
-    3. Exchange code for access token
-    4. Fetch workspace details
-    5. Save to slack_accounts table
-    6. Return JSON response with success/failure
+    3. Exchange code for access token (pooled connection to slack.com)
+    4. Save to slack_accounts table
+    5. Redirect to the success page
+    
+    The workspace URL (team.info) is fetched afterwards by a Celery task.
     
     URL: https://slack.onsync.ai/oauth/callback?code=xxx&state=xxx
     """
+    code, error_response = _callback_code(request)
+    if error_response:
+        return error_response
     
-    # 1. Get the code from Slack's redirect
-    code = request.GET.get('code')
-    state = request.GET.get('state')  # For CSRF protection
-    error = request.GET.get('error')
+    try:
+        token_data = slack_api_call('oauth.v2.access', data=_token_request_data(code))
+        fields, error_response = _parse_token_data(token_data)
+        if error_response:
+            return error_response
+        
+        _save_slack_account(fields, _client_account_id(request))
+        return redirect('https://onsync.ai/slack-app-success')
     
-    # Handle authorization denial
-    if error:
-        logger.error(f"❌ Slack OAuth Error: User denied authorization - {error}")
-        return JsonResponse({
-            'success': False,
-            'error': error,
-            'message': 'User denied authorization or authorization failed'
-        }, status=400)
+    except requests.RequestException as e:
+        logger.error(f"❌ Network error during Slack OAuth: {str(e)}", exc_info=True)
+        return _oauth_error('network_error', f'Network error while communicating with Slack: {str(e)}', status=500)
     
-    if not code:
-        logger.error("❌ Slack OAuth Error: No authorization code received from Slack")
-        return JsonResponse({
-            'success': False,
-            'error': 'no_code',
-            'message': 'No authorization code received from Slack'
-        }, status=400)
+    except Exception as e:
+        logger.error(f"❌ Unexpected error during Slack OAuth: {str(e)}", exc_info=True)
+        return _oauth_error('server_error', f'An unexpected error occurred: {str(e)}', status=500)
+
+
+async def aslack_oauth_callback(request):
+    """
+    Async Slack OAuth callback, for deployments served by config.asgi.
+    Enabled with SLACK_ASYNC_OAUTH_CALLBACK.
+    
+    Same flow as slack_oauth_callback, but the worker isn't held while
+    waiting on Slack.
+    """
+    code, error_response = _callback_code(request)
+    if error_response:
+        return error_response
     
     try:
-        # 2. Exchange code for access token
-        logger.info(f"Code Received: {code}")
-        logger.info(f"🔄 Exchanging authorization code for access token...")
-        token_response = requests.post(
-            'https://slack.com/api/oauth.v2.access',
-            data={
-                'client_id': settings.SLACK_CLIENT_ID,
-                'client_secret': settings.SLACK_CLIENT_SECRET,
-                'code': code,
-                'redirect_uri': settings.SLACK_REDIRECT_URI
-            },
-            timeout=10
-        )
-        
-        token_data = token_response.json()
-        
-        if not token_data.get('ok'):
-            error_msg = token_data.get('error', 'unknown_error')
-            logger.error(f"❌ Slack OAuth token exchange failed: {error_msg}")
-            logger.error(f"   Full response: {token_data}")
-            return JsonResponse({
-                'success': False,
-                'error': error_msg,
-                'message': f'Failed to exchange code for token: {error_msg}'
-            }, status=400)
-        
-        # 3. Extract data from OAuth response
-        access_token = token_data.get('access_token')
-        bot_user_id = token_data.get('bot_user_id')
-        team_info = token_data.get('team', {})
-        workspace_id = team_info.get('id')
-        workspace_name = team_info.get('name')
-        authed_user = token_data.get('authed_user', {})
-        
-        logger.info(f"✅ Successfully obtained access token")
-        logger.info(f"   Workspace: {workspace_name} ({workspace_id})")
-        logger.info(f"   Bot User ID: {bot_user_id}")
-        logger.info(f"   Authorized User: {authed_user.get('id', 'N/A')}")
-        
-        if not all([access_token, workspace_id, workspace_name]):
-            logger.error(f"❌ Missing required data in Slack OAuth response")
-            logger.error(f"   Access Token: {'Present' if access_token else 'Missing'}")
-            logger.error(f"   Workspace ID: {workspace_id or 'Missing'}")
-            logger.error(f"   Workspace Name: {workspace_name or 'Missing'}")
-            return JsonResponse({
-                'success': False,
-                'error': 'missing_data',
-                'message': 'Incomplete data received from Slack OAuth'
-            }, status=400)
-        
-        # 4. Fetch workspace URL using team.info API
-        logger.info(f"🔄 Fetching additional workspace details...")
-        team_info_response = requests.get(
-            'https://slack.com/api/team.info',
-            headers={'Authorization': f'Bearer {access_token}'},
-            timeout=10
-        )
-        
-        team_info_data = team_info_response.json()
-        workspace_url = None
-        
-        if team_info_data.get('ok'):
-            domain = team_info_data.get('team', {}).get('domain')
-            if domain:
-                workspace_url = f"{domain}.slack.com"
-                logger.info(f"   Workspace URL: {workspace_url}")
-        else:
-            logger.warning(f"⚠️  Could not fetch team.info: {team_info_data.get('error')}")
-            logger.warning(f"   Continuing without workspace URL")
-        
-        # 5. Get client_account_id from state or query parameter
-        client_account_id = None
-        
-        # Try to extract from state parameter
-        if state and state.startswith('account_'):
-            try:
-                client_account_id = int(state.replace('account_', ''))
-                logger.info(f"   Client Account ID from state: {client_account_id}")
-            except ValueError:
-                logger.warning(f"⚠️  Invalid account_id in state: {state}")
-        
-        # Fallback to query parameter
-        if not client_account_id:
-            account_id_param = request.GET.get('account_id')
-            if account_id_param:
-                try:
-                    client_account_id = int(account_id_param)
-                    logger.info(f"   Client Account ID from query: {client_account_id}")
-                except ValueError:
-                    logger.warning(f"⚠️  Invalid account_id parameter: {account_id_param}")
-        
-        # Default to account 1 if not specified
-        if not client_account_id:
-            client_account_id = 1
-            logger.warning(f"⚠️  No account_id specified, defaulting to: {client_account_id}")
-        
-        # 6. Save to slack_accounts table
-        logger.info(f"💾 Saving Slack account to database...")
-        slack_account, created = SlackAccount.objects.update_or_create(
-            workspace_id=workspace_id,
-            defaults={
-                'workspace_name': workspace_name,
-                'workspace_url': workspace_url,
-                'slack_access_token': access_token,
-                'onsync_bot_user_id': bot_user_id,
-                'client_account_id': client_account_id,
-            }
-        )
+        token_data = await aslack_api_call('oauth.v2.access', data=_token_request_data(code))
+        fields, error_response = _parse_token_data(token_data)
+        if error_response:
+            return error_response
         
-        action = "created" if created else "updated"
-        logger.info(f"✅ Slack account {action} successfully!")
-        logger.info(f"   Workspace ID: {workspace_id}")
-        logger.info(f"   Workspace Name: {workspace_name}")
-        logger.info(f"   Workspace URL: {workspace_url or 'N/A'}")
-        logger.info(f"   Bot User ID: {bot_user_id or 'N/A'}")
-        logger.info(f"   Client Account: {client_account_id}")
-        logger.info(f"   Action: {action.upper()}")
-        
-        # 7. Redirect to success page
+        await sync_to_async(_save_slack_account)(fields, _client_account_id(request))
         return redirect('https://onsync.ai/slack-app-success')
-        
-    except requests.RequestException as e:
+    
+    except httpx.HTTPError as e:
         logger.error(f"❌ Network error during Slack OAuth: {str(e)}", exc_info=True)
-        return JsonResponse({
-            'success': False,
-            'error': 'network_error',
-            'message': f'Network error while communicating with Slack: {str(e)}'
-        }, status=500)
+        return _oauth_error('network_error', f'Network error while communicating with Slack: {str(e)}', status=500)
     
     except Exception as e:
         logger.error(f"❌ Unexpected error during Slack OAuth: {str(e)}", exc_info=True)
-        return JsonResponse({
-            'success': False,
-            'error': 'server_error',
-            'message': f'An unexpected error occurred: {str(e)}'
-        }, status=500)
+        return _oauth_error('server_error', f'An unexpected error occurred: {str(e)}', status=500)
 
 
 @api_view(['GET'])
@@ -235,8 +282,10 @@ def list_slack_accounts(request):
     
     Optional filters:
     - account_id: Filter by client account
+    - token_status: valid, invalid or unknown (from the last auth.test sweep)
     """
     account_id = request.query_params.get('account_id')
+    token_status = request.query_params.get('token_status')
     
     logger.info(f"📋 Listing Slack accounts")
     if account_id:
@@ -247,6 +296,9 @@ def list_slack_accounts(request):
     if account_id:
         queryset = queryset.filter(client_account_id=account_id)
     
+    if token_status:
+        queryset = queryset.filter(token_status=token_status)
+    
     logger.info(f"   Found {queryset.count()} Slack account(s)")
     
     serializer = SlackAccountSerializer(queryset, many=True)
@@ -311,3 +363,77 @@ def slack_oauth_test(request):
     }
     
     return Response(config_status)
+
+
+def _command_reply(text):
+    return JsonResponse({'response_type': 'ephemeral', 'text': text})
+
+
+@csrf_exempt
+@require_POST
+def slack_command(request):
+    """
+    Handle the /cronhook slash command.
+    
+    - /cronhook run <name>: queue the webhook and acknowledge; the result
+      is posted to response_url when the run finishes
+    - /cronhook status <name>: reply with the latest execution
+    
+    Webhooks are looked up by name within the workspace's client account.
+    
+    URL: https://slack.onsync.ai/slack/commands
+    """
+    if not verify_signature(
+        request.body,
+        request.headers.get('X-Slack-Request-Timestamp'),
+        request.headers.get('X-Slack-Signature'),
+    ):
+        logger.warning("⚠️  Rejected slash command with an invalid signature")
+        return HttpResponse(status=401)
+    
+    team_id = request.POST.get('team_id')
+    client_account_id = (
+        SlackAccount.objects.filter(workspace_id=team_id)
+        .values_list('client_account_id', flat=True)
+        .first()
+    )
+    if client_account_id is None:
+        return _command_reply('This workspace is not connected to CronHooks.')
+    
+    action, name = parse_command(request.POST.get('text'))
+    if action not in ('run', 'status') or not name:
+        return _command_reply(USAGE)
+    
+    try:
+        webhook = resolve_webhook(client_account_id, name)
+    except Webhook.DoesNotExist:
+        return _command_reply(f'No webhook named *{name}*.')
+    if webhook is None:
+        return _command_reply(f'Several webhooks are named *{name}*; rename one to run it from Slack.')
+    
+    if action == 'status':
+        execution = (
+            WebhookExecution.objects.filter(webhook_id=webhook.id)
+            .only('status', 'response_code', 'attempt_number', 'executed_at')
+            .first()
+        )
+        state = 'active' if webhook.is_active else 'inactive'
+        if execution is None:
+            return _command_reply(f'*{webhook.name}* ({state}) has not run yet.')
+        code = f' (HTTP {execution.response_code})' if execution.response_code else ''
+        return _command_reply(
+            f'*{webhook.name}* ({state}): last run {execution.status}{code} on attempt '
+            f'{execution.attempt_number} at {execution.executed_at:%Y-%m-%d %H:%M} UTC.'
+        )
+    
+    if not webhook.is_active:
+        return _command_reply(f'*{webhook.name}* is inactive; activate it before running it.')
+    
+    response_url = request.POST.get('response_url')
+    link = None
+    if is_slack_response_url(response_url):
+        link = post_slash_command_result.s(response_url, webhook.name)
+    execute_webhook.apply_async(args=[webhook.id], link=link)
+    
+    logger.info(f"⚡ Slash command run of webhook {webhook.id} from workspace {team_id} by {request.POST.get('user_id')}")
+    return _command_reply(f':hourglass_flowing_sand: Running *{webhook.name}*…')
@@ -23,6 +23,7 @@ class ShortURLAdmin(admin.ModelAdmin):
     
     list_filter = [
         'is_active',
+        'health_status',
         'domain',
         'created_at',
     ]
@@ -38,21 +39,38 @@ class ShortURLAdmin(admin.ModelAdmin):
     readonly_fields = [
         'short_code',
         'clicks',
+        'bot_clicks',
         'created_at',
         'updated_at',
         'full_short_url',
+        'health_status',
+        'health_status_code',
+        'health_latency_ms',
+        'health_error',
+        'health_checked_at',
     ]
     
     fieldsets = (
         ('URL Information', {
             'fields': ('short_code', 'original_url', 'full_short_url', 'domain')
         }),
+        ('Geo Targeting & Variants', {
+            'fields': ('geo_targets', 'destinations'),
+            'classes': ('collapse',)
+        }),
         ('Metadata', {
-            'fields': ('account', 'title', 'clicks')
+            'fields': ('account', 'title', 'clicks', 'bot_clicks')
         }),
         ('Status', {
             'fields': ('is_active', 'expires_at')
         }),
+        ('Destination Health', {
+            'fields': (
+                'health_status', 'health_status_code', 'health_latency_ms',
+                'health_error', 'health_checked_at',
+            ),
+            'classes': ('collapse',)
+        }),
         ('Timestamps', {
             'fields': ('created_at', 'updated_at'),
             'classes': ('collapse',)
@@ -111,6 +129,7 @@ class ClickAnalyticsAdmin(admin.ModelAdmin):
         'referer',
         'country',
         'city',
+        'variant',
     ]
     
     date_hierarchy = 'clicked_at'
@@ -0,0 +1,146 @@
+"""
+Click ingestion for URL Shortener.
+Records raw click analytics and keeps the rollup tables up to date.
+"""
+import logging
+from datetime import timezone as dt_timezone
+from urllib.parse import urlparse
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.db.models import F
+
+from .geoip import lookup_country
+from .models import ShortURL, ClickAnalytics, ClickHourlyRollup, ClickDailyRollup, UniqueVisitorSketch
+
+logger = logging.getLogger(__name__)
+
+
+def referrer_host(referer):
+    """Extract the host from a referer URL ('' if there is none)"""
+    if not referer:
+        return ''
+    try:
+        host = urlparse(referer).hostname or ''
+    except ValueError:
+        return ''
+    return host[:255]
+
+
+def rollup_buckets(clicked_at):
+    """Return the (hour, day) rollup buckets a click falls into, in UTC"""
+    clicked_at = clicked_at.astimezone(dt_timezone.utc)
+    return clicked_at.replace(minute=0, second=0, microsecond=0), clicked_at.date()
+
+
+def update_rollups(short_url_id, clicked_at, country='', referer='', variant='', count=1):
+    """Add clicks to the hourly and daily rollups"""
+    hour, day = rollup_buckets(clicked_at)
+    dimensions = {
+        'short_url_id': short_url_id,
+        'country': country or '',
+        'referrer_host': referrer_host(referer),
+        'variant': variant or '',
+    }
+    ClickHourlyRollup.increment(count=count, hour=hour, **dimensions)
+    ClickDailyRollup.increment(count=count, day=day, **dimensions)
+
+
+def get_client_country(ip_address):
+    """
+    Get country from IP address using the in-memory range index, or
+    GeoIP2 if no range file is configured (optional).
+    Returns empty string if neither is configured.
+    """
+    country = lookup_country(ip_address)
+    if country is not None:
+        return country
+    try:
+        from django.contrib.gis.geoip2 import GeoIP2
+        g = GeoIP2()
+        country = g.country_code(ip_address)
+        return country or ''
+    except:
+        return ''
+
+
+def record_click(short_url_id, ip_address=None, user_agent='', referer='', country=None, variant=''):
+    """
+    Record a click on a short URL.
+    
+    Increments the click counter, stores the raw ClickAnalytics row and
+    updates the rollups and the day's unique visitor sketch in one
+    transaction. The country is looked up from the IP if not given.
+    """
+    if country is None:
+        country = get_client_country(ip_address) if ip_address else ''
+    
+    with transaction.atomic():
+        ShortURL.objects.filter(pk=short_url_id).update(clicks=F('clicks') + 1)
+        click = ClickAnalytics.objects.create(
+            short_url_id=short_url_id,
+            ip_address=ip_address,
+            user_agent=user_agent,
+            referer=referer,
+            country=country,
+            variant=variant or '',
+        )
+        update_rollups(short_url_id, click.clicked_at, country, referer, variant)
+        if ip_address:
+            _, day = rollup_buckets(click.clicked_at)
+            UniqueVisitorSketch.add_visitor(short_url_id, day, ip_address)
+    return click
+
+
+def record_bot_click(short_url_id, count=1):
+    """Count bot hits with a single UPDATE instead of full analytics"""
+    ShortURL.objects.filter(pk=short_url_id).update(bot_clicks=F('bot_clicks') + count)
+
+
+def emit_bot_click(short_url_id):
+    """Hand a bot hit off for counting, like emit_click()"""
+    if getattr(settings, 'SHORT_URL_CLICK_TASKS', False):
+        from .tasks import record_bot_click_task
+        try:
+            record_bot_click_task.delay(short_url_id)
+            return
+        except Exception as e:
+            logger.warning(f"Could not queue bot hit for short URL {short_url_id}: {str(e)}")
+    
+    record_bot_click(short_url_id)
+
+
+def emit_click(short_url_id, ip_address=None, user_agent='', referer='', country=None, variant=''):
+    """
+    Hand a click off for recording.
+    
+    With SHORT_URL_CLICK_TASKS enabled the click is queued to Celery so the
+    redirect does not wait on analytics writes; otherwise, or if the broker
+    is unreachable, it is recorded inline, and dropped (with an error
+    logged) if that fails. A country already resolved by the redirect is
+    passed along instead of being looked up again.
+    """
+    click = {
+        'short_url_id': short_url_id,
+        'ip_address': ip_address,
+        'user_agent': user_agent,
+        'referer': referer,
+    }
+    if country is not None:
+        click['country'] = country
+    if variant:
+        click['variant'] = variant
+    
+    if getattr(settings, 'SHORT_URL_CLICK_TASKS', False):
+        from .tasks import record_click_task
+        try:
+            record_click_task.delay(**click)
+            return
+        except Exception as e:
+            logger.warning(f"Could not queue click for short URL {short_url_id}: {str(e)}")
+    
+    # The visitor is redirected even if the click can't be stored
+    try:
+        record_click(**click)
+    except DatabaseError as e:
+        logger.error(f"Could not record click for short URL {short_url_id}: {str(e)}")
@@ -0,0 +1,121 @@
+"""
+Redirect cache for URL Shortener.
+Keeps the fields a redirect needs in the Django cache, keyed by domain and
+short code, so hot links are served without touching the database.
+
+Changes to a link invalidate its entry, which only reaches every process
+with a shared cache (CACHE_URL). With the default local memory cache,
+lookups go straight to the database instead, so deactivated links stop
+redirecting everywhere at once.
+"""
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from webhooks.caching import cache_is_shared
+
+from .models import ShortURL
+
+logger = logging.getLogger(__name__)
+
+# Cached for codes that do not resolve, so scans for random codes stay cheap
+MISSING = {}
+
+
+def link_cache_key(domain, short_code):
+    """Cache key for a short link"""
+    return f'shorturl:{domain}:{short_code}'
+
+
+def link_entry(short_url):
+    """Build the cache entry for a short URL"""
+    return {
+        'id': short_url.pk,
+        'original_url': short_url.original_url,
+        'expires_at': short_url.expires_at.timestamp() if short_url.expires_at else None,
+        'geo': short_url.geo_targets or None,
+        'variants': short_url.destination_table or None,
+    }
+
+
+def is_entry_expired(entry):
+    """Check a cache entry's expiry without loading the model"""
+    return entry['expires_at'] is not None and time.time() > entry['expires_at']
+
+
+def _timeout(entry):
+    if entry is MISSING:
+        return getattr(settings, 'SHORT_URL_MISSING_CACHE_TIMEOUT', 30)
+    return getattr(settings, 'SHORT_URL_CACHE_TIMEOUT', 300)
+
+
+def _link_queryset(domain, short_code):
+    return ShortURL.objects.filter(
+        short_code=short_code,
+        domain=domain,
+        is_active=True
+    ).only('id', 'original_url', 'expires_at', 'geo_targets', 'destination_table')
+
+
+def get_link(domain, short_code):
+    """
+    Return the cache entry for an active short link, or None.
+    Falls back to the database if the cache is unavailable or not shared.
+    """
+    if not cache_is_shared():
+        short_url = _link_queryset(domain, short_code).first()
+        return link_entry(short_url) if short_url else None
+    
+    key = link_cache_key(domain, short_code)
+    try:
+        entry = cache.get(key)
+    except Exception as e:
+        logger.warning(f"Redirect cache read failed: {str(e)}")
+        entry = None
+    
+    if entry is None:
+        short_url = _link_queryset(domain, short_code).first()
+        entry = link_entry(short_url) if short_url else MISSING
+        try:
+            cache.set(key, entry, _timeout(entry))
+        except Exception as e:
+            logger.warning(f"Redirect cache write failed: {str(e)}")
+    
+    return entry or None
+
+
+async def aget_link(domain, short_code):
+    """Async version of get_link()"""
+    if not cache_is_shared():
+        short_url = await _link_queryset(domain, short_code).afirst()
+        return link_entry(short_url) if short_url else None
+    
+    key = link_cache_key(domain, short_code)
+    try:
+        entry = await cache.aget(key)
+    except Exception as e:
+        logger.warning(f"Redirect cache read failed: {str(e)}")
+        entry = None
+    
+    if entry is None:
+        short_url = await _link_queryset(domain, short_code).afirst()
+        entry = link_entry(short_url) if short_url else MISSING
+        try:
+            await cache.aset(key, entry, _timeout(entry))
+        except Exception as e:
+            logger.warning(f"Redirect cache write failed: {str(e)}")
+    
+    return entry or None
+
+
+def invalidate_links(links):
+    """Drop cached entries for (domain, short_code) pairs"""
+    keys = [link_cache_key(domain, short_code) for domain, short_code in links]
+    if not keys:
+        return
+    try:
+        cache.delete_many(keys)
+    except Exception as e:
+        logger.warning(f"Redirect cache invalidation failed: {str(e)}")
@@ -0,0 +1,166 @@
+"""
+In-memory IP range to country index.
+
+Loads a CSV of ``start_ip,end_ip,country`` rows (the layout of the DB-IP
+and IP2Location "lite" country files; addresses may be dotted strings or
+integers) into sorted arrays, so a lookup is one bisect with no database
+or network call. IPv4 ranges are kept in packed 32-bit arrays; country
+codes are packed two bytes per range.
+"""
+import csv
+import ipaddress
+import logging
+import socket
+import threading
+from array import array
+from bisect import bisect_right
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Placeholder codes some range files use for unassigned blocks
+UNKNOWN_COUNTRIES = {'', '-', 'ZZ', 'XX'}
+
+
+def _parse_ip(value):
+    value = value.strip()
+    if value.isdigit():
+        number = int(value)
+        return ipaddress.ip_address(number) if number <= 0xFFFFFFFF else ipaddress.IPv6Address(number)
+    return ipaddress.ip_address(value)
+
+
+class _RangeTable:
+    """Sorted, non-overlapping ranges of one address family"""
+
+    def __init__(self, starts, ends, countries):
+        self.starts = starts
+        self.ends = ends
+        self.countries = countries
+
+    def __len__(self):
+        return len(self.starts)
+
+    def lookup(self, value):
+        i = bisect_right(self.starts, value) - 1
+        if i < 0 or value > self.ends[i]:
+            return ''
+        return self.countries[2 * i:2 * i + 2].decode('ascii')
+
+
+class IPRangeIndex:
+    """Country lookup over IPv4 and IPv6 ranges"""
+
+    def __init__(self, ranges):
+        """`ranges` is an iterable of (start, end, country) with ipaddress objects"""
+        by_family = {4: [], 6: []}
+        for start, end, country in ranges:
+            if start.version != end.version or int(end) < int(start):
+                continue
+            by_family[start.version].append((int(start), int(end), country))
+
+        # 'I' is 32 bits on every platform we deploy to; IPv6 needs Python ints
+        self.ipv4 = self._build(by_family[4], lambda: array('I'))
+        self.ipv6 = self._build(by_family[6], list)
+
+    @staticmethod
+    def _build(rows, container):
+        starts, ends, countries = container(), container(), bytearray()
+        previous_end = -1
+        for start, end, country in sorted(rows):
+            if end <= previous_end:
+                continue
+            start = max(start, previous_end + 1)
+            code = country.encode('ascii')
+            # Merge adjacent ranges of the same country
+            if ends and start == previous_end + 1 and countries[-2:] == code:
+                ends[-1] = end
+            else:
+                starts.append(start)
+                ends.append(end)
+                countries += code
+            previous_end = end
+        return _RangeTable(starts, ends, bytes(countries))
+
+    def __len__(self):
+        return len(self.ipv4) + len(self.ipv6)
+
+    def country(self, ip_address):
+        """ISO country code for an address, or '' if unknown"""
+        try:
+            # inet_pton is several times faster than ipaddress for IPv4
+            return self.ipv4.lookup(int.from_bytes(socket.inet_pton(socket.AF_INET, ip_address), 'big'))
+        except (OSError, TypeError):
+            pass
+        try:
+            address = ipaddress.ip_address(ip_address)
+        except ValueError:
+            return ''
+        if address.version == 6 and address.ipv4_mapped:
+            address = address.ipv4_mapped
+        table = self.ipv4 if address.version == 4 else self.ipv6
+        return table.lookup(int(address))
+
+    @classmethod
+    def from_csv(cls, path):
+        """Load a range file"""
+        def rows():
+            with open(path, newline='', encoding='utf-8') as f:
+                for row in csv.reader(f):
+                    if len(row) < 3:
+                        continue
+                    country = row[2].strip().upper()
+                    if country in UNKNOWN_COUNTRIES or len(country) != 2 or not country.isascii():
+                        continue
+                    try:
+                        yield _parse_ip(row[0]), _parse_ip(row[1]), country
+                    except ValueError:
+                        # Header line or malformed row
+                        continue
+        return cls(rows())
+
+
+_index = None
+_index_loaded = False
+_index_lock = threading.Lock()
+
+
+def get_ip_index():
+    """
+    The process-wide index, loaded on first use from
+    SHORT_URL_GEOIP_RANGES_FILE. None if no file is configured.
+    """
+    global _index, _index_loaded
+    if _index_loaded:
+        return _index
+    with _index_lock:
+        if not _index_loaded:
+            path = getattr(settings, 'SHORT_URL_GEOIP_RANGES_FILE', '')
+            if path:
+                try:
+                    _index = IPRangeIndex.from_csv(path)
+                    logger.info(f"Loaded {len(_index)} IP ranges from {path}")
+                except OSError as e:
+                    logger.warning(f"Could not load IP ranges from {path}: {str(e)}")
+            _index_loaded = True
+    return _index
+
+
+def reset_ip_index():
+    """Forget the loaded index (e.g. after the range file is replaced)"""
+    global _index, _index_loaded
+    with _index_lock:
+        _index = None
+        _index_loaded = False
+
+
+def lookup_country(ip_address):
+    """
+    Country for an IP from the in-memory index.
+    Returns None if no index is configured, '' if the IP is not covered.
+    """
+    index = get_ip_index()
+    if index is None or not ip_address:
+        return None
+    return index.country(ip_address)
@@ -0,0 +1,154 @@
+"""
+Destination health checks for short links.
+
+Active links are checked in batches, stalest first. Each batch is probed
+concurrently over one pooled httpx client, bounded both globally and per
+destination host so a burst of links to one site (e.g. Stripe checkout)
+does not hammer it. Links sharing a destination are probed once.
+"""
+import asyncio
+import logging
+import time
+from datetime import timedelta
+from urllib.parse import urlsplit
+
+import httpx
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import ShortURL
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = 'Cronhooks-LinkChecker/1.0'
+
+# Servers that do not implement HEAD answer with these; retry with GET
+HEAD_UNSUPPORTED = {405, 501}
+
+# Rate limited: no verdict on the destination itself
+INCONCLUSIVE_STATUS_CODES = {429}
+
+
+def classify(status_code):
+    """Map a probe's HTTP status (None on network errors) to a health status"""
+    if status_code in INCONCLUSIVE_STATUS_CODES:
+        return 'unknown'
+    if status_code is None or status_code >= 400:
+        return 'broken'
+    return 'ok'
+
+
+async def probe(client, url):
+    """
+    Probe a destination with HEAD, falling back to GET.
+    Returns a dict with status_code, latency_ms and error.
+    """
+    started = time.monotonic()
+    try:
+        response = await client.head(url)
+        if response.status_code in HEAD_UNSUPPORTED:
+            # Only the status line is needed, so don't download the body
+            async with client.stream('GET', url) as response:
+                pass
+        return {
+            'status_code': response.status_code,
+            'latency_ms': int((time.monotonic() - started) * 1000),
+            'error': '',
+        }
+    except httpx.TimeoutException:
+        error = 'Timed out'
+    except httpx.HTTPError as e:
+        error = f'{type(e).__name__}: {e}'
+    return {
+        'status_code': None,
+        'latency_ms': int((time.monotonic() - started) * 1000),
+        'error': error[:255],
+    }
+
+
+async def probe_urls(client, urls, concurrency, per_host):
+    """Probe distinct URLs concurrently; returns {url: result}"""
+    limit = asyncio.Semaphore(concurrency)
+    host_limits = {}
+
+    async def run(url):
+        host = (urlsplit(url).hostname or '').lower()
+        host_limit = host_limits.setdefault(host, asyncio.Semaphore(per_host))
+        async with host_limit, limit:
+            return url, await probe(client, url)
+
+    return dict(await asyncio.gather(*(run(url) for url in urls)))
+
+
+def links_due(now=None):
+    """Active, unexpired links not checked within the check interval"""
+    now = now or timezone.now()
+    cutoff = now - timedelta(seconds=settings.SHORT_URL_HEALTH_CHECK_INTERVAL)
+    return (
+        ShortURL.objects.filter(is_active=True)
+        .filter(Q(expires_at__isnull=True) | Q(expires_at__gt=now))
+        .filter(Q(health_checked_at__isnull=True) | Q(health_checked_at__lt=cutoff))
+        .order_by(F('health_checked_at').asc(nulls_first=True), 'id')
+    )
+
+
+def _load_batch(batch_size, now):
+    return list(links_due(now).only('id', 'original_url')[:batch_size])
+
+
+def _save_batch(links, results, now):
+    """Write probe results without touching updated_at"""
+    for link in links:
+        result = results[link.original_url]
+        link.health_status = classify(result['status_code'])
+        link.health_status_code = result['status_code']
+        link.health_latency_ms = result['latency_ms']
+        link.health_error = result['error']
+        link.health_checked_at = now
+    ShortURL.objects.bulk_update(links, [
+        'health_status',
+        'health_status_code',
+        'health_latency_ms',
+        'health_error',
+        'health_checked_at',
+    ])
+    return sum(1 for link in links if link.health_status == 'broken')
+
+
+async def _check_links(limit, batch_size, transport=None):
+    summary = {'checked': 0, 'broken': 0}
+    client = httpx.AsyncClient(
+        timeout=settings.SHORT_URL_HEALTH_CHECK_TIMEOUT,
+        follow_redirects=True,
+        headers={'User-Agent': USER_AGENT},
+        limits=httpx.Limits(max_connections=settings.SHORT_URL_HEALTH_CHECK_CONCURRENCY),
+        transport=transport,
+    )
+    async with client:
+        while limit is None or summary['checked'] < limit:
+            now = timezone.now()
+            size = batch_size if limit is None else min(batch_size, limit - summary['checked'])
+            links = await sync_to_async(_load_batch)(size, now)
+            if not links:
+                break
+
+            results = await probe_urls(
+                client,
+                {link.original_url for link in links},
+                concurrency=settings.SHORT_URL_HEALTH_CHECK_CONCURRENCY,
+                per_host=settings.SHORT_URL_HEALTH_CHECK_PER_HOST,
+            )
+            summary['broken'] += await sync_to_async(_save_batch)(links, results, now)
+            summary['checked'] += len(links)
+    return summary
+
+
+def check_link_health(limit=None, batch_size=None, transport=None):
+    """
+    Check the destinations of links that are due.
+    Returns a summary dict with checked and broken counts.
+    """
+    batch_size = batch_size or settings.SHORT_URL_HEALTH_CHECK_BATCH_SIZE
+    return async_to_sync(_check_links)(limit, batch_size, transport=transport)
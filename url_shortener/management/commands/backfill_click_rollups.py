@@ -0,0 +1,115 @@
+"""
+Management command to rebuild click rollups from raw click analytics.
+"""
+from collections import Counter, defaultdict
+from datetime import timezone as dt_timezone
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import TruncDate, TruncHour
+
+from url_shortener.analytics import referrer_host, rollup_buckets
+from url_shortener.hyperloglog import HyperLogLog
+from url_shortener.models import (
+    ClickAnalytics,
+    ClickHourlyRollup,
+    ClickDailyRollup,
+    UniqueVisitorSketch,
+)
+
+
+class Command(BaseCommand):
+    help = 'Rebuild hourly and daily click rollups and unique visitor sketches from ClickAnalytics'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--short-url',
+            type=int,
+            default=None,
+            help='Only rebuild rollups for this ShortURL id (default: all)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Rows per bulk insert (default: 1000)',
+        )
+
+    def handle(self, *args, **options):
+        short_url_id = options['short_url']
+        batch_size = options['batch_size']
+        
+        clicks = ClickAnalytics.objects.all()
+        if short_url_id:
+            clicks = clicks.filter(short_url_id=short_url_id)
+        
+        # Let the database group by hour; referrer hosts are parsed here
+        grouped = (
+            clicks.order_by()
+            .annotate(bucket=TruncHour('clicked_at'))
+            .values('short_url_id', 'bucket', 'country', 'referer', 'variant')
+            .annotate(count=Count('id'))
+        )
+        
+        hourly = Counter()
+        daily = Counter()
+        for row in grouped.iterator(chunk_size=batch_size):
+            hour, day = rollup_buckets(row['bucket'])
+            dimensions = (row['country'] or '', referrer_host(row['referer']), row['variant'] or '')
+            hourly[(row['short_url_id'], hour) + dimensions] += row['count']
+            daily[(row['short_url_id'], day) + dimensions] += row['count']
+        
+        # One row per distinct visitor per day is enough for the sketches
+        sketches = defaultdict(HyperLogLog)
+        visitors = (
+            clicks.order_by()
+            .exclude(ip_address__isnull=True)
+            .annotate(day=TruncDate('clicked_at', tzinfo=dt_timezone.utc))
+            .values_list('short_url_id', 'day', 'ip_address')
+            .distinct()
+        )
+        for short_url, day, ip_address in visitors.iterator(chunk_size=batch_size):
+            sketches[(short_url, day)].add(ip_address)
+        
+        with transaction.atomic():
+            for model in (ClickHourlyRollup, ClickDailyRollup, UniqueVisitorSketch):
+                existing = model.objects.all()
+                if short_url_id:
+                    existing = existing.filter(short_url_id=short_url_id)
+                existing.delete()
+            
+            ClickHourlyRollup.objects.bulk_create(
+                [
+                    ClickHourlyRollup(
+                        short_url_id=key[0], hour=key[1], country=key[2],
+                        referrer_host=key[3], variant=key[4], clicks=count,
+                    )
+                    for key, count in hourly.items()
+                ],
+                batch_size=batch_size,
+            )
+            ClickDailyRollup.objects.bulk_create(
+                [
+                    ClickDailyRollup(
+                        short_url_id=key[0], day=key[1], country=key[2],
+                        referrer_host=key[3], variant=key[4], clicks=count,
+                    )
+                    for key, count in daily.items()
+                ],
+                batch_size=batch_size,
+            )
+            UniqueVisitorSketch.objects.bulk_create(
+                [
+                    UniqueVisitorSketch(short_url_id=key[0], day=key[1], registers=hll.to_bytes())
+                    for key, hll in sketches.items()
+                ],
+                batch_size=batch_size,
+            )
+        
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'✓ Rebuilt {len(hourly)} hourly and {len(daily)} daily rollup rows, '
+                f'{len(sketches)} visitor sketches'
+            )
+        )
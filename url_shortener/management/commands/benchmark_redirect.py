@@ -0,0 +1,122 @@
+"""
+Management command to benchmark the short URL redirect path.
+"""
+import asyncio
+import time
+from unittest import mock
+
+from django.core.management.base import BaseCommand
+from django.conf import settings
+from django.db import transaction
+from django.test import RequestFactory, override_settings
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import AllowAny
+
+from url_shortener import views
+from url_shortener.cache import invalidate_links
+from url_shortener.models import ShortURL
+from webhooks.caching import cache_is_shared
+from webhooks.models import Account
+
+
+BENCHMARK_DOMAIN = 'bench.invalid'
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def drf_redirect_short_url(request, short_code):
+    """The redirect view wrapped in DRF, to measure DRF's own overhead"""
+    return views.redirect_short_url(request._request, short_code)
+
+
+class Rollback(Exception):
+    """Raised to discard the benchmark fixtures"""
+
+
+class Command(BaseCommand):
+    help = 'Measure redirects per second for the DRF, plain and async redirect views, with and without the cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=5000,
+            help='Requests per variant (default: 5000)',
+        )
+
+    def handle(self, *args, **options):
+        count = options['requests']
+        backend = settings.CACHES['default']['BACKEND']
+        shared = cache_is_shared()
+        
+        # Click recording is stubbed out in every variant so the numbers
+        # compare request handling and link lookup only. Each lookup mode
+        # is measured for every view, so view and cache gains stay apart.
+        try:
+            with transaction.atomic(), \
+                    override_settings(ALLOWED_HOSTS=[BENCHMARK_DOMAIN]), \
+                    mock.patch.object(views, 'emit_click'):
+                results = self._run(count)
+                raise Rollback
+        except Rollback:
+            pass
+        
+        self.stdout.write(f'Cache backend: {backend} ({"shared" if shared else "per process"})')
+        if not shared:
+            self.stdout.write(
+                'Redirects bypass a per-process cache, so without CACHE_URL they take the '
+                'database lookup path. The cached lookup rows treat this cache as shared.'
+            )
+        for mode, rows in results:
+            self.stdout.write(f'\n{mode}')
+            baseline = rows[0][1]
+            for label, rate in rows:
+                self.stdout.write(f'  {label:<12} {rate:>10,.0f} req/s  ({rate / baseline:.1f}x)')
+    
+    def _run(self, count):
+        account = Account.objects.create(name='Redirect benchmark')
+        short_url = ShortURL.objects.create(
+            account=account,
+            domain=BENCHMARK_DOMAIN,
+            original_url='https://example.com/benchmark',
+        )
+        code = short_url.short_code
+        invalidate_links([(BENCHMARK_DOMAIN, code)])
+        # A browser user agent, so requests take the visitor path
+        factory = RequestFactory(
+            HTTP_HOST=BENCHMARK_DOMAIN,
+            HTTP_USER_AGENT='Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36',
+        )
+        
+        def run_sync(view):
+            view(factory.get(f'/{code}/'), code)  # warm up
+            start = time.perf_counter()
+            for _ in range(count):
+                response = view(factory.get(f'/{code}/'), code)
+                assert response.status_code == 302, response.status_code
+            return count / (time.perf_counter() - start)
+        
+        async def run_async(view):
+            await view(factory.get(f'/{code}/'), code)  # warm up
+            start = time.perf_counter()
+            for _ in range(count):
+                response = await view(factory.get(f'/{code}/'), code)
+                assert response.status_code == 302, response.status_code
+            return count / (time.perf_counter() - start)
+        
+        results = []
+        with mock.patch('url_shortener.cache.cache_is_shared', return_value=False):
+            results.append(('Database lookup', [
+                ('DRF view', run_sync(drf_redirect_short_url)),
+                ('Plain view', run_sync(views.redirect_short_url)),
+            ]))
+        with mock.patch('url_shortener.cache.cache_is_shared', return_value=True):
+            rows = [
+                ('DRF view', run_sync(drf_redirect_short_url)),
+                ('Plain view', run_sync(views.redirect_short_url)),
+            ]
+            # The cache is warm by now, so the async view never needs the
+            # (uncommitted) database row, which its worker thread can't see.
+            rows.append(('Async view', asyncio.run(run_async(views.aredirect_short_url))))
+            results.append(('Cached lookup', rows))
+        return results
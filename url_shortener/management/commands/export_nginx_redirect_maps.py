@@ -0,0 +1,50 @@
+"""
+Management command to export short links into nginx map files.
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from url_shortener.nginx_maps import export_redirect_maps
+
+
+class Command(BaseCommand):
+    help = 'Export active short links into per-domain nginx redirect map files'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output-dir',
+            type=str,
+            default=None,
+            help='Directory for the map files (default: SHORT_URL_NGINX_MAP_DIR)',
+        )
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Re-export every domain, even if its links have not changed',
+        )
+        parser.add_argument(
+            '--no-reload',
+            action='store_true',
+            help='Do not reload nginx after writing maps',
+        )
+
+    def handle(self, *args, **options):
+        directory = options['output_dir'] or settings.SHORT_URL_NGINX_MAP_DIR
+        if not directory:
+            raise CommandError('Set SHORT_URL_NGINX_MAP_DIR or pass --output-dir')
+        
+        summary = export_redirect_maps(
+            directory=directory,
+            full=options['full'],
+            reload=not options['no_reload'],
+        )
+        
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✓ {len(summary['written'])} map(s) written, "
+                f"{len(summary['unchanged'])} unchanged, "
+                f"{len(summary['removed'])} removed"
+            )
+        )
+        if summary['reloaded']:
+            self.stdout.write(self.style.SUCCESS('✓ nginx reloaded'))
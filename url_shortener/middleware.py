@@ -1,7 +1,9 @@
 """
 Middleware for handling multiple domains in URL shortener.
 """
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
 from django.conf import settings
+from django.utils.functional import SimpleLazyObject
 from webhooks.models import Account
 
 
@@ -11,25 +13,43 @@ class MultiDomainMiddleware:
     
     This validates that incoming requests are from registered domains
     and adds domain context to the request.
+    
+    The domain check is lazy, so requests that never look at
+    is_short_url_domain (such as redirects) do not pay for a query.
+    Works in both sync and async middleware chains.
     """
+    sync_capable = True
+    async_capable = True
     
     def __init__(self, get_response):
         self.get_response = get_response
         # Cache of valid domains (refreshed periodically)
         self._valid_domains_cache = None
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
     
     def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        self._add_domain_context(request)
+        response = self.get_response(request)
+        return response
+    
+    async def __acall__(self, request):
+        self._add_domain_context(request)
+        return await self.get_response(request)
+    
+    def _add_domain_context(self, request):
         # Get the host from request
         host = request.get_host().split(':')[0]  # Remove port if present
         
         # Add domain to request for easy access
         request.short_url_domain = host
         
-        # Check if this is a short URL domain
-        request.is_short_url_domain = self._is_valid_short_url_domain(host)
-        
-        response = self.get_response(request)
-        return response
+        # Check if this is a short URL domain (evaluated on first use)
+        request.is_short_url_domain = SimpleLazyObject(
+            lambda: self._is_valid_short_url_domain(host)
+        )
     
     def _is_valid_short_url_domain(self, domain):
         """
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('url_shortener', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShortCodeSequence',
+            fields=[
+                ('domain', models.CharField(help_text='The domain this sequence allocates codes for', max_length=255, primary_key=True, serialize=False)),
+                ('next_value', models.BigIntegerField(default=0, help_text='Next unallocated sequence number')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'short_code_sequences',
+            },
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:04
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('url_shortener', '0002_shortcodesequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClickHourlyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('country', models.CharField(blank=True, max_length=2)),
+                ('referrer_host', models.CharField(blank=True, max_length=255)),
+                ('clicks', models.BigIntegerField(default=0)),
+                ('hour', models.DateTimeField(help_text='Start of the hour bucket (UTC)')),
+                ('short_url', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hourly_rollups', to='url_shortener.shorturl')),
+            ],
+            options={
+                'db_table': 'click_rollups_hourly',
+                'ordering': ['hour'],
+                'unique_together': {('short_url', 'hour', 'country', 'referrer_host')},
+            },
+        ),
+        migrations.CreateModel(
+            name='ClickDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('country', models.CharField(blank=True, max_length=2)),
+                ('referrer_host', models.CharField(blank=True, max_length=255)),
+                ('clicks', models.BigIntegerField(default=0)),
+                ('day', models.DateField(help_text='Day bucket (UTC)')),
+                ('short_url', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='url_shortener.shorturl')),
+            ],
+            options={
+                'db_table': 'click_rollups_daily',
+                'ordering': ['day'],
+                'unique_together': {('short_url', 'day', 'country', 'referrer_host')},
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('url_shortener', '0003_click_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UniqueVisitorSketch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(help_text='Day bucket (UTC)')),
+                ('registers', models.BinaryField(help_text='Compressed HyperLogLog registers')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('short_url', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='visitor_sketches', to='url_shortener.shorturl')),
+            ],
+            options={
+                'db_table': 'unique_visitor_sketches',
+                'ordering': ['day'],
+                'unique_together': {('short_url', 'day')},
+            },
+        ),
+    ]
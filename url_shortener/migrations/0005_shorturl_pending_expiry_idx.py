@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('url_shortener', '0004_uniquevisitorsketch'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='shorturl',
+            index=models.Index(condition=models.Q(('expires_at__isnull', False), ('is_active', True)), fields=['expires_at'], name='short_urls_pending_expiry_idx'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('url_shortener', '0006_trigram_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shorturl',
+            name='health_checked_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='shorturl',
+            name='health_error',
+            field=models.CharField(blank=True, help_text='Error details if the last check failed', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='shorturl',
+            name='health_latency_ms',
+            field=models.IntegerField(blank=True, help_text='Response time of the last check', null=True),
+        ),
+        migrations.AddField(
+            model_name='shorturl',
+            name='health_status',
+            field=models.CharField(choices=[('unknown', 'Unknown'), ('ok', 'OK'), ('broken', 'Broken')], default='unknown', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='shorturl',
+            name='health_status_code',
+            field=models.IntegerField(blank=True, help_text='HTTP status of the last check', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='shorturl',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['health_checked_at'], name='short_urls_health_check_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('url_shortener', '0007_shorturl_health'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shorturl',
+            name='geo_targets',
+            field=models.JSONField(blank=True, default=dict, help_text='Country code to destination URL overrides'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('url_shortener', '0008_shorturl_geo_targets'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='clickdailyrollup',
+            unique_together=set(),
+        ),
+        migrations.AlterUniqueTogether(
+            name='clickhourlyrollup',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='clickanalytics',
+            name='variant',
+            field=models.CharField(blank=True, max_length=50),
+        ),
+        migrations.AddField(
+            model_name='clickdailyrollup',
+            name='variant',
+            field=models.CharField(blank=True, max_length=50),
+        ),
+        migrations.AddField(
+            model_name='clickhourlyrollup',
+            name='variant',
+            field=models.CharField(blank=True, max_length=50),
+        ),
+        migrations.AddField(
+            model_name='shorturl',
+            name='destination_table',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='shorturl',
+            name='destinations',
+            field=models.JSONField(blank=True, default=list, help_text='Weighted destination URLs; original_url is used when empty'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='clickdailyrollup',
+            unique_together={('short_url', 'day', 'country', 'referrer_host', 'variant')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='clickhourlyrollup',
+            unique_together={('short_url', 'hour', 'country', 'referrer_host', 'variant')},
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('url_shortener', '0009_weighted_destinations'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shorturl',
+            name='bot_clicks',
+            field=models.BigIntegerField(default=0, help_text='Hits from bots, crawlers and link previews (not in clicks)'),
+        ),
+    ]
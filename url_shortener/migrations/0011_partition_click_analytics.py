@@ -0,0 +1,123 @@
+# Range-partition click_analytics by month (PostgreSQL only)
+#
+# Existing rows are not copied: the current table is renamed to
+# click_analytics_legacy and attached as the partition for everything
+# before next month. The slow parts (a unique index for the new primary
+# key, validating a CHECK constraint that lets ATTACH skip its scan) run
+# without blocking writes; the swap itself only touches the catalog.
+
+import re
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import migrations, transaction
+
+
+TABLE = 'click_analytics'
+LEGACY = 'click_analytics_legacy'
+SEQUENCE = 'click_analytics_partitioned_id_seq'
+MONTHS_AHEAD = 3
+
+
+def _add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def partition_click_analytics(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)', [TABLE])
+        if cursor.fetchone():
+            return
+
+    now = datetime.now(dt_timezone.utc)
+    cutover = _add_months(datetime(now.year, now.month, 1, tzinfo=dt_timezone.utc), 1)
+
+    # Index the partitioned primary key (id, clicked_at) will adopt
+    schema_editor.execute(
+        f'CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS click_analytics_id_clicked_at_key '
+        f'ON {TABLE} (id, clicked_at)'
+    )
+    # Prove every row is older than the cutover; VALIDATE does not block writes
+    schema_editor.execute(
+        f'ALTER TABLE {TABLE} ADD CONSTRAINT click_analytics_legacy_range '
+        f'CHECK (clicked_at < %s) NOT VALID',
+        [cutover],
+    )
+    schema_editor.execute(f'ALTER TABLE {TABLE} VALIDATE CONSTRAINT click_analytics_legacy_range')
+
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        # Give up rather than queue behind long-running queries
+        cursor.execute("SET LOCAL lock_timeout = '5s'")
+        cursor.execute(f'LOCK TABLE {TABLE} IN ACCESS EXCLUSIVE MODE')
+        cursor.execute(f'ALTER TABLE {TABLE} RENAME TO {LEGACY}')
+        cursor.execute(f'ALTER TABLE {LEGACY} ALTER COLUMN id DROP IDENTITY IF EXISTS')
+        cursor.execute(f'ALTER TABLE {LEGACY} ALTER COLUMN id DROP DEFAULT')
+
+        # Free the constraint and index names for the parent
+        cursor.execute(
+            'SELECT conname, contype, pg_get_constraintdef(oid) FROM pg_constraint '
+            "WHERE conrelid = %s::regclass AND contype IN ('p', 'f')",
+            [LEGACY],
+        )
+        constraints = cursor.fetchall()
+        cursor.execute(
+            'SELECT c.relname, pg_get_indexdef(i.indexrelid) FROM pg_index i '
+            'JOIN pg_class c ON c.oid = i.indexrelid '
+            'WHERE i.indrelid = %s::regclass AND NOT i.indisprimary AND NOT i.indisunique',
+            [LEGACY],
+        )
+        indexes = cursor.fetchall()
+        for name, kind, _ in constraints:
+            if kind == 'p':
+                cursor.execute(f'ALTER TABLE {LEGACY} RENAME CONSTRAINT {name} TO {LEGACY}_pkey')
+        for name, _ in indexes:
+            cursor.execute(f'ALTER INDEX {name} RENAME TO {name[:55]}_legacy')
+
+        # Partitioned parent with its own id sequence
+        cursor.execute(
+            f'CREATE TABLE {TABLE} (LIKE {LEGACY} INCLUDING DEFAULTS) '
+            f'PARTITION BY RANGE (clicked_at)'
+        )
+        cursor.execute(f'CREATE SEQUENCE {SEQUENCE} OWNED BY {TABLE}.id')
+        cursor.execute(f'SELECT setval(%s, COALESCE((SELECT MAX(id) FROM {LEGACY}), 0) + 1, false)', [SEQUENCE])
+        cursor.execute(f"ALTER TABLE {TABLE} ALTER COLUMN id SET DEFAULT nextval('{SEQUENCE}')")
+        cursor.execute(f'ALTER TABLE {TABLE} ADD CONSTRAINT {TABLE}_pkey PRIMARY KEY (id, clicked_at)')
+        for name, kind, definition in constraints:
+            if kind == 'f':
+                cursor.execute(f'ALTER TABLE {TABLE} ADD CONSTRAINT {name} {definition}')
+        for name, definition in indexes:
+            # Matching indexes on the legacy table are attached, not rebuilt
+            cursor.execute(re.sub(rf' ON (\S+\.)?{LEGACY} ', f' ON {TABLE} ', definition, count=1))
+
+        cursor.execute(
+            f'ALTER TABLE {TABLE} ATTACH PARTITION {LEGACY} FOR VALUES FROM (MINVALUE) TO (%s)',
+            [cutover],
+        )
+        month = cutover
+        for _ in range(MONTHS_AHEAD):
+            following = _add_months(month, 1)
+            cursor.execute(
+                f'CREATE TABLE {TABLE}_p{month:%Y%m} PARTITION OF {TABLE} FOR VALUES FROM (%s) TO (%s)',
+                [month, following],
+            )
+            month = following
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('url_shortener', '0010_shorturl_bot_clicks'),
+    ]
+
+    operations = [
+        # Not reversible in place; the partitioned table works with the
+        # same model, so reverting leaves it as is.
+        migrations.RunPython(partition_click_analytics, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Catch-all partition for click_analytics (PostgreSQL only)
+#
+# Without it, a click outside every monthly partition (maintenance fell
+# behind) fails to insert. create_partitions() moves such rows into the
+# month's partition when it creates it.
+
+from django.db import migrations
+
+
+TABLE = 'click_analytics'
+DEFAULT = 'click_analytics_default'
+
+
+def create_default_partition(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)', [TABLE])
+        if not cursor.fetchone():
+            return
+
+    schema_editor.execute(f'CREATE TABLE IF NOT EXISTS {DEFAULT} PARTITION OF {TABLE} DEFAULT')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('url_shortener', '0011_partition_click_analytics'),
+    ]
+
+    operations = [
+        # Reverting keeps the partition and the clicks in it
+        migrations.RunPython(create_default_partition, migrations.RunPython.noop),
+    ]
@@ -1,17 +1,133 @@
 """
 Models for URL Shortener with multi-domain support.
 """
-from django.db import models
+from django.conf import settings
+from django.db import models, transaction, IntegrityError
 from django.utils import timezone
 from webhooks.models import Account
+from .hyperloglog import HyperLogLog
+from .variants import compile_destinations
+import hashlib
 import secrets
 import string
 
 
-def generate_short_code(length=6):
-    """Generate a random short code using alphanumeric characters"""
-    characters = string.ascii_letters + string.digits
-    return ''.join(secrets.choice(characters) for _ in range(length))
+SHORT_CODE_ALPHABET = string.ascii_letters + string.digits
+SHORT_CODE_LENGTH = 6
+SHORT_CODE_MAX_LENGTH = 10
+
+# Characters allowed in custom codes (generated codes use SHORT_CODE_ALPHABET)
+SHORT_CODE_PATTERN = r'\A[A-Za-z0-9_-]+\Z'
+
+# Sequence-derived codes can only collide with custom or legacy random codes,
+# so a handful of retries is plenty.
+SHORT_CODE_MAX_ATTEMPTS = 5
+
+
+def short_code_key(domain):
+    """Per-domain key for the short code permutation"""
+    secret = getattr(settings, 'SHORT_CODE_SECRET', settings.SECRET_KEY)
+    return hashlib.blake2b(f'{secret}:{domain}'.encode(), digest_size=32).digest()
+
+
+def _permute(value, bits, key):
+    """
+    Keyed 4-round Feistel network over ``bits``-wide integers.
+    It is a bijection, so distinct inputs always give distinct outputs.
+    """
+    half = bits // 2
+    mask = (1 << half) - 1
+    left, right = value >> half, value & mask
+    for round_number in range(4):
+        digest = hashlib.blake2b(
+            right.to_bytes(8, 'big') + bytes([round_number]),
+            key=key,
+            digest_size=8,
+        ).digest()
+        left, right = right, left ^ (int.from_bytes(digest, 'big') & mask)
+    return (left << half) | right
+
+
+def generate_short_code(length=SHORT_CODE_LENGTH, sequence=None, key=b''):
+    """
+    Generate a short code using alphanumeric characters.
+
+    Without ``sequence`` the code is random. With a sequence number the code
+    is derived from it through a keyed permutation of the base62 space, so
+    every sequence number maps to a distinct, non-sequential looking code.
+    Once all codes of ``length`` characters are used up, codes grow by one.
+    """
+    base = len(SHORT_CODE_ALPHABET)
+
+    if sequence is None:
+        return ''.join(secrets.choice(SHORT_CODE_ALPHABET) for _ in range(length))
+
+    # Find the length tier this sequence number falls into
+    space = base ** length
+    while sequence >= space:
+        sequence -= space
+        length += 1
+        if length > SHORT_CODE_MAX_LENGTH:
+            raise ValueError("Short code space exhausted")
+        space = base ** length
+
+    # Cycle-walk the permutation until it lands inside the code space
+    bits = (space - 1).bit_length()
+    bits += bits % 2
+    value = _permute(sequence, bits, key)
+    while value >= space:
+        value = _permute(value, bits, key)
+
+    chars = []
+    for _ in range(length):
+        value, index = divmod(value, base)
+        chars.append(SHORT_CODE_ALPHABET[index])
+    return ''.join(reversed(chars))
+
+
+class ShortCodeSequence(models.Model):
+    """
+    Per-domain counter that short codes are allocated from.
+    Codes are derived from the counter, so creating a short URL never has to
+    probe for a free code, and the row lock serializes concurrent allocations.
+    """
+    domain = models.CharField(
+        max_length=255,
+        primary_key=True,
+        help_text="The domain this sequence allocates codes for"
+    )
+    
+    next_value = models.BigIntegerField(
+        default=0,
+        help_text="Next unallocated sequence number"
+    )
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'short_code_sequences'
+    
+    def __str__(self):
+        return f"{self.domain} @ {self.next_value}"
+    
+    @classmethod
+    def allocate(cls, domain, count=1):
+        """Reserve ``count`` consecutive sequence numbers for a domain"""
+        with transaction.atomic():
+            sequence, _ = cls.objects.select_for_update().get_or_create(domain=domain)
+            start = sequence.next_value
+            sequence.next_value = start + count
+            sequence.save(update_fields=['next_value', 'updated_at'])
+        return range(start, start + count)
+    
+    @classmethod
+    def allocate_codes(cls, domain, count=1):
+        """Reserve ``count`` unique short codes for a domain"""
+        key = short_code_key(domain)
+        return [
+            generate_short_code(sequence=number, key=key)
+            for number in cls.allocate(domain, count)
+        ]
 
 
 class ShortURL(models.Model):
@@ -55,6 +171,11 @@ class ShortURL(models.Model):
         help_text="Number of times this URL has been clicked"
     )
     
+    bot_clicks = models.BigIntegerField(
+        default=0,
+        help_text="Hits from bots, crawlers and link previews (not in clicks)"
+    )
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -71,6 +192,37 @@ class ShortURL(models.Model):
         help_text="Whether this short URL is active"
     )
     
+    # Optional: Per-country destinations, e.g. {"DE": "https://.../de"}
+    geo_targets = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text="Country code to destination URL overrides"
+    )
+    
+    # Optional: Weighted destinations for A/B tests, e.g.
+    # [{"url": "https://...", "weight": 3, "label": "A"}, ...]
+    destinations = models.JSONField(
+        default=list,
+        blank=True,
+        help_text="Weighted destination URLs; original_url is used when empty"
+    )
+    
+    # Alias table compiled from destinations on save
+    destination_table = models.JSONField(default=dict, blank=True, editable=False)
+    
+    # Destination health (maintained by the periodic link checker)
+    HEALTH_CHOICES = [
+        ('unknown', 'Unknown'),
+        ('ok', 'OK'),
+        ('broken', 'Broken'),
+    ]
+    
+    health_status = models.CharField(max_length=10, choices=HEALTH_CHOICES, default='unknown')
+    health_status_code = models.IntegerField(blank=True, null=True, help_text="HTTP status of the last check")
+    health_latency_ms = models.IntegerField(blank=True, null=True, help_text="Response time of the last check")
+    health_error = models.CharField(max_length=255, blank=True, help_text="Error details if the last check failed")
+    health_checked_at = models.DateTimeField(blank=True, null=True)
+    
     class Meta:
         db_table = 'short_urls'
         ordering = ['-created_at']
@@ -78,6 +230,18 @@ class ShortURL(models.Model):
             models.Index(fields=['short_code']),
             models.Index(fields=['domain', 'short_code']),
             models.Index(fields=['account', 'created_at']),
+            # Only links the expiry sweeper still has to visit
+            models.Index(
+                fields=['expires_at'],
+                name='short_urls_pending_expiry_idx',
+                condition=models.Q(is_active=True, expires_at__isnull=False),
+            ),
+            # Stalest active links first for the health checker
+            models.Index(
+                fields=['health_checked_at'],
+                name='short_urls_health_check_idx',
+                condition=models.Q(is_active=True),
+            ),
         ]
         unique_together = [['domain', 'short_code']]
     
@@ -85,21 +249,52 @@ class ShortURL(models.Model):
         return f"{self.domain}/{self.short_code} → {self.original_url[:50]}"
     
     def save(self, *args, **kwargs):
-        """Auto-generate short code if not provided"""
-        if not self.short_code:
-            # Keep generating until we find a unique code for this domain
-            max_attempts = 10
-            for _ in range(max_attempts):
-                code = generate_short_code()
-                if not ShortURL.objects.filter(short_code=code, domain=self.domain).exists():
-                    self.short_code = code
-                    break
-            else:
-                # If we couldn't find a unique code, try with longer length
-                code = generate_short_code(8)
-                self.short_code = code
+        """
+        Allocate a short code from the domain's sequence if not provided,
+        and compile the weighted destinations.
+        """
+        self.destination_table = compile_destinations(self.destinations)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'destinations' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'destination_table'}
+        
+        if self.short_code:
+            super().save(*args, **kwargs)
+            self.invalidate_cache()
+            return
+        
+        for _ in range(SHORT_CODE_MAX_ATTEMPTS):
+            self.short_code = ShortCodeSequence.allocate_codes(self.domain)[0]
+            try:
+                with transaction.atomic():
+                    super().save(*args, **kwargs)
+                self.invalidate_cache()
+                return
+            except IntegrityError:
+                # Only a custom or legacy random code can already hold a
+                # sequence-derived code; skip it and take the next number.
+                taken = ShortURL.objects.filter(
+                    domain=self.domain, short_code=self.short_code
+                ).exists()
+                self.short_code = ''
+                if not taken:
+                    raise
         
-        super().save(*args, **kwargs)
+        raise IntegrityError(
+            f"Could not allocate a short code for {self.domain} "
+            f"after {SHORT_CODE_MAX_ATTEMPTS} attempts"
+        )
+    
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        self.invalidate_cache()
+        return result
+    
+    def invalidate_cache(self):
+        """Drop this link from the redirect cache once the change commits"""
+        from .cache import invalidate_links
+        link = (self.domain, self.short_code)
+        transaction.on_commit(lambda: invalidate_links([link]))
     
     @property
     def full_short_url(self):
@@ -139,6 +334,9 @@ class ClickAnalytics(models.Model):
     country = models.CharField(max_length=2, blank=True)
     city = models.CharField(max_length=100, blank=True)
     
+    # Destination variant served (weighted links only)
+    variant = models.CharField(max_length=50, blank=True)
+    
     class Meta:
         db_table = 'click_analytics'
         ordering = ['-clicked_at']
@@ -150,3 +348,136 @@ class ClickAnalytics(models.Model):
     
     def __str__(self):
         return f"Click on {self.short_url.short_code} at {self.clicked_at}"
+
+
+class ClickRollup(models.Model):
+    """
+    Base for pre-aggregated click counts per short URL.
+    Rows are keyed by time bucket, country, referrer host and variant and are
+    incremented as clicks are recorded, so stats never scan raw clicks.
+    """
+    country = models.CharField(max_length=2, blank=True)
+    referrer_host = models.CharField(max_length=255, blank=True)
+    variant = models.CharField(max_length=50, blank=True)
+    clicks = models.BigIntegerField(default=0)
+    
+    class Meta:
+        abstract = True
+    
+    @classmethod
+    def increment(cls, count=1, **bucket):
+        """Add ``count`` clicks to a bucket, creating it if needed"""
+        if cls.objects.filter(**bucket).update(clicks=models.F('clicks') + count):
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(clicks=count, **bucket)
+        except IntegrityError:
+            # Another click created the bucket first
+            cls.objects.filter(**bucket).update(clicks=models.F('clicks') + count)
+
+
+class ClickHourlyRollup(ClickRollup):
+    """Clicks per short URL per hour (UTC)"""
+    short_url = models.ForeignKey(
+        ShortURL,
+        on_delete=models.CASCADE,
+        related_name='hourly_rollups'
+    )
+    
+    hour = models.DateTimeField(help_text="Start of the hour bucket (UTC)")
+    
+    class Meta:
+        db_table = 'click_rollups_hourly'
+        ordering = ['hour']
+        unique_together = [['short_url', 'hour', 'country', 'referrer_host', 'variant']]
+    
+    def __str__(self):
+        return f"{self.short_url_id} @ {self.hour:%Y-%m-%d %H:00}: {self.clicks}"
+
+
+class ClickDailyRollup(ClickRollup):
+    """Clicks per short URL per day (UTC)"""
+    short_url = models.ForeignKey(
+        ShortURL,
+        on_delete=models.CASCADE,
+        related_name='daily_rollups'
+    )
+    
+    day = models.DateField(help_text="Day bucket (UTC)")
+    
+    class Meta:
+        db_table = 'click_rollups_daily'
+        ordering = ['day']
+        unique_together = [['short_url', 'day', 'country', 'referrer_host', 'variant']]
+    
+    def __str__(self):
+        return f"{self.short_url_id} @ {self.day}: {self.clicks}"
+
+
+class UniqueVisitorSketch(models.Model):
+    """
+    HyperLogLog sketch of distinct visitor IPs per short URL per day (UTC).
+    Sketches merge across days, so unique visitors over any date range
+    can be estimated without COUNT(DISTINCT) over raw clicks.
+    """
+    short_url = models.ForeignKey(
+        ShortURL,
+        on_delete=models.CASCADE,
+        related_name='visitor_sketches'
+    )
+    
+    day = models.DateField(help_text="Day bucket (UTC)")
+    
+    registers = models.BinaryField(help_text="Compressed HyperLogLog registers")
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'unique_visitor_sketches'
+        ordering = ['day']
+        unique_together = [['short_url', 'day']]
+    
+    def __str__(self):
+        return f"{self.short_url_id} @ {self.day}"
+    
+    @property
+    def sketch(self):
+        """The stored registers as a HyperLogLog"""
+        return HyperLogLog.from_bytes(self.registers)
+    
+    @classmethod
+    def add_visitor(cls, short_url_id, day, visitor):
+        """
+        Add a visitor to a day's sketch.
+        Only clicks that raise a register take the row lock and write.
+        """
+        index, rank = HyperLogLog.position(visitor)
+        
+        current = cls.objects.filter(short_url_id=short_url_id, day=day).values_list(
+            'registers', flat=True
+        ).first()
+        if current is not None and HyperLogLog.from_bytes(current).registers[index] >= rank:
+            return
+        
+        with transaction.atomic():
+            sketch, _ = cls.objects.select_for_update().get_or_create(
+                short_url_id=short_url_id,
+                day=day,
+                defaults={'registers': HyperLogLog().to_bytes()},
+            )
+            hll = sketch.sketch
+            if hll.update(index, rank):
+                sketch.registers = hll.to_bytes()
+                sketch.save(update_fields=['registers', 'updated_at'])
+    
+    @classmethod
+    def estimate(cls, short_url, start_day, end_day):
+        """Estimate distinct visitors between two days (inclusive)"""
+        hll = HyperLogLog()
+        sketches = cls.objects.filter(
+            short_url=short_url, day__gte=start_day, day__lte=end_day
+        ).values_list('registers', flat=True)
+        for registers in sketches:
+            hll.merge(HyperLogLog.from_bytes(registers))
+        return hll.count()
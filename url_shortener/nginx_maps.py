@@ -0,0 +1,214 @@
+"""
+Export of short links into nginx map files.
+
+Each domain gets a ``<domain>.map`` file with one entry per active link,
+keyed by ``$host$uri``, so nginx can answer redirects itself and only
+proxy misses to gunicorn. Files are replaced atomically and only when
+their content changes; domains whose links have not changed since the
+last export are not even read from the database.
+
+nginx compares map keys case-insensitively while short codes are case
+sensitive, so codes that differ only in case from another link on the
+domain (abc123, ABC123) are left to gunicorn.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import shlex
+import subprocess
+import tempfile
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models import Count, Max, Q
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from .models import ShortURL, SHORT_CODE_PATTERN
+
+logger = logging.getLogger(__name__)
+
+MAP_SUFFIX = '.map'
+STATE_FILE = '.export-state.json'
+
+# Characters nginx would interpret inside a quoted map value
+UNSAFE_TARGET_CHARS = set('"\\$;{} \t\r\n')
+
+# Codes that are safe as unquoted map keys
+SAFE_CODE_RE = re.compile(SHORT_CODE_PATTERN)
+
+
+def exportable_links(now=None):
+    """
+    Active links that nginx may serve.
+    Links expiring before the next export are left to gunicorn, which
+    checks expiry on every request, as are geo-targeted and weighted links.
+    """
+    now = now or timezone.now()
+    margin = timedelta(seconds=getattr(settings, 'SHORT_URL_NGINX_MAP_EXPIRY_MARGIN', 600))
+    return ShortURL.objects.filter(is_active=True, geo_targets={}, destinations=[]).filter(
+        Q(expires_at__isnull=True) | Q(expires_at__gt=now + margin)
+    )
+
+
+def _case_collisions(links):
+    """Lowercased codes shared by more than one of the links (of any state)"""
+    return set(
+        links.order_by()
+        .values(folded=Lower('short_code'))
+        .annotate(count=Count('id'))
+        .filter(count__gt=1)
+        .values_list('folded', flat=True)
+    )
+
+
+def _map_entries(domain, links, collisions=frozenset()):
+    """Yield map lines for a domain's links, skipping codes in collisions"""
+    for short_code, original_url in links:
+        if UNSAFE_TARGET_CHARS.intersection(original_url) or not SAFE_CODE_RE.match(short_code):
+            continue
+        if short_code.lower() in collisions:
+            continue
+        # Django serves both /code and /code/ (APPEND_SLASH)
+        yield f'{domain}/{short_code} "{original_url}";\n'
+        yield f'{domain}/{short_code}/ "{original_url}";\n'
+
+
+def _write_map(directory, domain, links, collisions=frozenset()):
+    """
+    Write a domain's map to a temp file and swap it in if it changed.
+    Returns True if the file was replaced.
+    """
+    path = directory / f'{domain}{MAP_SUFFIX}'
+    digest = hashlib.sha256()
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f'.{domain}.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as tmp:
+            header = f'# Generated by export_nginx_redirect_maps for {domain}; do not edit.\n'
+            tmp.write(header)
+            for line in _map_entries(domain, links, collisions):
+                digest.update(line.encode())
+                tmp.write(line)
+        
+        if path.exists() and _file_digest(path, skip_header=True) == digest.hexdigest():
+            os.unlink(tmp_path)
+            return False
+        
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+        return True
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def _file_digest(path, skip_header=False):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        if skip_header:
+            f.readline()
+        for line in f:
+            digest.update(line)
+    return digest.hexdigest()
+
+
+def _load_state(directory):
+    try:
+        return json.loads((directory / STATE_FILE).read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_state(directory, state):
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.state.', suffix='.tmp')
+    with os.fdopen(fd, 'w') as tmp:
+        json.dump(state, tmp)
+    os.replace(tmp_path, directory / STATE_FILE)
+
+
+def reload_nginx():
+    """Run SHORT_URL_NGINX_RELOAD_COMMAND; returns True on success"""
+    command = getattr(settings, 'SHORT_URL_NGINX_RELOAD_COMMAND', '')
+    if not command:
+        return False
+    try:
+        subprocess.run(shlex.split(command), check=True, timeout=30, capture_output=True)
+        return True
+    except (OSError, subprocess.SubprocessError) as e:
+        logger.error(f"nginx reload failed: {str(e)}")
+        return False
+
+
+def export_redirect_maps(directory=None, full=False, reload=True):
+    """
+    Export active short links into per-domain nginx map files.
+    
+    Domains are fingerprinted by link count and latest updated_at; only
+    domains whose fingerprint changed (or all of them with ``full``) are
+    re-read and rewritten. nginx is reloaded if any file changed.
+    
+    Returns a summary dict with the domains written, unchanged and removed.
+    """
+    directory = Path(directory or settings.SHORT_URL_NGINX_MAP_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    
+    state = {} if full else _load_state(directory)
+    links = exportable_links()
+    fingerprints = {
+        row['domain']: f"{row['count']}:{row['last_updated'].isoformat()}"
+        for row in links.order_by().values('domain').annotate(
+            count=Count('id'), last_updated=Max('updated_at')
+        )
+    }
+    # Links left to gunicorn still decide which codes collide in case
+    for row in ShortURL.objects.filter(domain__in=fingerprints).order_by().values('domain').annotate(
+        count=Count('id'), last_updated=Max('updated_at')
+    ):
+        fingerprints[row['domain']] += f":{row['count']}:{row['last_updated'].isoformat()}"
+    
+    summary = {'written': [], 'unchanged': [], 'removed': [], 'reloaded': False}
+    new_state = {}
+    
+    for domain, fingerprint in sorted(fingerprints.items()):
+        if '/' in domain or domain.startswith('.'):
+            logger.warning(f"Skipping unsafe domain name {domain!r}")
+            continue
+        
+        previous = state.get(domain)
+        if previous and previous['fingerprint'] == fingerprint and (directory / f'{domain}{MAP_SUFFIX}').exists():
+            new_state[domain] = previous
+            summary['unchanged'].append(domain)
+            continue
+        
+        rows = (
+            links.filter(domain=domain)
+            .order_by('short_code')
+            .values_list('short_code', 'original_url')
+            .iterator(chunk_size=2000)
+        )
+        collisions = _case_collisions(ShortURL.objects.filter(domain=domain))
+        changed = _write_map(directory, domain, rows, collisions)
+        new_state[domain] = {'fingerprint': fingerprint}
+        summary['written' if changed else 'unchanged'].append(domain)
+    
+    # Drop maps for domains that no longer have exportable links
+    for path in directory.glob(f'*{MAP_SUFFIX}'):
+        domain = path.name[:-len(MAP_SUFFIX)]
+        if domain not in new_state:
+            path.unlink()
+            summary['removed'].append(domain)
+    
+    _save_state(directory, new_state)
+    
+    if reload and (summary['written'] or summary['removed']):
+        summary['reloaded'] = reload_nginx()
+    
+    logger.info(
+        f"Exported nginx redirect maps: {len(summary['written'])} written, "
+        f"{len(summary['unchanged'])} unchanged, {len(summary['removed'])} removed"
+    )
+    return summary
@@ -0,0 +1,173 @@
+"""
+Monthly partitions of the click_analytics table (PostgreSQL only).
+
+click_analytics is range-partitioned on clicked_at (migration 0011).
+Each month lives in its own ``click_analytics_pYYYYMM`` partition; rows
+from before partitioning stay in ``click_analytics_legacy``. Partitions
+are created a few months ahead, and retention drops whole partitions
+instead of deleting rows. Clicks outside every monthly partition, e.g.
+when maintenance has fallen behind, land in ``click_analytics_default``
+(migration 0012) and move to their month's partition once it is created.
+
+On other databases the table is a plain table and these functions do
+nothing.
+"""
+import logging
+import re
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+PARENT_TABLE = 'click_analytics'
+PARTITION_PREFIX = 'click_analytics_p'
+DEFAULT_PARTITION = 'click_analytics_default'
+
+_UPPER_BOUND_RE = re.compile(r"TO \('([^']+)'\)")
+
+
+def month_start(value):
+    """First instant of the month containing ``value`` (UTC)"""
+    value = value.astimezone(dt_timezone.utc)
+    return datetime(value.year, value.month, 1, tzinfo=dt_timezone.utc)
+
+
+def add_months(month, count):
+    """Shift a month start by ``count`` months"""
+    index = month.year * 12 + month.month - 1 + count
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def partition_name(month):
+    return f'{PARTITION_PREFIX}{month:%Y%m}'
+
+
+def parse_upper_bound(bound_expression):
+    """
+    Upper bound of a range partition from pg_get_expr(relpartbound),
+    e.g. "FOR VALUES FROM ('2026-10-01 00:00:00+00') TO ('2026-11-01 00:00:00+00')".
+    None for an unbounded (MAXVALUE) or DEFAULT partition.
+    """
+    match = _UPPER_BOUND_RE.search(bound_expression)
+    if not match:
+        return None
+    return datetime.fromisoformat(match.group(1)).astimezone(dt_timezone.utc)
+
+
+def expired_partitions(partitions, retention_months, now):
+    """
+    Names of partitions entirely older than the retention window.
+    ``partitions`` maps partition names to their upper bounds.
+    """
+    cutoff = add_months(month_start(now), -retention_months)
+    return sorted(
+        name for name, upper in partitions.items()
+        if upper is not None and upper <= cutoff
+    )
+
+
+def is_partitioned():
+    """Whether click_analytics is a partitioned table on this database"""
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)",
+            [PARENT_TABLE],
+        )
+        return cursor.fetchone() is not None
+
+
+def list_partitions():
+    """Map of partition name to upper bound"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT child.relname, pg_get_expr(child.relpartbound, child.oid) "
+            "FROM pg_inherits i "
+            "JOIN pg_class child ON child.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(%s)",
+            [PARENT_TABLE],
+        )
+        return {name: parse_upper_bound(bound) for name, bound in cursor.fetchall()}
+
+
+def _create_partition(cursor, name, month, following, has_default):
+    if not has_default:
+        cursor.execute(
+            f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {PARENT_TABLE} "
+            f"FOR VALUES FROM (%s) TO (%s)",
+            [month, following],
+        )
+        return
+    # The default partition may hold clicks for this month already, which
+    # would make PARTITION OF fail: move them into the new table first.
+    # The lock holds off new clicks for the month until the new partition
+    # is attached (reads carry on).
+    with transaction.atomic():
+        cursor.execute(f"LOCK TABLE {DEFAULT_PARTITION} IN SHARE ROW EXCLUSIVE MODE")
+        cursor.execute(f"CREATE TABLE {name} (LIKE {PARENT_TABLE} INCLUDING DEFAULTS)")
+        cursor.execute(
+            f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} "
+            f"WHERE clicked_at >= %s AND clicked_at < %s RETURNING *) "
+            f"INSERT INTO {name} SELECT * FROM moved",
+            [month, following],
+        )
+        cursor.execute(
+            f"ALTER TABLE {PARENT_TABLE} ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)",
+            [month, following],
+        )
+
+
+def create_partitions(months_ahead, now):
+    """Create missing monthly partitions from the current month on"""
+    existing = list_partitions()
+    # Months before the end of the pre-partitioning data are covered by it
+    legacy_end = max(
+        (upper for name, upper in existing.items() if upper and not name.startswith(PARTITION_PREFIX)),
+        default=None,
+    )
+    created = []
+    month = month_start(now)
+    with connection.cursor() as cursor:
+        for _ in range(months_ahead + 1):
+            name = partition_name(month)
+            following = add_months(month, 1)
+            if name not in existing and (legacy_end is None or month >= legacy_end):
+                _create_partition(cursor, name, month, following, DEFAULT_PARTITION in existing)
+                created.append(name)
+            month = following
+    return created
+
+
+def drop_partitions(names):
+    """
+    Detach and drop partitions. DETACH CONCURRENTLY is not allowed while
+    the table has a default partition, so each is detached and dropped in
+    one short transaction.
+    """
+    with connection.cursor() as cursor:
+        for name in names:
+            with transaction.atomic():
+                cursor.execute(f'ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name}')
+                cursor.execute(f'DROP TABLE {name}')
+
+
+def maintain_click_partitions(months_ahead, retention_months, now):
+    """
+    Create upcoming partitions and drop those past retention
+    (retention_months of 0 keeps everything).
+    Returns a summary dict with created and dropped partition names.
+    """
+    summary = {'created': [], 'dropped': []}
+    if not is_partitioned():
+        return summary
+    
+    summary['created'] = create_partitions(months_ahead, now)
+    if retention_months:
+        summary['dropped'] = expired_partitions(list_partitions(), retention_months, now)
+        drop_partitions(summary['dropped'])
+    
+    for name in summary['dropped']:
+        logger.info(f"Dropped click partition {name} (retention {retention_months} months)")
+    return summary
@@ -0,0 +1,124 @@
+"""
+Redirect rate limiting for URL Shortener.
+
+A sliding-window counter in Redis, kept per client IP and per short link:
+each key counts hits in fixed windows and the current rate is estimated
+by weighting the previous window by how much of it still overlaps the
+sliding window. Both keys are updated in one Lua call, so a check is a
+single round trip.
+
+Over-limit requests are still redirected; the limiter only decides
+whether the click is recorded. If Redis is unavailable the limiter fails
+open and stays out of the way for a short back-off.
+"""
+import logging
+import threading
+import time
+
+import redis
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'shorturl:rl'
+
+# Seconds to skip the limiter after Redis errors
+UNAVAILABLE_BACKOFF = 30
+
+# KEYS come in (current window, previous window) pairs; ARGV[1] is the TTL
+SLIDING_WINDOW_SCRIPT = """
+local counts = {}
+for i = 1, #KEYS, 2 do
+    local current = redis.call('INCR', KEYS[i])
+    if current == 1 then
+        redis.call('EXPIRE', KEYS[i], ARGV[1])
+    end
+    counts[#counts + 1] = current
+    counts[#counts + 1] = tonumber(redis.call('GET', KEYS[i + 1]) or '0')
+end
+return counts
+"""
+
+_client = None
+_script = None
+_client_lock = threading.Lock()
+_unavailable_until = 0.0
+
+
+def _get_script():
+    global _client, _script
+    if _script is None:
+        with _client_lock:
+            if _script is None:
+                _client = redis.Redis.from_url(
+                    settings.SHORT_URL_RATE_LIMIT_REDIS_URL,
+                    socket_timeout=settings.SHORT_URL_RATE_LIMIT_TIMEOUT,
+                    socket_connect_timeout=settings.SHORT_URL_RATE_LIMIT_TIMEOUT,
+                )
+                _script = _client.register_script(SLIDING_WINDOW_SCRIPT)
+    return _script
+
+
+def budget_for(domain):
+    """Rate limit budget for a domain: the defaults with per-domain overrides"""
+    budget = dict(settings.SHORT_URL_RATE_LIMIT)
+    budget.update(settings.SHORT_URL_RATE_LIMIT_DOMAINS.get(domain, {}))
+    return budget
+
+
+def sliding_count(current, previous, elapsed_fraction):
+    """Estimated hits in the sliding window ending now"""
+    return current + previous * (1.0 - elapsed_fraction)
+
+
+def allow_click(ip_address, domain, short_code, now=None):
+    """
+    Count a redirect and report whether its click should be recorded.
+    False once the client IP or the link is over its budget for the
+    domain; a budget of 0 disables that limit.
+    """
+    global _unavailable_until
+    if not settings.SHORT_URL_RATE_LIMIT_REDIS_URL:
+        return True
+
+    now = time.time() if now is None else now
+    if now < _unavailable_until:
+        return True
+
+    budget = budget_for(domain)
+    window = budget['window']
+    limits = []
+    if budget['ip'] and ip_address:
+        limits.append((f'ip:{ip_address}', budget['ip']))
+    if budget['link']:
+        limits.append((f'link:{domain}/{short_code}', budget['link']))
+    if not limits:
+        return True
+
+    index, offset = divmod(now, window)
+    keys = []
+    for identity, _ in limits:
+        keys.append(f'{KEY_PREFIX}:{identity}:{int(index)}')
+        keys.append(f'{KEY_PREFIX}:{identity}:{int(index) - 1}')
+
+    try:
+        counts = _get_script()(keys=keys, args=[window * 2])
+    except redis.RedisError as e:
+        _unavailable_until = now + UNAVAILABLE_BACKOFF
+        logger.warning(f"Redirect rate limiter unavailable, allowing clicks: {str(e)}")
+        return True
+
+    elapsed = offset / window
+    for i, (_, limit) in enumerate(limits):
+        if sliding_count(counts[2 * i], counts[2 * i + 1], elapsed) > limit:
+            return False
+    return True
+
+
+def reset_rate_limiter():
+    """Drop the client and any back-off (e.g. after settings change)"""
+    global _client, _script, _unavailable_until
+    with _client_lock:
+        _client = None
+        _script = None
+        _unavailable_until = 0.0
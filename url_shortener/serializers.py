@@ -1,8 +1,118 @@
 """
 Serializers for URL Shortener API.
 """
+from django.conf import settings
+from django.core.validators import RegexValidator
+from django.db import transaction, IntegrityError
 from rest_framework import serializers
-from .models import ShortURL, ClickAnalytics
+from .cache import invalidate_links
+from .variants import default_label
+from .models import ShortURL, ShortCodeSequence, ClickAnalytics, SHORT_CODE_MAX_ATTEMPTS, SHORT_CODE_PATTERN
+
+
+# Upper bound for a single bulk shorten request
+BULK_SHORTEN_MAX_URLS = 5000
+BULK_CREATE_BATCH_SIZE = 500
+
+# Upper bound for per-country destinations on one link
+GEO_TARGETS_MAX = 250
+
+# Upper bound for weighted destinations on one link (labels default to A-Z)
+DESTINATIONS_MAX = 26
+
+
+def validate_url_scheme(value):
+    """Only http(s) URLs can be shortened"""
+    if not value.startswith(('http://', 'https://')):
+        raise serializers.ValidationError("URL must start with http:// or https://")
+    return value
+
+
+def validate_geo_targets(value):
+    """Geo targets map ISO country codes to http(s) destination URLs"""
+    if value in (None, ''):
+        return {}
+    if not isinstance(value, dict):
+        raise serializers.ValidationError("Expected an object mapping country codes to URLs")
+    if len(value) > GEO_TARGETS_MAX:
+        raise serializers.ValidationError(f"At most {GEO_TARGETS_MAX} geo targets are allowed")
+    
+    url_field = serializers.URLField(max_length=2048)
+    targets = {}
+    for country, url in value.items():
+        code = str(country).upper()
+        if len(code) != 2 or not code.isascii() or not code.isalpha():
+            raise serializers.ValidationError(f"'{country}' is not a two-letter country code")
+        try:
+            targets[code] = validate_url_scheme(url_field.run_validation(url))
+        except serializers.ValidationError as e:
+            raise serializers.ValidationError({code: e.detail})
+    return targets
+
+
+class DestinationSerializer(serializers.Serializer):
+    """One weighted destination of a short URL"""
+    url = serializers.URLField(max_length=2048, validators=[validate_url_scheme])
+    weight = serializers.FloatField(min_value=0, default=1)
+    label = serializers.CharField(max_length=50, required=False, allow_blank=True)
+
+
+def validate_destinations(value):
+    """Weighted destinations: at most DESTINATIONS_MAX, unique labels, some weight"""
+    if value in (None, ''):
+        return []
+    # Checked before validating each entry, so oversized lists cost nothing
+    if isinstance(value, list) and len(value) > DESTINATIONS_MAX:
+        raise serializers.ValidationError(f"At most {DESTINATIONS_MAX} destinations are allowed")
+    serializer = DestinationSerializer(data=value, many=True)
+    serializer.is_valid(raise_exception=True)
+    destinations = [dict(d) for d in serializer.validated_data]
+    if not destinations:
+        return []
+    if not any(d['weight'] > 0 for d in destinations):
+        raise serializers.ValidationError("At least one destination needs a positive weight")
+    
+    for i, destination in enumerate(destinations):
+        destination['label'] = destination.get('label') or default_label(i)
+    labels = [d['label'] for d in destinations]
+    if len(set(labels)) != len(labels):
+        raise serializers.ValidationError("Destination labels must be unique")
+    return destinations
+
+
+def resolve_short_url_domain(domain, account, request):
+    """
+    Determine the domain a short URL is created on.
+    
+    - If domain is provided, it will be used (must be in ALLOWED_SHORT_URL_DOMAINS)
+    - If not provided, uses request domain from middleware
+    - Falls back to account.short_url_domain with 'pay.' prefix
+    """
+    if not domain:
+        # Try to get domain from request (set by middleware)
+        if request and hasattr(request, 'original_host'):
+            domain = request.original_host
+        # Fall back to account's short_url_domain with 'pay.' prefix
+        elif account and account.short_url_domain:
+            # If account has 'onsync-test.xyz', use 'pay.onsync-test.xyz'
+            base_domain = account.short_url_domain
+            if not base_domain.startswith('pay.'):
+                domain = f'pay.{base_domain}'
+            else:
+                domain = base_domain
+        else:
+            raise serializers.ValidationError({
+                'domain': 'No domain specified and could not determine domain automatically.'
+            })
+    
+    # Validate domain is in allowed list
+    allowed_domains = getattr(settings, 'ALLOWED_SHORT_URL_DOMAINS', [])
+    if allowed_domains and domain not in allowed_domains:
+        raise serializers.ValidationError({
+            'domain': f"Domain '{domain}' is not in the allowed domains list."
+        })
+    
+    return domain
 
 
 class ShortURLCreateSerializer(serializers.ModelSerializer):
@@ -17,57 +127,41 @@ class ShortURLCreateSerializer(serializers.ModelSerializer):
     """
     # Explicitly declare optional fields that won't be in the model's required fields
     domain = serializers.CharField(required=False, allow_blank=True, allow_null=True, max_length=255)
-    short_code = serializers.CharField(required=False, allow_blank=True, allow_null=True, max_length=10)
+    short_code = serializers.CharField(
+        required=False, allow_blank=True, allow_null=True, max_length=10,
+        validators=[RegexValidator(SHORT_CODE_PATTERN, 'Short codes may only contain letters, digits, "_" and "-".')]
+    )
     
     class Meta:
         model = ShortURL
-        fields = ['original_url', 'title', 'expires_at', 'domain', 'short_code']
+        fields = ['original_url', 'title', 'expires_at', 'domain', 'short_code', 'geo_targets', 'destinations']
         extra_kwargs = {
             'title': {'required': False},
             'expires_at': {'required': False},
+            'geo_targets': {'required': False},
+            'destinations': {'required': False},
         }
     
     def validate_original_url(self, value):
         """Basic URL validation"""
-        if not value.startswith(('http://', 'https://')):
-            raise serializers.ValidationError("URL must start with http:// or https://")
-        return value
+        return validate_url_scheme(value)
+    
+    def validate_geo_targets(self, value):
+        """Country codes and destination URLs"""
+        return validate_geo_targets(value)
+    
+    def validate_destinations(self, value):
+        """Weighted destination URLs"""
+        return validate_destinations(value)
     
     def create(self, validated_data):
         """Create short URL with account context"""
-        from django.conf import settings
-        
         account = self.context.get('account')
         request = self.context.get('request')
         
-        # Determine domain to use
-        domain = validated_data.get('domain')
-        
-        if not domain:
-            # Try to get domain from request (set by middleware)
-            if request and hasattr(request, 'original_host'):
-                domain = request.original_host
-            # Fall back to account's short_url_domain with 'pay.' prefix
-            elif account and account.short_url_domain:
-                # If account has 'onsync-test.xyz', use 'pay.onsync-test.xyz'
-                base_domain = account.short_url_domain
-                if not base_domain.startswith('pay.'):
-                    domain = f'pay.{base_domain}'
-                else:
-                    domain = base_domain
-            else:
-                raise serializers.ValidationError({
-                    'domain': 'No domain specified and could not determine domain automatically.'
-                })
-        
-        # Validate domain is in allowed list
-        allowed_domains = getattr(settings, 'ALLOWED_SHORT_URL_DOMAINS', [])
-        if allowed_domains and domain not in allowed_domains:
-            raise serializers.ValidationError({
-                'domain': f"Domain '{domain}' is not in the allowed domains list."
-            })
-        
-        validated_data['domain'] = domain
+        validated_data['domain'] = resolve_short_url_domain(
+            validated_data.get('domain'), account, request
+        )
         validated_data['account'] = account
         
         # Remove None values for optional fields
@@ -95,13 +189,22 @@ class ShortURLResponseSerializer(serializers.ModelSerializer):
             'full_short_url',
             'title',
             'clicks',
+            'bot_clicks',
             'is_active',
             'is_expired',
             'created_at',
             'updated_at',
             'expires_at',
+            'geo_targets',
+            'destinations',
+            'health_status',
+            'health_status_code',
+            'health_checked_at',
+        ]
+        read_only_fields = [
+            'id', 'short_code', 'clicks', 'bot_clicks', 'created_at', 'updated_at',
+            'health_status', 'health_status_code', 'health_checked_at',
         ]
-        read_only_fields = ['id', 'short_code', 'clicks', 'created_at', 'updated_at']
     
     def get_is_expired(self, obj):
         """Check if URL is expired"""
@@ -122,6 +225,7 @@ class ClickAnalyticsSerializer(serializers.ModelSerializer):
             'referer',
             'country',
             'city',
+            'variant',
         ]
 
 
@@ -131,31 +235,109 @@ class ShortURLStatsSerializer(serializers.Serializer):
     """
     short_url = ShortURLResponseSerializer()
     total_clicks = serializers.IntegerField()
+    bot_clicks = serializers.IntegerField()
+    unique_visitors = serializers.IntegerField()
     recent_clicks = serializers.ListField(
         child=ClickAnalyticsSerializer()
     )
-    clicks_by_day = serializers.DictField()
+    range = serializers.DictField()
+    clicks_by_day = serializers.DictField(required=False)
+    clicks_by_hour = serializers.DictField(required=False)
     clicks_by_country = serializers.DictField()
+    clicks_by_referrer = serializers.DictField()
+    clicks_by_variant = serializers.DictField()
 
 
 class BulkShortURLSerializer(serializers.Serializer):
     """
     Serializer for bulk URL shortening operations.
     Useful for n8n workflows that need to shorten multiple URLs at once.
+    
+    URLs are validated one by one so a bad entry only fails itself;
+    all codes are allocated in a single block and rows are inserted
+    with bulk_create.
     """
     urls = serializers.ListField(
-        child=serializers.URLField(),
+        child=serializers.CharField(allow_blank=True, trim_whitespace=True),
         min_length=1,
-        max_length=100
+        max_length=BULK_SHORTEN_MAX_URLS
     )
-    domain = serializers.CharField(required=False)
-    
-    def validate_domain(self, value):
-        """Validate domain belongs to account"""
-        if value:
-            account = self.context.get('account')
-            if account and value != account.short_url_domain:
-                raise serializers.ValidationError(
-                    f"Domain '{value}' does not match your account's short URL domain."
-                )
-        return value
+    domain = serializers.CharField(required=False, allow_blank=True, allow_null=True, max_length=255)
+    title = serializers.CharField(required=False, allow_blank=True, max_length=255)
+    expires_at = serializers.DateTimeField(required=False, allow_null=True)
+    
+    def validate(self, data):
+        """Resolve the target domain once for the whole batch"""
+        data['domain'] = resolve_short_url_domain(
+            data.get('domain'),
+            self.context.get('account'),
+            self.context.get('request'),
+        )
+        return data
+    
+    def create(self, validated_data):
+        """
+        Create short URLs for all valid entries.
+        
+        Returns one result per input URL, in input order: either
+        {'short_url': ShortURL} or {'original_url': ..., 'errors': [...]}.
+        """
+        account = self.context.get('account')
+        domain = validated_data['domain']
+        url_field = serializers.URLField(max_length=2048)
+        
+        results = []
+        pending = []
+        for url in validated_data['urls']:
+            try:
+                validate_url_scheme(url_field.run_validation(url))
+            except serializers.ValidationError as e:
+                results.append({'original_url': url, 'errors': e.detail})
+                continue
+            
+            short_url = ShortURL(
+                account=account,
+                domain=domain,
+                original_url=url,
+                title=validated_data.get('title', ''),
+                expires_at=validated_data.get('expires_at'),
+            )
+            pending.append(short_url)
+            results.append({'short_url': short_url})
+        
+        if pending:
+            self._insert(domain, pending)
+        
+        return results
+    
+    def _insert(self, domain, short_urls):
+        """Assign codes from the domain sequence and bulk insert"""
+        for short_url, code in zip(short_urls, ShortCodeSequence.allocate_codes(domain, len(short_urls))):
+            short_url.short_code = code
+        
+        for _ in range(SHORT_CODE_MAX_ATTEMPTS):
+            # Custom or legacy random codes can occupy sequence-derived
+            # codes; swap those out with one lookup instead of per-code probing.
+            codes = [short_url.short_code for short_url in short_urls]
+            taken = set(
+                ShortURL.objects.filter(domain=domain, short_code__in=codes)
+                .values_list('short_code', flat=True)
+            )
+            clashing = [short_url for short_url in short_urls if short_url.short_code in taken]
+            if clashing:
+                for short_url, code in zip(clashing, ShortCodeSequence.allocate_codes(domain, len(clashing))):
+                    short_url.short_code = code
+                continue
+            
+            try:
+                with transaction.atomic():
+                    ShortURL.objects.bulk_create(short_urls, batch_size=BULK_CREATE_BATCH_SIZE)
+                links = [(domain, short_url.short_code) for short_url in short_urls]
+                transaction.on_commit(lambda: invalidate_links(links))
+                return
+            except IntegrityError:
+                # A custom code was created concurrently; check again.
+                for short_url in short_urls:
+                    short_url.pk = None
+        
+        raise IntegrityError(f"Could not allocate short codes for {domain}")
@@ -0,0 +1,115 @@
+"""
+Celery tasks for URL Shortener.
+"""
+import logging
+from celery import shared_task
+from django.conf import settings
+from django.utils import timezone
+
+from .analytics import record_bot_click, record_click
+from .cache import invalidate_links
+from .models import ShortURL
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(ignore_result=True)
+def record_click_task(short_url_id, ip_address=None, user_agent='', referer='', country=None, variant=''):
+    """
+    Record a click emitted by the redirect view.
+    """
+    record_click(
+        short_url_id,
+        ip_address=ip_address,
+        user_agent=user_agent,
+        referer=referer,
+        country=country,
+        variant=variant,
+    )
+
+
+@shared_task(ignore_result=True)
+def record_bot_click_task(short_url_id):
+    """
+    Count a bot hit emitted by the redirect view.
+    """
+    record_bot_click(short_url_id)
+
+
+@shared_task(ignore_result=True)
+def export_nginx_redirect_maps():
+    """
+    Periodically refresh the nginx redirect maps.
+    Does nothing unless SHORT_URL_NGINX_MAP_DIR is configured.
+    """
+    if not settings.SHORT_URL_NGINX_MAP_DIR:
+        return
+    
+    from .nginx_maps import export_redirect_maps
+    summary = export_redirect_maps()
+    if summary['written'] or summary['removed']:
+        logger.info(f"Refreshed nginx redirect maps for {summary['written'] + summary['removed']}")
+
+
+@shared_task
+def deactivate_expired_short_urls(batch_size=None):
+    """
+    Deactivate short URLs whose expires_at has passed.
+    
+    Walks the pending-expiry index in chunks so no single UPDATE locks a
+    large number of rows, and evicts each chunk from the redirect cache.
+    Returns the number of links deactivated.
+    """
+    batch_size = batch_size or settings.SHORT_URL_EXPIRY_SWEEP_BATCH_SIZE
+    now = timezone.now()
+    total = 0
+    
+    while True:
+        batch = list(
+            ShortURL.objects.filter(is_active=True, expires_at__lte=now)
+            .order_by('expires_at')
+            .values_list('id', 'domain', 'short_code')[:batch_size]
+        )
+        if not batch:
+            break
+        
+        total += ShortURL.objects.filter(
+            id__in=[short_url_id for short_url_id, _, _ in batch],
+            is_active=True,
+        ).update(is_active=False, updated_at=now)
+        invalidate_links([(domain, short_code) for _, domain, short_code in batch])
+    
+    logger.info(f"metric=short_urls.expired count={total}")
+    return total
+
+
+@shared_task
+def check_short_url_health(limit=None):
+    """
+    Check that the destinations of active links still respond.
+    Links whose destination errors are flagged as broken.
+    """
+    from .health import check_link_health
+    summary = check_link_health(limit=limit)
+    logger.info(f"metric=short_urls.health_checked count={summary['checked']} broken={summary['broken']}")
+    return summary
+
+
+@shared_task
+def maintain_click_partitions():
+    """
+    Create upcoming monthly click_analytics partitions and drop the ones
+    past SHORT_URL_CLICK_RETENTION_MONTHS. Rollups are kept, so stats for
+    dropped months remain available.
+    """
+    from .partitions import maintain_click_partitions as maintain
+    summary = maintain(
+        months_ahead=settings.SHORT_URL_CLICK_PARTITIONS_AHEAD,
+        retention_months=settings.SHORT_URL_CLICK_RETENTION_MONTHS,
+        now=timezone.now(),
+    )
+    logger.info(
+        f"metric=click_partitions.maintained created={len(summary['created'])} "
+        f"dropped={len(summary['dropped'])}"
+    )
+    return summary
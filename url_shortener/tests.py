@@ -0,0 +1,1062 @@
+"""
+Tests for url_shortener app.
+"""
+import asyncio
+import csv
+import gzip
+import json
+import shutil
+import tempfile
+from collections import Counter
+from io import StringIO
+from pathlib import Path
+from unittest import mock, skipUnless
+from asgiref.sync import async_to_sync
+import httpx
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from datetime import timedelta
+from django.core.cache import cache
+from django.db import DatabaseError, connection
+from django.utils import timezone
+from django.test import RequestFactory, TestCase, override_settings
+from rest_framework.test import APITestCase
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from webhooks.models import Account
+from .analytics import record_click
+from .bots import is_bot
+from .cache import link_cache_key
+from .geoip import IPRangeIndex, reset_ip_index
+from .health import check_link_health
+from .hyperloglog import HyperLogLog
+from .nginx_maps import export_redirect_maps
+from .partitions import (
+    DEFAULT_PARTITION,
+    add_months,
+    expired_partitions,
+    month_start,
+    parse_upper_bound,
+    partition_name,
+)
+from .ratelimit import allow_click, budget_for, reset_rate_limiter, sliding_count
+from .serializers import DESTINATIONS_MAX, DestinationSerializer, validate_destinations
+from .tasks import deactivate_expired_short_urls, maintain_click_partitions
+from .variants import build_alias_table, pick_destination
+from .views import aredirect_short_url
+from .models import (
+    ShortURL,
+    ClickAnalytics,
+    ShortCodeSequence,
+    ClickDailyRollup,
+    ClickHourlyRollup,
+    UniqueVisitorSketch,
+    generate_short_code,
+    short_code_key,
+    SHORT_CODE_ALPHABET,
+)
+
+
+BROWSER_USER_AGENT = (
+    'Mozilla/5.0 (iPhone; CPU iPhone OS 17_0 like Mac OS X) AppleWebKit/605.1.15 '
+    '(KHTML, like Gecko) Version/17.0 Mobile/15E148 Safari/604.1'
+)
+
+
+class ShortCodeAllocationTest(APITestCase):
+    """Test sequence-based short code allocation and custom codes."""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass', email='test@example.com')
+        self.account = Account.objects.create(name='Test Account', email='test@example.com')
+    
+    def test_permutation_is_collision_free(self):
+        """Every sequence number in a tier maps to a distinct code."""
+        key = short_code_key('pay.example.com')
+        space = len(SHORT_CODE_ALPHABET) ** 2
+        codes = {generate_short_code(length=2, sequence=n, key=key) for n in range(space)}
+        self.assertEqual(len(codes), space)
+    
+    def test_codes_grow_when_tier_is_exhausted(self):
+        """Sequence numbers past the current tier produce longer codes."""
+        space = len(SHORT_CODE_ALPHABET) ** 2
+        self.assertEqual(len(generate_short_code(length=2, sequence=space - 1)), 2)
+        self.assertEqual(len(generate_short_code(length=2, sequence=space)), 3)
+    
+    def test_allocate_reserves_consecutive_blocks(self):
+        """Allocations never hand out the same sequence number twice."""
+        first = ShortCodeSequence.allocate('pay.example.com', 3)
+        second = ShortCodeSequence.allocate('pay.example.com', 2)
+        self.assertEqual(list(first), [0, 1, 2])
+        self.assertEqual(list(second), [3, 4])
+    
+    def test_save_assigns_unique_codes(self):
+        """Short URLs created without a code get distinct codes."""
+        codes = {
+            ShortURL.objects.create(
+                account=self.account,
+                domain='pay.example.com',
+                original_url=f'https://example.com/{i}',
+            ).short_code
+            for i in range(20)
+        }
+        self.assertEqual(len(codes), 20)
+    
+    def test_save_skips_code_taken_by_custom_code(self):
+        """A custom code that matches the next allocated code is skipped."""
+        next_code = generate_short_code(sequence=0, key=short_code_key('pay.example.com'))
+        ShortURL.objects.create(
+            account=self.account,
+            domain='pay.example.com',
+            short_code=next_code,
+            original_url='https://example.com/custom',
+        )
+        short_url = ShortURL.objects.create(
+            account=self.account,
+            domain='pay.example.com',
+            original_url='https://example.com/generated',
+        )
+        self.assertNotEqual(short_url.short_code, next_code)
+    
+    def test_custom_codes_are_restricted(self):
+        """Custom codes may only use letters, digits, '_' and '-'."""
+        self.client.force_authenticate(user=self.user)
+        for code in ('bad code', 'a;b', 'x"y', '{z}', '$host'):
+            response = self.client.post('/api/shorten/', {
+                'original_url': 'https://example.com/',
+                'domain': 'pay.ao.com',
+                'short_code': code,
+            }, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, code)
+        
+        response = self.client.post('/api/shorten/', {
+            'original_url': 'https://example.com/',
+            'domain': 'pay.ao.com',
+            'short_code': 'ok_code-1',
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+
+
+class BulkShortenAPITest(APITestCase):
+    """Test the bulk shorten endpoint."""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass', email='test@example.com')
+        self.account = Account.objects.create(name='Test Account', email='test@example.com')
+        self.client.force_authenticate(user=self.user)
+    
+    def test_bulk_shorten_preserves_order_and_reports_errors(self):
+        """Valid URLs are created, invalid ones fail individually."""
+        data = {
+            'urls': [
+                'https://checkout.stripe.com/pay/cs_1',
+                'not-a-url',
+                'https://checkout.stripe.com/pay/cs_2',
+            ],
+            'domain': 'pay.ao.com',
+        }
+        response = self.client.post('/api/shorten/bulk/', data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual(response.data['failed'], 1)
+        
+        results = response.data['results']
+        self.assertEqual([r['status'] for r in results], ['success', 'error', 'success'])
+        self.assertEqual(results[0]['data']['original_url'], 'https://checkout.stripe.com/pay/cs_1')
+        self.assertEqual(results[2]['data']['original_url'], 'https://checkout.stripe.com/pay/cs_2')
+        self.assertEqual(ShortURL.objects.filter(account=self.account).count(), 2)
+    
+    def test_list_search(self):
+        """Search matches substrings of the title or original URL."""
+        self.client.post('/api/shorten/bulk/', {
+            'urls': ['https://checkout.stripe.com/pay/cs_abc', 'https://example.com/other'],
+            'domain': 'pay.ao.com',
+        }, format='json')
+        response = self.client.get('/api/urls/', {'search': 'stripe'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 1)
+        self.assertEqual(response.data['results'][0]['original_url'], 'https://checkout.stripe.com/pay/cs_abc')
+    
+    def test_bulk_shorten_rejects_disallowed_domain(self):
+        """The domain is validated once for the whole batch."""
+        data = {'urls': ['https://example.com/'], 'domain': 'evil.example.com'}
+        response = self.client.post('/api/shorten/bulk/', data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ShortURLUpdateDeleteTest(APITestCase):
+    """Test updating and deleting links of the request's account."""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass', email='test@example.com')
+        self.account = Account.objects.create(name='Test Account', email='test@example.com')
+        self.client.force_authenticate(user=self.user)
+        self.short_url = ShortURL.objects.create(
+            account=self.account,
+            domain='pay.ao.com',
+            original_url='https://checkout.stripe.com/pay/cs_1',
+        )
+    
+    def test_update_and_delete_own_link(self):
+        """Links are looked up by the acting account, not the user."""
+        response = self.client.patch(
+            f'/api/urls/{self.short_url.short_code}/', {'title': 'Checkout'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.short_url.refresh_from_db()
+        self.assertEqual(self.short_url.title, 'Checkout')
+        
+        response = self.client.delete(f'/api/urls/{self.short_url.short_code}/delete/')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.short_url.refresh_from_db()
+        self.assertFalse(self.short_url.is_active)
+    
+    def test_other_accounts_links_are_not_found(self):
+        """Another account's links are out of reach."""
+        other = Account.objects.create(name='Other', email='other@example.com')
+        other_url = ShortURL.objects.create(
+            account=other,
+            domain='pay.ao.com',
+            original_url='https://example.com/other',
+        )
+        response = self.client.delete(f'/api/urls/{other_url.short_code}/delete/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+@override_settings(ALLOWED_HOSTS=['pay.ao.com', 'testserver'], SHORT_URL_CLICK_TASKS=False)
+class ClickRollupTest(APITestCase):
+    """Test rollup maintenance and the stats endpoint."""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass', email='test@example.com')
+        self.account = Account.objects.create(name='Test Account', email='test@example.com')
+        self.short_url = ShortURL.objects.create(
+            account=self.account,
+            domain='pay.ao.com',
+            original_url='https://checkout.stripe.com/pay/cs_1',
+        )
+        self.client.force_authenticate(user=self.user)
+    
+    def test_redirect_updates_rollups(self):
+        """Each redirect increments the hourly and daily buckets."""
+        for _ in range(2):
+            response = self.client.get(
+                f'/{self.short_url.short_code}/',
+                HTTP_HOST='pay.ao.com', HTTP_USER_AGENT=BROWSER_USER_AGENT,
+                HTTP_REFERER='https://t.co/abc',
+            )
+            self.assertEqual(response.status_code, 302)
+        
+        daily = ClickDailyRollup.objects.get(short_url=self.short_url)
+        hourly = ClickHourlyRollup.objects.get(short_url=self.short_url)
+        self.assertEqual(daily.clicks, 2)
+        self.assertEqual(hourly.clicks, 2)
+        self.assertEqual(daily.referrer_host, 't.co')
+    
+    def test_redirect_survives_failed_click_insert(self):
+        """A click that can't be stored doesn't cost the visitor the redirect."""
+        with mock.patch.object(ClickAnalytics.objects, 'create', side_effect=DatabaseError('no partition')):
+            response = self.client.get(
+                f'/{self.short_url.short_code}/',
+                HTTP_HOST='pay.ao.com', HTTP_USER_AGENT=BROWSER_USER_AGENT,
+            )
+        
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(ClickDailyRollup.objects.exists())
+    
+    def test_stats_read_from_rollups(self):
+        """Stats report per-bucket, country and referrer breakdowns."""
+        record_click(self.short_url.pk, ip_address='1.1.1.1', country='US', referer='https://t.co/x')
+        record_click(self.short_url.pk, ip_address='1.1.1.1', country='US')
+        record_click(self.short_url.pk, ip_address='2.2.2.2', country='CA', referer='https://example.com/')
+        
+        response = self.client.get(f'/api/stats/{self.short_url.short_code}/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['unique_visitors'], 2)
+        self.assertEqual(sum(response.data['clicks_by_day'].values()), 3)
+        self.assertEqual(response.data['clicks_by_country'], {'US': 2, 'CA': 1})
+        self.assertEqual(response.data['clicks_by_referrer'], {'t.co': 1, 'example.com': 1})
+        
+        response = self.client.get(
+            f'/api/stats/{self.short_url.short_code}/', {'granularity': 'hour'}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(sum(response.data['clicks_by_hour'].values()), 3)
+    
+    def test_stats_rejects_invalid_range(self):
+        """Malformed or oversized ranges are rejected."""
+        url = f'/api/stats/{self.short_url.short_code}/'
+        self.assertEqual(self.client.get(url, {'start': 'yesterday'}).status_code, 400)
+        response = self.client.get(url, {'start': '2024-01-01', 'end': '2024-06-01', 'granularity': 'hour'})
+        self.assertEqual(response.status_code, 400)
+    
+    def test_backfill_rebuilds_rollups(self):
+        """The backfill command reproduces incrementally maintained rollups."""
+        record_click(self.short_url.pk, ip_address='1.1.1.1', country='US', referer='https://t.co/x')
+        record_click(self.short_url.pk, ip_address='2.2.2.2', country='US', referer='https://t.co/y')
+        ClickDailyRollup.objects.all().delete()
+        UniqueVisitorSketch.objects.all().delete()
+        
+        call_command('backfill_click_rollups', stdout=StringIO())
+        
+        daily = ClickDailyRollup.objects.get(short_url=self.short_url)
+        self.assertEqual(daily.clicks, 2)
+        self.assertEqual(ClickHourlyRollup.objects.get(short_url=self.short_url).clicks, 2)
+        self.assertEqual(UniqueVisitorSketch.objects.get(short_url=self.short_url).sketch.count(), 2)
+
+
+class ClickExportTest(APITestCase):
+    """Test the streaming click export."""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass', email='test@example.com')
+        self.account = Account.objects.create(name='Test Account', email='test@example.com')
+        self.short_url = ShortURL.objects.create(
+            account=self.account,
+            domain='pay.ao.com',
+            original_url='https://checkout.stripe.com/pay/cs_1',
+        )
+        self.other = ShortURL.objects.create(
+            account=self.account,
+            domain='pay.ao.com',
+            original_url='https://checkout.stripe.com/pay/cs_2',
+        )
+        record_click(self.short_url.pk, ip_address='1.1.1.1', country='US', referer='https://t.co/x')
+        record_click(self.short_url.pk, ip_address='2.2.2.2', user_agent='=HYPERLINK("x")')
+        record_click(self.other.pk, ip_address='3.3.3.3')
+        self.client.force_authenticate(user=self.user)
+    
+    def test_ndjson_export_for_one_link(self):
+        """NDJSON export streams one object per click of the link."""
+        response = self.client.get('/api/clicks/export/', {'short_code': self.short_url.short_code})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual([row['ip_address'] for row in rows], ['1.1.1.1', '2.2.2.2'])
+        self.assertEqual(rows[0]['short_code'], self.short_url.short_code)
+        self.assertEqual(rows[0]['country'], 'US')
+    
+    def test_gzipped_csv_export_for_account(self):
+        """CSV export covers every link of the account and can be gzipped."""
+        response = self.client.get('/api/clicks/export/', {'output': 'csv', 'gzip': 'true'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        
+        body = gzip.decompress(b''.join(response.streaming_content)).decode()
+        rows = list(csv.DictReader(body.splitlines()))
+        self.assertEqual(len(rows), 3)
+        # Formula-looking values are escaped for spreadsheets
+        self.assertEqual(rows[1]['user_agent'], "'=HYPERLINK(\"x\")")
+    
+    def test_export_by_code_spans_domains(self):
+        """A code used on several domains exports each, or one with ?domain=."""
+        twin = ShortURL.objects.create(
+            account=self.account,
+            domain='go.ao.com',
+            short_code=self.short_url.short_code,
+            original_url='https://example.com/twin',
+        )
+        record_click(twin.pk, ip_address='4.4.4.4')
+        
+        params = {'short_code': self.short_url.short_code}
+        response = self.client.get('/api/clicks/export/', params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(b''.join(response.streaming_content).splitlines()), 3)
+        
+        response = self.client.get('/api/clicks/export/', {**params, 'domain': 'go.ao.com'})
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual([row['ip_address'] for row in rows], ['4.4.4.4'])
+    
+    def test_export_filename_is_sanitized(self):
+        """Legacy codes can't inject into the Content-Disposition header."""
+        ShortURL.objects.filter(pk=self.short_url.pk).update(short_code='a"b;c')
+        response = self.client.get('/api/clicks/export/', {'short_code': 'a"b;c', 'start': '2026-01-01', 'end': '2026-02-01'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="clicks-a_b_c-20260101-20260201.ndjson"')
+    
+    def test_users_without_account_see_no_links(self):
+        """A user whose email matches no account can't reach another account's links."""
+        stranger = User.objects.create_user(username='stranger', password='testpass', email='nobody@example.com')
+        self.client.force_authenticate(user=stranger)
+        code = self.short_url.short_code
+        
+        for response in (
+            self.client.get('/api/urls/'),
+            self.client.get('/api/clicks/export/'),
+            self.client.get('/api/clicks/export/', {'short_code': code}),
+            self.client.get(f'/api/stats/{code}/'),
+            self.client.delete(f'/api/urls/{code}/'),
+        ):
+            self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertTrue(ShortURL.objects.get(pk=self.short_url.pk).is_active)
+        
+        response = self.client.post('/api/shorten/', {'original_url': 'https://example.com/'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(ShortURL.objects.count(), 2)
+    
+    def test_export_rejects_bad_params(self):
+        """Unknown formats, bad ranges and foreign links are rejected."""
+        self.assertEqual(self.client.get('/api/clicks/export/', {'output': 'xml'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/clicks/export/', {'start': 'soon'}).status_code, 400)
+        other_account = Account.objects.create(name='Other', email='other@example.com')
+        foreign = ShortURL.objects.create(
+            account=other_account, domain='pay.ao.com', original_url='https://example.com/'
+        )
+        response = self.client.get('/api/clicks/export/', {'short_code': foreign.short_code})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class HyperLogLogTest(TestCase):
+    """Test the unique visitor sketch."""
+    
+    def test_estimate_is_close(self):
+        """Estimates stay within a few percent of the true cardinality."""
+        hll = HyperLogLog()
+        for i in range(20000):
+            hll.add(f'10.0.{i // 256}.{i % 256}')
+        self.assertAlmostEqual(hll.count(), 20000, delta=20000 * 0.05)
+    
+    def test_small_counts_are_exact_enough(self):
+        """Duplicates are not counted twice at low cardinality."""
+        hll = HyperLogLog()
+        for _ in range(3):
+            for ip in ('1.1.1.1', '2.2.2.2', '3.3.3.3'):
+                hll.add(ip)
+        self.assertEqual(hll.count(), 3)
+    
+    def test_merge_and_roundtrip(self):
+        """Merged sketches count the union and survive serialization."""
+        first, second = HyperLogLog(), HyperLogLog()
+        for i in range(1000):
+            first.add(f'a{i}')
+            second.add(f'a{i + 500}')
+        merged = HyperLogLog.from_bytes(first.to_bytes()).merge(second)
+        self.assertAlmostEqual(merged.count(), 1500, delta=1500 * 0.05)
+
+
+@override_settings(ALLOWED_HOSTS=['pay.ao.com', 'testserver'], SHORT_URL_CLICK_TASKS=True)
+class RedirectFastPathTest(TestCase):
+    """Test the cached redirect view."""
+    
+    def setUp(self):
+        cache.clear()
+        # The test cache is local memory; use it as if it were shared
+        shared = mock.patch('url_shortener.cache.cache_is_shared', return_value=True)
+        shared.start()
+        self.addCleanup(shared.stop)
+        self.account = Account.objects.create(name='Test Account', email='test@example.com')
+        self.short_url = ShortURL.objects.create(
+            account=self.account,
+            domain='pay.ao.com',
+            original_url='https://checkout.stripe.com/pay/cs_1',
+        )
+        self.path = f'/{self.short_url.short_code}/'
+    
+    @mock.patch('url_shortener.tasks.record_click_task.delay')
+    def test_cached_redirect_skips_database(self, delay):
+        """A warm redirect is served from cache and queues the click."""
+        self.client.get(self.path, HTTP_HOST='pay.ao.com', HTTP_USER_AGENT=BROWSER_USER_AGENT)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.path, HTTP_HOST='pay.ao.com', HTTP_USER_AGENT=BROWSER_USER_AGENT, HTTP_REFERER='https://t.co/x')
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response['Location'], 'https://checkout.stripe.com/pay/cs_1')
+        self.assertEqual(delay.call_count, 2)
+        self.assertEqual(delay.call_args.kwargs['short_url_id'], self.short_url.pk)
+        self.assertEqual(delay.call_args.kwargs['referer'], 'https://t.co/x')
+    
+    @mock.patch('url_shortener.tasks.record_click_task.delay')
+    def test_deactivation_invalidates_cache(self, delay):
+        """Deactivated links stop redirecting immediately."""
+        self.client.get(self.path, HTTP_HOST='pay.ao.com', HTTP_USER_AGENT=BROWSER_USER_AGENT)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.short_url.is_active = False
+            self.short_url.save()
+        response = self.client.get(self.path, HTTP_HOST='pay.ao.com', HTTP_USER_AGENT=BROWSER_USER_AGENT)
+        self.assertEqual(response.status_code, 404)
+    
+    @mock.patch('url_shortener.tasks.record_click_task.delay')
+    def test_local_memory_cache_is_not_used(self, delay):
+        """Without a shared cache every redirect reads the database."""
+        with mock.patch('url_shortener.cache.cache_is_shared', return_value=False):
+            self.client.get(self.path, HTTP_HOST='pay.ao.com', HTTP_USER_AGENT=BROWSER_USER_AGENT)
+            with self.assertNumQueries(1):
+                response = self.client.get(self.path, HTTP_HOST='pay.ao.com', HTTP_USER_AGENT=BROWSER_USER_AGENT)
+        self.assertEqual(response.status_code, 302)
+        self.assertIsNone(cache.get(link_cache_key('pay.ao.com', self.short_url.short_code)))
+    
+    @mock.patch('url_shortener.tasks.record_click_task.delay')
+    def test_async_redirect(self, delay):
+        """The async variant resolves the same links."""
+        request = RequestFactory().get(self.path, HTTP_HOST='pay.ao.com', HTTP_USER_AGENT=BROWSER_USER_AGENT)
+        response = async_to_sync(aredirect_short_url)(request, self.short_url.short_code)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(delay.call_count, 1)
+        
+        request = RequestFactory().get('/missing/', HTTP_HOST='pay.ao.com', HTTP_USER_AGENT=BROWSER_USER_AGENT)
+        response = async_to_sync(aredirect_short_url)(request, 'missing')
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(SHORT_URL_NGINX_RELOAD_COMMAND='')
+class GeoTargetingTest(APITestCase):
+    """Test the IP range index and geo-targeted redirects."""
+    
+    RANGES = (
+        'start,end,country\n'
+        '1.0.0.0,1.0.0.255,AU\n'
+        '1.0.1.0,1.0.3.255,AU\n'
+        '5.0.0.0,5.255.255.255,DE\n'
+        '16777216,16777216,ZZ\n'
+        '2001:db8::,2001:db8::ffff,FR\n'
+    )
+    
+    def setUp(self):
+        cache.clear()
+        directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, directory)
+        self.ranges_file = directory / 'ranges.csv'
+        self.ranges_file.write_text(self.RANGES)
+        reset_ip_index()
+        self.addCleanup(reset_ip_index)
+        
+        self.user = User.objects.create_user(username='testuser', password='testpass', email='test@example.com')
+        self.account = Account.objects.create(name='Test Account', email='test@example.com')
+        self.short_url = ShortURL.objects.create(
+            account=self.account,
+            domain='pay.ao.com',
+            original_url='https://checkout.stripe.com/pay/cs_1',
+            geo_targets={'DE': 'https://checkout.stripe.com/pay/cs_de'},
+        )
+    
+    def test_index_lookup(self):
+        """Lookups resolve covered ranges and miss gaps."""
+        index = IPRangeIndex.from_csv(self.ranges_file)
+        # Adjacent AU ranges are merged
+        self.assertEqual(len(index.ipv4), 2)
+        self.assertEqual(index.country('1.0.2.9'), 'AU')
+        self.assertEqual(index.country('5.1.2.3'), 'DE')
+        self.assertEqual(index.country('4.4.4.4'), '')
+        self.assertEqual(index.country('::ffff:5.1.2.3'), 'DE')
+        self.assertEqual(index.country('2001:db8::1'), 'FR')
+        self.assertEqual(index.country('not-an-ip'), '')
+    
+    @mock.patch('url_shortener.tasks.record_click_task.delay')
+    def test_redirect_follows_visitor_country(self, delay):
+        """Visitors from a targeted country get that country's destination."""
+        with override_settings(
+            ALLOWED_HOSTS=['pay.ao.com'],
+            SHORT_URL_GEOIP_RANGES_FILE=str(self.ranges_file),
+        ):
+            path = f'/{self.short_url.short_code}/'
+            response = self.client.get(path, HTTP_HOST='pay.ao.com', HTTP_USER_AGENT=BROWSER_USER_AGENT, REMOTE_ADDR='5.1.2.3')
+            self.assertEqual(response['Location'], 'https://checkout.stripe.com/pay/cs_de')
+            self.assertEqual(delay.call_args.kwargs['country'], 'DE')
+            
+            response = self.client.get(path, HTTP_HOST='pay.ao.com', HTTP_USER_AGENT=BROWSER_USER_AGENT, REMOTE_ADDR='1.0.0.1')
+            self.assertEqual(response['Location'], 'https://checkout.stripe.com/pay/cs_1')
+    
+    def test_geo_targets_are_validated(self):
+        """Country codes are normalised and destinations must be http(s) URLs."""
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post('/api/shorten/', {
+            'original_url': 'https://example.com/',
+            'domain': 'pay.ao.com',
+            'short_code': 'geo1',
+            'geo_targets': {'us': 'https://example.com/us'},
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        self.assertEqual(response.data['data']['geo_targets'], {'US': 'https://example.com/us'})
+        
+        for geo_targets in ({'USA': 'https://example.com/'}, {'US': 'ftp://example.com/'}):
+            response = self.client.post('/api/shorten/', {
+                'original_url': 'https://example.com/',
+                'domain': 'pay.ao.com',
+                'short_code': 'geo2',
+                'geo_targets': geo_targets,
+            }, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_geo_targeted_links_stay_out_of_nginx_maps(self):
+        """nginx cannot pick per-country targets, so these links are not exported."""
+        directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, directory)
+        export_redirect_maps(directory, reload=False)
+        self.assertFalse((directory / 'pay.ao.com.map').exists())
+
+
+@override_settings(ALLOWED_HOSTS=['pay.ao.com', 'testserver'], SHORT_URL_CLICK_TASKS=False)
+class WeightedDestinationTest(APITestCase):
+    """Test weighted multi-destination links."""
+    
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass', email='test@example.com')
+        self.account = Account.objects.create(name='Test Account', email='test@example.com')
+        self.short_url = ShortURL.objects.create(
+            account=self.account,
+            domain='pay.ao.com',
+            original_url='https://checkout.stripe.com/pay/cs_1',
+            destinations=[
+                {'url': 'https://checkout.stripe.com/pay/cs_a', 'weight': 1, 'label': 'A'},
+                {'url': 'https://checkout.stripe.com/pay/cs_b', 'weight': 0, 'label': 'B'},
+            ],
+        )
+        self.client.force_authenticate(user=self.user)
+    
+    def test_alias_table_matches_weights(self):
+        """Each outcome's total probability mass equals its share of the weight."""
+        weights = [5, 1, 3, 0, 7]
+        prob, alias = build_alias_table(weights)
+        n = len(weights)
+        mass = [p / n for p in prob]
+        for i in range(n):
+            mass[alias[i]] += (1 - prob[i]) / n
+        for i, weight in enumerate(weights):
+            self.assertAlmostEqual(mass[i], weight / sum(weights))
+    
+    def test_pick_uses_alias(self):
+        """A draw past an entry's probability lands on its alias."""
+        table = {'urls': ['a', 'b'], 'labels': ['A', 'B'], 'prob': [0.5, 1.0], 'alias': [1, 1]}
+        self.assertEqual(pick_destination(table, rand=lambda: 0.1), ('a', 'A'))
+        self.assertEqual(pick_destination(table, rand=lambda: 0.3), ('b', 'B'))
+    
+    def test_redirect_records_variant(self):
+        """The chosen variant is used for the redirect and shows up in stats."""
+        self.assertEqual(self.short_url.destination_table['labels'], ['A', 'B'])
+        for _ in range(3):
+            response = self.client.get(f'/{self.short_url.short_code}/', HTTP_HOST='pay.ao.com', HTTP_USER_AGENT=BROWSER_USER_AGENT)
+            self.assertEqual(response['Location'], 'https://checkout.stripe.com/pay/cs_a')
+        
+        self.assertEqual(ClickAnalytics.objects.filter(variant='A').count(), 3)
+        response = self.client.get(f'/api/stats/{self.short_url.short_code}/')
+        self.assertEqual(response.data['clicks_by_variant'], {'A': 3})
+    
+    def test_destinations_are_validated(self):
+        """Labels default to letters and must be unique; some weight is required."""
+        response = self.client.post('/api/shorten/', {
+            'original_url': 'https://example.com/',
+            'domain': 'pay.ao.com',
+            'short_code': 'ab1',
+            'destinations': [{'url': 'https://example.com/a'}, {'url': 'https://example.com/b', 'weight': 2}],
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        self.assertEqual([d['label'] for d in response.data['data']['destinations']], ['A', 'B'])
+        
+        for destinations in (
+            [{'url': 'https://example.com/a', 'weight': 0}],
+            [{'url': 'https://example.com/a', 'label': 'X'}, {'url': 'https://example.com/b', 'label': 'X'}],
+            [{'url': 'ftp://example.com/a'}],
+        ):
+            response = self.client.post('/api/shorten/', {
+                'original_url': 'https://example.com/',
+                'domain': 'pay.ao.com',
+                'short_code': 'ab2',
+                'destinations': destinations,
+            }, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_oversized_destination_lists_are_rejected_up_front(self):
+        """Lists over the limit fail before any entry is validated."""
+        destinations = [{'url': f'https://example.com/{i}'} for i in range(DESTINATIONS_MAX + 1)]
+        with mock.patch.object(DestinationSerializer, 'to_internal_value') as to_internal_value:
+            with self.assertRaises(ValidationError):
+                validate_destinations(destinations)
+        to_internal_value.assert_not_called()
+
+
+@override_settings(ALLOWED_HOSTS=['pay.ao.com'], SHORT_URL_CLICK_TASKS=False)
+class RedirectRateLimitTest(TestCase):
+    """Test redirect rate limiting."""
+    
+    def setUp(self):
+        cache.clear()
+        reset_rate_limiter()
+        self.addCleanup(reset_rate_limiter)
+        self.account = Account.objects.create(name='Test Account', email='test@example.com')
+        self.short_url = ShortURL.objects.create(
+            account=self.account,
+            domain='pay.ao.com',
+            original_url='https://checkout.stripe.com/pay/cs_1',
+        )
+    
+    def test_sliding_count_weights_previous_window(self):
+        """The previous window counts less the further into the current one we are."""
+        self.assertEqual(sliding_count(10, 40, 0.0), 50)
+        self.assertEqual(sliding_count(10, 40, 0.75), 20)
+        self.assertEqual(sliding_count(10, 40, 1.0), 10)
+    
+    @override_settings(
+        SHORT_URL_RATE_LIMIT={'window': 60, 'ip': 60, 'link': 6000},
+        SHORT_URL_RATE_LIMIT_DOMAINS={'pay.ao.com': {'ip': 5}},
+    )
+    def test_budgets_can_be_overridden_per_domain(self):
+        """Domain budgets override only the limits they name."""
+        self.assertEqual(budget_for('pay.ao.com'), {'window': 60, 'ip': 5, 'link': 6000})
+        self.assertEqual(budget_for('pay.aollc.com')['ip'], 60)
+    
+    @override_settings(SHORT_URL_RATE_LIMIT_REDIS_URL='redis://127.0.0.1:1/0')
+    def test_fails_open_without_redis(self):
+        """An unreachable Redis allows clicks rather than failing redirects."""
+        with self.assertLogs('url_shortener.ratelimit', 'WARNING'):
+            self.assertTrue(allow_click('1.1.1.1', 'pay.ao.com', self.short_url.short_code))
+        # Backs off instead of retrying the connection on every redirect
+        with mock.patch('url_shortener.ratelimit._get_script') as get_script:
+            self.assertTrue(allow_click('1.1.1.1', 'pay.ao.com', self.short_url.short_code))
+        get_script.assert_not_called()
+    
+    @override_settings(
+        SHORT_URL_RATE_LIMIT_REDIS_URL='redis://localhost:6379/0',
+        SHORT_URL_RATE_LIMIT={'window': 60, 'ip': 5, 'link': 6000},
+    )
+    def test_bot_hits_are_limited(self):
+        """Crawler or missing user agents don't get around the limiter."""
+        hits = Counter()
+        
+        def script(keys, args):
+            counts = []
+            for current, previous in zip(keys[::2], keys[1::2]):
+                hits[current] += 1
+                counts += [hits[current], hits[previous]]
+            return counts
+        
+        with mock.patch('url_shortener.ratelimit._get_script', return_value=script):
+            for user_agent in ('Googlebot/2.1', '') * 10:
+                response = self.client.get(
+                    f'/{self.short_url.short_code}/', HTTP_HOST='pay.ao.com', HTTP_USER_AGENT=user_agent, REMOTE_ADDR='1.1.1.1'
+                )
+                self.assertEqual(response.status_code, 302)
+        
+        self.short_url.refresh_from_db()
+        self.assertEqual(self.short_url.bot_clicks, 5)
+    
+    @mock.patch('url_shortener.views.allow_click', return_value=False)
+    def test_limited_clicks_still_redirect(self, allow):
+        """Over-limit requests are redirected without recording a click."""
+        response = self.client.get(
+            f'/{self.short_url.short_code}/', HTTP_HOST='pay.ao.com', HTTP_USER_AGENT=BROWSER_USER_AGENT, REMOTE_ADDR='1.1.1.1'
+        )
+        self.assertEqual(response.status_code, 302)
+        allow.assert_called_once_with('1.1.1.1', 'pay.ao.com', self.short_url.short_code)
+        self.assertFalse(ClickAnalytics.objects.exists())
+        self.short_url.refresh_from_db()
+        self.assertEqual(self.short_url.clicks, 0)
+
+
+class BotClassificationTest(TestCase):
+    """Test bot detection on the redirect path."""
+    
+    def setUp(self):
+        cache.clear()
+        self.account = Account.objects.create(name='Test Account', email='test@example.com')
+        self.short_url = ShortURL.objects.create(
+            account=self.account,
+            domain='pay.ao.com',
+            original_url='https://checkout.stripe.com/pay/cs_1',
+        )
+    
+    def test_classifier(self):
+        """Link previews, crawlers and HTTP libraries are bots; browsers are not."""
+        bots = [
+            'Slackbot-LinkExpanding 1.0 (+https://api.slack.com/robots)',
+            'WhatsApp/2.23.20.0 A',
+            'facebookexternalhit/1.1 Facebot Twitterbot/1.0',
+            'Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)',
+            'Mozilla/5.0+(compatible; UptimeRobot/2.0; http://www.uptimerobot.com/)',
+            'curl/8.4.0',
+            'python-requests/2.31.0',
+            'Mozilla/5.0 (compatible; SomeNewBot/1.2; +https://example.com/bot)',
+            'my-link-checker bot',
+            '',
+        ]
+        browsers = [
+            BROWSER_USER_AGENT,
+            'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+            '(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+            'Mozilla/5.0 (Linux; Android 14) AppleWebKit/537.36 (KHTML, like Gecko) '
+            'Chrome/120.0 Mobile Safari/537.36 Instagram 312.0.0.0',
+            'Mozilla/5.0 (Linux; Android 12; CUBOT KINGKONG 7) AppleWebKit/537.36 '
+            '(KHTML, like Gecko) Chrome/120.0 Mobile Safari/537.36',
+        ]
+        for user_agent in bots:
+            self.assertTrue(is_bot(user_agent), user_agent)
+        for user_agent in browsers:
+            self.assertFalse(is_bot(user_agent), user_agent)
+    
+    @override_settings(ALLOWED_HOSTS=['pay.ao.com'], SHORT_URL_CLICK_TASKS=False)
+    def test_bot_hits_only_bump_counter(self):
+        """Bots are redirected and counted without analytics rows."""
+        response = self.client.get(
+            f'/{self.short_url.short_code}/',
+            HTTP_HOST='pay.ao.com',
+            HTTP_USER_AGENT='Slackbot-LinkExpanding 1.0 (+https://api.slack.com/robots)',
+        )
+        self.assertEqual(response.status_code, 302)
+        self.short_url.refresh_from_db()
+        self.assertEqual((self.short_url.clicks, self.short_url.bot_clicks), (0, 1))
+        self.assertFalse(ClickAnalytics.objects.exists())
+        self.assertFalse(ClickDailyRollup.objects.exists())
+
+
+class NginxMapExportTest(TestCase):
+    """Test the nginx redirect map export."""
+    
+    def setUp(self):
+        self.account = Account.objects.create(name='Test Account', email='test@example.com')
+        self.directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.short_url = ShortURL.objects.create(
+            account=self.account,
+            domain='pay.ao.com',
+            original_url='https://checkout.stripe.com/pay/cs_1',
+        )
+    
+    def test_export_writes_active_links(self):
+        """Active links are exported; inactive and expiring ones are not."""
+        ShortURL.objects.create(
+            account=self.account, domain='pay.ao.com', is_active=False,
+            original_url='https://example.com/inactive',
+        )
+        ShortURL.objects.create(
+            account=self.account, domain='pay.ao.com',
+            expires_at=timezone.now() + timedelta(minutes=1),
+            original_url='https://example.com/expiring',
+        )
+        
+        summary = export_redirect_maps(self.directory)
+        
+        content = (self.directory / 'pay.ao.com.map').read_text()
+        self.assertEqual(summary['written'], ['pay.ao.com'])
+        self.assertIn(f'pay.ao.com/{self.short_url.short_code}/ "https://checkout.stripe.com/pay/cs_1";', content)
+        self.assertNotIn('inactive', content)
+        self.assertNotIn('expiring', content)
+    
+    def test_export_skips_unsafe_codes(self):
+        """Codes nginx would misread are left out of the map."""
+        ShortURL.objects.create(
+            account=self.account, domain='pay.ao.com', short_code='a;b "x"',
+            original_url='https://example.com/injected',
+        )
+        export_redirect_maps(self.directory)
+        content = (self.directory / 'pay.ao.com.map').read_text()
+        self.assertIn(self.short_url.short_code, content)
+        self.assertNotIn('injected', content)
+    
+    def test_codes_differing_in_case_are_left_out(self):
+        """nginx matches map keys case-insensitively, so case twins go to gunicorn."""
+        for code, url in (('abc123', 'https://example.com/lower'), ('ABC123', 'https://example.com/upper')):
+            ShortURL.objects.create(account=self.account, domain='pay.ao.com', short_code=code, original_url=url)
+        # A twin served by gunicorn (geo-targeted) counts too
+        ShortURL.objects.create(
+            account=self.account, domain='pay.ao.com', short_code='Geo1',
+            original_url='https://example.com/geo', geo_targets={'DE': 'https://example.com/de'},
+        )
+        ShortURL.objects.create(account=self.account, domain='pay.ao.com', short_code='geo1', original_url='https://example.com/plain')
+        ShortURL.objects.create(account=self.account, domain='pay.aollc.com', short_code='ABC123', original_url='https://example.com/other')
+        
+        export_redirect_maps(self.directory)
+        
+        content = (self.directory / 'pay.ao.com.map').read_text()
+        self.assertIn(self.short_url.short_code, content)
+        for url in ('lower', 'upper', 'plain'):
+            self.assertNotIn(url, content)
+        self.assertIn('pay.aollc.com/ABC123 ', (self.directory / 'pay.aollc.com.map').read_text())
+    
+    def test_export_is_incremental(self):
+        """Unchanged domains are skipped and removed domains are deleted."""
+        other = ShortURL.objects.create(
+            account=self.account, domain='pay.aollc.com',
+            original_url='https://example.com/other',
+        )
+        export_redirect_maps(self.directory)
+        
+        ShortURL.objects.filter(pk=self.short_url.pk).update(
+            original_url='https://example.com/changed', updated_at=timezone.now() + timedelta(seconds=1)
+        )
+        other.delete()
+        summary = export_redirect_maps(self.directory)
+        
+        self.assertEqual(summary['written'], ['pay.ao.com'])
+        self.assertEqual(summary['removed'], ['pay.aollc.com'])
+        self.assertIn('changed', (self.directory / 'pay.ao.com.map').read_text())
+        self.assertFalse((self.directory / 'pay.aollc.com.map').exists())
+        
+        summary = export_redirect_maps(self.directory)
+        self.assertEqual(summary['unchanged'], ['pay.ao.com'])
+
+
+class ExpirySweepTest(TestCase):
+    """Test the expired link sweeper."""
+    
+    def setUp(self):
+        cache.clear()
+        self.account = Account.objects.create(name='Test Account', email='test@example.com')
+    
+    def test_sweeper_deactivates_expired_links_in_batches(self):
+        """Expired links are deactivated and evicted; others are untouched."""
+        expired = [
+            ShortURL.objects.create(
+                account=self.account, domain='pay.ao.com',
+                expires_at=timezone.now() - timedelta(minutes=i + 1),
+                original_url=f'https://example.com/{i}',
+            )
+            for i in range(5)
+        ]
+        live = ShortURL.objects.create(
+            account=self.account, domain='pay.ao.com',
+            expires_at=timezone.now() + timedelta(days=1),
+            original_url='https://example.com/live',
+        )
+        cache.set(link_cache_key('pay.ao.com', expired[0].short_code), {'id': expired[0].pk})
+        
+        self.assertEqual(deactivate_expired_short_urls(batch_size=2), 5)
+        
+        self.assertFalse(ShortURL.objects.filter(pk__in=[u.pk for u in expired], is_active=True).exists())
+        self.assertTrue(ShortURL.objects.get(pk=live.pk).is_active)
+        self.assertIsNone(cache.get(link_cache_key('pay.ao.com', expired[0].short_code)))
+        self.assertEqual(deactivate_expired_short_urls(), 0)
+
+
+@override_settings(SHORT_URL_HEALTH_CHECK_PER_HOST=2)
+class HealthCheckTest(TestCase):
+    """Test the destination health checker."""
+    
+    def setUp(self):
+        self.account = Account.objects.create(name='Test Account', email='test@example.com')
+        self.requests = []
+        self.in_flight = {}
+        self.peak = {}
+    
+    async def handler(self, request):
+        host = request.url.host
+        self.requests.append((request.method, str(request.url)))
+        self.in_flight[host] = self.in_flight.get(host, 0) + 1
+        self.peak[host] = max(self.peak.get(host, 0), self.in_flight[host])
+        await asyncio.sleep(0.01)
+        self.in_flight[host] -= 1
+        if request.url.path == '/expired':
+            return httpx.Response(404)
+        if request.url.path == '/no-head' and request.method == 'HEAD':
+            return httpx.Response(405)
+        if request.url.host == 'down.example.com':
+            raise httpx.ConnectError('Connection refused', request=request)
+        return httpx.Response(200)
+    
+    def create_link(self, url, **kwargs):
+        return ShortURL.objects.create(
+            account=self.account, domain='pay.ao.com', original_url=url, **kwargs
+        )
+    
+    def test_links_are_classified(self):
+        """Reachable links are ok; 4xx and connection errors are broken."""
+        ok = self.create_link('https://checkout.stripe.com/pay/cs_1')
+        expired = self.create_link('https://checkout.stripe.com/expired')
+        down = self.create_link('https://down.example.com/')
+        no_head = self.create_link('https://example.com/no-head')
+        
+        summary = check_link_health(transport=httpx.MockTransport(self.handler))
+        self.assertEqual(summary, {'checked': 4, 'broken': 2})
+        
+        ok.refresh_from_db()
+        self.assertEqual(ok.health_status, 'ok')
+        self.assertEqual(ok.health_status_code, 200)
+        self.assertIsNotNone(ok.health_latency_ms)
+        expired.refresh_from_db()
+        self.assertEqual((expired.health_status, expired.health_status_code), ('broken', 404))
+        down.refresh_from_db()
+        self.assertEqual(down.health_status, 'broken')
+        self.assertIn('ConnectError', down.health_error)
+        no_head.refresh_from_db()
+        self.assertEqual(no_head.health_status, 'ok')
+        self.assertIn(('GET', 'https://example.com/no-head'), self.requests)
+    
+    def test_probes_are_deduplicated_and_limited_per_host(self):
+        """Shared destinations are probed once; hosts get bounded concurrency."""
+        for i in range(10):
+            self.create_link(f'https://checkout.stripe.com/pay/cs_{i}')
+        self.create_link('https://checkout.stripe.com/pay/cs_0')
+        
+        summary = check_link_health(transport=httpx.MockTransport(self.handler))
+        self.assertEqual(summary['checked'], 11)
+        self.assertEqual(len(self.requests), 10)
+        self.assertLessEqual(self.peak['checkout.stripe.com'], 2)
+    
+    def test_only_due_links_are_checked(self):
+        """Recently checked, inactive and expired links are skipped."""
+        self.create_link('https://example.com/fresh', health_checked_at=timezone.now())
+        self.create_link('https://example.com/off', is_active=False)
+        self.create_link('https://example.com/gone', expires_at=timezone.now() - timedelta(minutes=1))
+        due = self.create_link(
+            'https://example.com/stale', health_checked_at=timezone.now() - timedelta(days=1)
+        )
+        
+        check_link_health(transport=httpx.MockTransport(self.handler))
+        self.assertEqual(self.requests, [('HEAD', due.original_url)])
+
+
+class ClickPartitionTest(TestCase):
+    """Test click_analytics partition maintenance helpers."""
+    
+    def test_month_arithmetic(self):
+        """Months roll over year boundaries in both directions."""
+        start = month_start(timezone.now().replace(year=2026, month=12, day=15))
+        self.assertEqual((start.year, start.month, start.day, start.hour), (2026, 12, 1, 0))
+        self.assertEqual(add_months(start, 1).strftime('%Y-%m'), '2027-01')
+        self.assertEqual(add_months(start, -12).strftime('%Y-%m'), '2025-12')
+    
+    def test_only_partitions_past_retention_expire(self):
+        """Partitions expire once their whole range is older than the retention."""
+        bounds = {
+            'click_analytics_legacy': "FOR VALUES FROM (MINVALUE) TO ('2025-11-01 00:00:00+00')",
+            'click_analytics_p202511': "FOR VALUES FROM ('2025-11-01 00:00:00+00') TO ('2025-12-01 00:00:00+00')",
+            'click_analytics_p202612': "FOR VALUES FROM ('2026-12-01 00:00:00+00') TO ('2027-01-01 00:00:00+00')",
+            'click_analytics_default': 'DEFAULT',
+        }
+        partitions = {name: parse_upper_bound(bound) for name, bound in bounds.items()}
+        now = timezone.now().replace(year=2026, month=10, day=18)
+        
+        self.assertEqual(
+            expired_partitions(partitions, 10, now),
+            ['click_analytics_legacy', 'click_analytics_p202511'],
+        )
+        self.assertEqual(expired_partitions(partitions, 11, now), ['click_analytics_legacy'])
+    
+    def test_maintenance_is_noop_without_partitioning(self):
+        """On databases without partitioning nothing is created or dropped."""
+        self.assertEqual(maintain_click_partitions(), {'created': [], 'dropped': []})
+    
+    @skipUnless(connection.vendor == 'postgresql', 'Partitioning is PostgreSQL only')
+    @override_settings(SHORT_URL_CLICK_PARTITIONS_AHEAD=0, SHORT_URL_CLICK_RETENTION_MONTHS=12)
+    def test_maintenance_with_default_partition(self):
+        """Old partitions drop and this month's clicks leave the default partition."""
+        account = Account.objects.create(name='Test Account', email='test@example.com')
+        short_url = ShortURL.objects.create(account=account, domain='pay.ao.com', original_url='https://example.com/')
+        record_click(short_url.pk, ip_address='1.1.1.1')
+        
+        # Partition the test table the way migrations 0011 and 0012 do
+        month = month_start(timezone.now())
+        old = add_months(month, -24)
+        with connection.cursor() as cursor:
+            cursor.execute('ALTER TABLE click_analytics RENAME TO click_analytics_plain')
+            cursor.execute(
+                'CREATE TABLE click_analytics (LIKE click_analytics_plain INCLUDING DEFAULTS) '
+                'PARTITION BY RANGE (clicked_at)'
+            )
+            cursor.execute(f'CREATE TABLE {DEFAULT_PARTITION} PARTITION OF click_analytics DEFAULT')
+            cursor.execute(
+                f'CREATE TABLE {partition_name(old)} PARTITION OF click_analytics FOR VALUES FROM (%s) TO (%s)',
+                [old, add_months(old, 1)],
+            )
+            cursor.execute('INSERT INTO click_analytics SELECT * FROM click_analytics_plain')
+        
+        summary = maintain_click_partitions()
+        
+        self.assertEqual(summary, {'created': [partition_name(month)], 'dropped': [partition_name(old)]})
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT COUNT(*) FROM {partition_name(month)}')
+            self.assertEqual(cursor.fetchone()[0], 1)
+            cursor.execute(f'SELECT COUNT(*) FROM {DEFAULT_PARTITION}')
+            self.assertEqual(cursor.fetchone()[0], 0)
+            cursor.execute('SELECT to_regclass(%s)', [partition_name(old)])
+            self.assertIsNone(cursor.fetchone()[0])
@@ -1,6 +1,7 @@
 """
 URL routing for URL Shortener.
 """
+from django.conf import settings
 from django.urls import path
 from . import views
 
@@ -9,12 +10,19 @@ app_name = 'url_shortener'
 urlpatterns = [
     # API endpoints (authenticated)
     path('api/shorten/', views.create_short_url, name='create'),
+    path('api/shorten/bulk/', views.bulk_create_short_urls, name='bulk-create'),
     path('api/urls/', views.list_short_urls, name='list'),
     path('api/urls/<str:short_code>/', views.update_short_url, name='update'),
     path('api/stats/<str:short_code>/', views.get_short_url_stats, name='stats'),
     path('api/urls/<str:short_code>/delete/', views.delete_short_url, name='delete'),
+    path('api/clicks/export/', views.export_clicks, name='export-clicks'),
     
     # Public redirect endpoint (no auth required)
     # This is a catch-all and should be included LAST in the main urls.py
-    path('<str:short_code>/', views.redirect_short_url, name='redirect'),
+    # Under ASGI (config.asgi) the async variant avoids a thread per redirect
+    path(
+        '<str:short_code>/',
+        views.aredirect_short_url if settings.SHORT_URL_ASYNC_REDIRECT else views.redirect_short_url,
+        name='redirect'
+    ),
 ]
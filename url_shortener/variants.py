@@ -0,0 +1,67 @@
+"""
+Weighted destination selection for short links.
+
+A link's destinations are compiled into a Walker/Vose alias table when
+the link is saved. Picking a destination then costs one random number,
+one multiply and one comparison regardless of how many variants the
+link has.
+"""
+import random
+
+
+def default_label(index):
+    """Variant labels default to A, B, C, ..."""
+    return chr(ord('A') + index)
+
+
+def build_alias_table(weights):
+    """
+    Build an alias table for positive weights.
+    Returns (prob, alias) lists of the same length as ``weights``.
+    """
+    n = len(weights)
+    total = float(sum(weights))
+    scaled = [weight * n / total for weight in weights]
+    prob = [1.0] * n
+    alias = list(range(n))
+
+    small = [i for i, p in enumerate(scaled) if p < 1.0]
+    large = [i for i, p in enumerate(scaled) if p >= 1.0]
+    while small and large:
+        less = small.pop()
+        more = large.pop()
+        prob[less] = scaled[less]
+        alias[less] = more
+        scaled[more] = (scaled[more] + scaled[less]) - 1.0
+        (small if scaled[more] < 1.0 else large).append(more)
+    # Whatever is left is 1.0 up to rounding error
+    for i in small + large:
+        prob[i] = 1.0
+
+    return prob, alias
+
+
+def compile_destinations(destinations):
+    """
+    Compile a link's destinations into the table stored on the link.
+    ``destinations`` is a list of {"url", "weight", "label"} dicts; an
+    empty list compiles to an empty table.
+    """
+    if not destinations:
+        return {}
+    prob, alias = build_alias_table([d['weight'] for d in destinations])
+    return {
+        'urls': [d['url'] for d in destinations],
+        'labels': [d.get('label') or default_label(i) for i, d in enumerate(destinations)],
+        'prob': prob,
+        'alias': alias,
+    }
+
+
+def pick_destination(table, rand=random.random):
+    """Pick a (url, label) from a compiled table in constant time"""
+    r = rand() * len(table['urls'])
+    i = int(r)
+    if r - i >= table['prob'][i]:
+        i = table['alias'][i]
+    return table['urls'][i], table['labels'][i]
@@ -2,24 +2,62 @@
 Views for URL Shortener API.
 Handles creating, redirecting, and managing short URLs.
 """
-from django.shortcuts import get_object_or_404, redirect
-from django.http import HttpResponse
-from django.db.models import Count, Q
+import re
+
+from asgiref.sync import sync_to_async
+from django.shortcuts import get_object_or_404
+from django.http import (
+    Http404,
+    HttpResponseGone,
+    HttpResponseNotAllowed,
+    HttpResponseNotFound,
+    HttpResponseRedirect,
+    StreamingHttpResponse,
+)
+from django.db.models import Sum
 from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.http import content_disposition_header
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from datetime import timedelta
+from webhooks.accounts import HasAccount
+from webhooks.search import trigram_search
+from datetime import datetime, time, timedelta, timezone as dt_timezone
 
-from .models import ShortURL, ClickAnalytics
+from .analytics import emit_bot_click, emit_click
+from .bots import is_bot
+from .cache import get_link, aget_link, is_entry_expired
+from .export import EXPORT_FORMATS, stream_clicks
+from .geoip import lookup_country
+from .ratelimit import allow_click
+from .variants import pick_destination
+from .models import (
+    ShortURL,
+    ClickAnalytics,
+    ClickHourlyRollup,
+    ClickDailyRollup,
+    UniqueVisitorSketch,
+)
 from .serializers import (
     ShortURLCreateSerializer,
     ShortURLResponseSerializer,
     ShortURLStatsSerializer,
+    BulkShortURLSerializer,
+    validate_geo_targets,
+    validate_destinations,
 )
 
 
+# Hourly stats return one entry per hour, so keep the range bounded
+MAX_HOURLY_STATS_RANGE = timedelta(days=31)
+
+# Characters replaced in export filenames
+UNSAFE_FILENAME_RE = re.compile(r'[^A-Za-z0-9._-]')
+
+
 def get_client_ip(request):
     """Extract client IP from request headers"""
     x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
@@ -30,20 +68,6 @@ def get_client_ip(request):
     return ip
 
 
-def get_client_country(ip_address):
-    """
-    Get country from IP address using GeoIP2 (optional).
-    Returns empty string if GeoIP2 not configured.
-    """
-    try:
-        from django.contrib.gis.geoip2 import GeoIP2
-        g = GeoIP2()
-        country = g.country_code(ip_address)
-        return country or ''
-    except:
-        return ''
-
-
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def create_short_url(request):
@@ -69,15 +93,9 @@ def create_short_url(request):
         "created_at": "2024-01-15T10:30:00Z"
     }
     """
-    # Get account - try from user's token or use first account for now
+    # The account the user acts for (see webhooks.accounts)
     try:
-        from webhooks.models import Account
-        # For now, get the account by email matching the user's email
-        # Or just use the first account if there's only one
-        account = Account.objects.filter(email=request.user.email).first()
-        if not account:
-            # Fallback: use any account (for testing)
-            account = Account.objects.first()
+        account = request.account
         
         if not account:
             return Response(
@@ -106,70 +124,230 @@ def create_short_url(request):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-@api_view(['GET'])
-@permission_classes([AllowAny])  # Public endpoint - no authentication required
-def redirect_short_url(request, short_code):
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def bulk_create_short_urls(request):
     """
-    Redirect from short URL to original URL.
-    Logs analytics data.
+    Create many short URLs in one call.
     
-    GET /{short_code}/
+    POST /api/shorten/bulk/
+    Body: {
+        "urls": ["https://checkout.stripe.com/pay/cs_test_...", ...],  // Up to 5000
+        "domain": "pay.onsync-test.xyz",  // Optional, same rules as /api/shorten/
+        "title": "Payment Link",  // Optional, applied to every URL
+        "expires_at": "2024-12-31T23:59:59Z"  // Optional, applied to every URL
+    }
     
-    This is a PUBLIC endpoint (no authentication required).
-    Domain is extracted from request.get_host().
+    Returns: {
+        "status": "success",  // "partial" if some URLs failed
+        "created": 2,
+        "failed": 1,
+        "results": [  // Same order as the input
+            {"index": 0, "status": "success", "data": { ... }},
+            {"index": 1, "status": "error", "original_url": "not-a-url", "errors": [ ... ]},
+            ...
+        ]
+    }
     """
-    # Get domain from request
-    domain = request.get_host()
+    try:
+        account = request.account
+        
+        if not account:
+            return Response(
+                {'error': 'No account found. Please contact support.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+    except Exception as e:
+        return Response(
+            {'error': f'Error finding account: {str(e)}'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
     
-    # Find the short URL
-    short_url = get_object_or_404(
-        ShortURL,
-        short_code=short_code,
-        domain=domain,
-        is_active=True
+    serializer = BulkShortURLSerializer(
+        data=request.data,
+        context={'account': account, 'request': request}
     )
     
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    results = []
+    created = 0
+    for index, result in enumerate(serializer.save()):
+        if 'short_url' in result:
+            created += 1
+            results.append({
+                'index': index,
+                'status': 'success',
+                'data': ShortURLResponseSerializer(result['short_url']).data,
+            })
+        else:
+            results.append({
+                'index': index,
+                'status': 'error',
+                'original_url': result['original_url'],
+                'errors': result['errors'],
+            })
+    
+    failed = len(results) - created
+    return Response({
+        'status': 'success' if not failed else 'partial',
+        'created': created,
+        'failed': failed,
+        'results': results,
+    }, status=status.HTTP_201_CREATED if created else status.HTTP_400_BAD_REQUEST)
+
+
+LINK_GONE_HTML = '<h1>Link Expired</h1><p>This link has expired and is no longer valid.</p>'
+LINK_NOT_FOUND_HTML = '<h1>Link Not Found</h1><p>This link does not exist.</p>'
+
+
+def resolve_destination(entry, ip_address):
+    """
+    Pick the destination for a resolved link.
+    
+    A geo target for the visitor's country wins, then a weighted variant,
+    then the original URL. Returns (url, country, variant): the country
+    only if it had to be looked up (geo-targeted links), the variant label
+    only if one was picked.
+    """
+    country = None
+    geo = entry.get('geo')
+    if geo:
+        country = lookup_country(ip_address)
+        if geo.get(country):
+            return geo[country], country, ''
+    
+    variants = entry.get('variants')
+    if variants:
+        url, variant = pick_destination(variants)
+        return url, country, variant
+    
+    return entry['original_url'], country, ''
+
+
+def _redirect_response(entry, ip_address):
+    """
+    Build the response for a resolved link.
+    Returns the response and the click to record (None if not tracked).
+    """
+    if entry is None:
+        return HttpResponseNotFound(LINK_NOT_FOUND_HTML), None
+    
     # Check if expired
-    if short_url.is_expired():
-        return HttpResponse(
-            '<h1>Link Expired</h1><p>This link has expired and is no longer valid.</p>',
-            status=410
-        )
+    if is_entry_expired(entry):
+        return HttpResponseGone(LINK_GONE_HTML), None
+    
+    destination, country, variant = resolve_destination(entry, ip_address)
+    return HttpResponseRedirect(destination), {
+        'short_url_id': entry['id'],
+        'ip_address': ip_address,
+        'country': country,
+        'variant': variant,
+    }
+
+
+def _click_event(request, click):
+    """Request metadata recorded for a click"""
+    return {
+        **click,
+        'user_agent': request.META.get('HTTP_USER_AGENT', ''),
+        'referer': request.META.get('HTTP_REFERER', ''),
+    }
+
+
+def _record_click(request, short_code, click):
+    """
+    Emit the click unless the client or the link is over its rate limit.
+    Bots only bump the link's bot counter, and only within the same
+    limits, so a crawler user agent is no way around them.
+    """
+    if not allow_click(click['ip_address'], request.get_host(), short_code):
+        return
+    if is_bot(request.META.get('HTTP_USER_AGENT', '')):
+        emit_bot_click(click['short_url_id'])
+        return
+    emit_click(**_click_event(request, click))
+
+
+def redirect_short_url(request, short_code):
+    """
+    Redirect from short URL to original URL.
+    Logs analytics data.
     
-    # Increment clicks (atomic operation)
-    short_url.increment_clicks()
-    
-    # Log analytics
-    ip_address = get_client_ip(request)
-    user_agent = request.META.get('HTTP_USER_AGENT', '')
-    referer = request.META.get('HTTP_REFERER', '')
-    country = get_client_country(ip_address)
-    
-    ClickAnalytics.objects.create(
-        short_url=short_url,
-        ip_address=ip_address,
-        user_agent=user_agent,
-        referer=referer,
-        country=country,
-    )
+    GET /{short_code}/
     
-    # Redirect to original URL
-    return redirect(short_url.original_url)
+    This is a PUBLIC endpoint (no authentication required).
+    Domain is extracted from request.get_host().
+    
+    Deliberately a plain Django view rather than a DRF one: the hot path
+    is a cached lookup, the expiry check, destination selection (in-memory
+    country lookup, precompiled variant table), a memoised bot check, one
+    rate limit round trip and click emission, nothing else. Bots and
+    rate-limited clients are still redirected; only their clicks go
+    unrecorded (bots within the limits are counted in bot_clicks).
+    """
+    if request.method not in ('GET', 'HEAD'):
+        return HttpResponseNotAllowed(['GET', 'HEAD'])
+    
+    entry = get_link(request.get_host(), short_code)
+    response, click = _redirect_response(entry, get_client_ip(request))
+    if click:
+        _record_click(request, short_code, click)
+    return response
+
+
+async def aredirect_short_url(request, short_code):
+    """
+    Async version of redirect_short_url for ASGI deployments (config.asgi).
+    Enabled with SHORT_URL_ASYNC_REDIRECT.
+    """
+    if request.method not in ('GET', 'HEAD'):
+        return HttpResponseNotAllowed(['GET', 'HEAD'])
+    
+    entry = await aget_link(request.get_host(), short_code)
+    response, click = _redirect_response(entry, get_client_ip(request))
+    if click:
+        await sync_to_async(_record_click)(request, short_code, click)
+    return response
+
+
+def parse_stats_bound(value):
+    """Parse a stats range bound given as an ISO date or datetime"""
+    parsed = parse_datetime(value)
+    if parsed is None:
+        parsed_date = parse_date(value)
+        if parsed_date is None:
+            raise ValueError(value)
+        parsed = datetime.combine(parsed_date, time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, dt_timezone.utc)
+    return parsed
 
 
 @api_view(['GET'])
-@permission_classes([IsAuthenticated])
+@permission_classes([IsAuthenticated, HasAccount])
 def get_short_url_stats(request, short_code):
     """
     Get statistics for a short URL.
     
     GET /api/stats/{short_code}/
+    Query params:
+    - start: Range start, ISO date or datetime (default 30 days ago)
+    - end: Range end, ISO date or datetime (default now)
+    - granularity: 'day' (default) or 'hour' (ranges up to 31 days)
+    
+    Breakdowns are read from the click rollup tables, so the cost does
+    not grow with the number of clicks.
     
     Returns: {
         "short_url": { ... },
         "total_clicks": 150,
+        "bot_clicks": 40,  // Bots and link previews, not in total_clicks
+        "unique_visitors": 97,  // HyperLogLog estimate over the days in range
         "recent_clicks": [ ... ],  // Last 100 clicks
-        "clicks_by_day": {
+        "range": {"start": "...", "end": "...", "granularity": "day"},
+        "clicks_by_day": {  // "clicks_by_hour" for hour granularity
             "2024-01-15": 45,
             "2024-01-16": 62,
             ...
@@ -178,6 +356,14 @@ def get_short_url_stats(request, short_code):
             "US": 89,
             "CA": 31,
             "UK": 30
+        },
+        "clicks_by_referrer": {
+            "t.co": 12,
+            ...
+        },
+        "clicks_by_variant": {  // Weighted links only
+            "A": 71,
+            "B": 79
         }
     }
     """
@@ -185,58 +371,208 @@ def get_short_url_stats(request, short_code):
     short_url = get_object_or_404(
         ShortURL,
         short_code=short_code,
-        account=request.user
+        account=request.account
     )
     
-    # Get analytics data
-    analytics = ClickAnalytics.objects.filter(short_url=short_url)
+    # Resolve the requested range
+    granularity = request.GET.get('granularity', 'day')
+    if granularity not in ('day', 'hour'):
+        return Response(
+            {'error': "granularity must be 'day' or 'hour'"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    try:
+        end = parse_stats_bound(request.GET['end']) if request.GET.get('end') else timezone.now()
+        start = (
+            parse_stats_bound(request.GET['start']) if request.GET.get('start')
+            else end - timedelta(days=30)
+        )
+    except ValueError as e:
+        return Response(
+            {'error': f'Invalid date: {e}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    if start > end:
+        return Response(
+            {'error': 'start must be before end'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    if granularity == 'hour' and end - start > MAX_HOURLY_STATS_RANGE:
+        return Response(
+            {'error': f'Hourly stats are limited to {MAX_HOURLY_STATS_RANGE.days} days'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
     
     # Total clicks
     total_clicks = short_url.clicks
     
-    # Recent clicks (last 100)
-    recent_clicks = analytics.order_by('-clicked_at')[:100]
+    # Unique visitors, merged from the daily sketches
+    unique_visitors = UniqueVisitorSketch.estimate(
+        short_url,
+        start.astimezone(dt_timezone.utc).date(),
+        end.astimezone(dt_timezone.utc).date(),
+    )
     
-    # Clicks by day (last 30 days)
-    thirty_days_ago = timezone.now() - timedelta(days=30)
-    clicks_by_day = {}
-    daily_clicks = analytics.filter(clicked_at__gte=thirty_days_ago).extra(
-        select={'day': 'DATE(clicked_at)'}
-    ).values('day').annotate(count=Count('id')).order_by('day')
+    # Recent clicks (last 100)
+    recent_clicks = ClickAnalytics.objects.filter(short_url=short_url).order_by('-clicked_at')[:100]
+    
+    # Time series from the rollups
+    if granularity == 'hour':
+        rollups = ClickHourlyRollup.objects.filter(
+            short_url=short_url,
+            hour__gte=start.replace(minute=0, second=0, microsecond=0),
+            hour__lte=end,
+        )
+        bucket = 'hour'
+    else:
+        rollups = ClickDailyRollup.objects.filter(
+            short_url=short_url,
+            day__gte=start.astimezone(dt_timezone.utc).date(),
+            day__lte=end.astimezone(dt_timezone.utc).date(),
+        )
+        bucket = 'day'
     
-    for item in daily_clicks:
-        clicks_by_day[str(item['day'])] = item['count']
+    clicks_by_bucket = {}
+    for item in rollups.values(bucket).annotate(count=Sum('clicks')).order_by(bucket):
+        key = item[bucket].isoformat() if bucket == 'hour' else str(item[bucket])
+        clicks_by_bucket[key] = item['count']
     
     # Clicks by country
     clicks_by_country = {}
-    country_clicks = analytics.exclude(country='').values('country').annotate(
-        count=Count('id')
+    country_clicks = rollups.exclude(country='').values('country').annotate(
+        count=Sum('clicks')
     ).order_by('-count')
     
     for item in country_clicks:
         clicks_by_country[item['country']] = item['count']
     
+    # Clicks by referrer host
+    clicks_by_referrer = {}
+    referrer_clicks = rollups.exclude(referrer_host='').values('referrer_host').annotate(
+        count=Sum('clicks')
+    ).order_by('-count')
+    
+    for item in referrer_clicks:
+        clicks_by_referrer[item['referrer_host']] = item['count']
+    
+    # Clicks by destination variant
+    clicks_by_variant = {}
+    variant_clicks = rollups.exclude(variant='').values('variant').annotate(
+        count=Sum('clicks')
+    ).order_by('variant')
+    
+    for item in variant_clicks:
+        clicks_by_variant[item['variant']] = item['count']
+    
     # Build response
     data = {
         'short_url': ShortURLResponseSerializer(short_url).data,
         'total_clicks': total_clicks,
+        'bot_clicks': short_url.bot_clicks,
+        'unique_visitors': unique_visitors,
         'recent_clicks': [
             {
                 'clicked_at': click.clicked_at,
                 'country': click.country,
                 'referer': click.referer,
+                'variant': click.variant,
             }
             for click in recent_clicks
         ],
-        'clicks_by_day': clicks_by_day,
+        'range': {
+            'start': start,
+            'end': end,
+            'granularity': granularity,
+        },
+        f'clicks_by_{granularity}': clicks_by_bucket,
         'clicks_by_country': clicks_by_country,
+        'clicks_by_referrer': clicks_by_referrer,
+        'clicks_by_variant': clicks_by_variant,
     }
     
     return Response(data)
 
 
 @api_view(['GET'])
-@permission_classes([IsAuthenticated])
+@permission_classes([IsAuthenticated, HasAccount])
+def export_clicks(request):
+    """
+    Stream raw click analytics for one short URL or the whole account.
+    
+    GET /api/clicks/export/
+    Query params:
+    - short_code: Limit the export to one short code (default: all links)
+    - domain: Limit the export to links on one domain
+    - start: Range start, ISO date or datetime (default 30 days ago)
+    - end: Range end, ISO date or datetime (default now)
+    - output: 'ndjson' (default) or 'csv'
+    - gzip: 'true' to gzip the response body
+    
+    Rows are streamed from a server-side cursor, oldest first, so large
+    exports do not build up in memory.
+    """
+    account = request.account
+    
+    export_format = request.GET.get('output', 'ndjson')
+    if export_format not in EXPORT_FORMATS:
+        return Response(
+            {'error': f"output must be one of: {', '.join(EXPORT_FORMATS)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    try:
+        end = parse_stats_bound(request.GET['end']) if request.GET.get('end') else timezone.now()
+        start = (
+            parse_stats_bound(request.GET['start']) if request.GET.get('start')
+            else end - timedelta(days=30)
+        )
+    except ValueError as e:
+        return Response(
+            {'error': f'Invalid date: {e}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    if start > end:
+        return Response(
+            {'error': 'start must be before end'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    queryset = ClickAnalytics.objects.filter(clicked_at__gte=start, clicked_at__lte=end)
+    
+    # The same code can exist on several domains
+    links = ShortURL.objects.filter(account=account)
+    short_code = request.GET.get('short_code')
+    domain = request.GET.get('domain')
+    if domain:
+        links = links.filter(domain=domain)
+    if short_code:
+        links = links.filter(short_code=short_code)
+        if not links.exists():
+            raise Http404
+    queryset = queryset.filter(short_url__in=links.values('pk'))
+    name = f'clicks-{short_code}' if short_code else 'clicks'
+    
+    compress = request.GET.get('gzip', '').lower() == 'true'
+    # Codes created before they were restricted may hold any character
+    filename = UNSAFE_FILENAME_RE.sub('_', f'{name}-{start:%Y%m%d}-{end:%Y%m%d}.{export_format}')
+    
+    response = StreamingHttpResponse(
+        stream_clicks(queryset, export_format, compress=compress),
+        content_type=EXPORT_FORMATS[export_format],
+    )
+    if compress:
+        response['Content-Encoding'] = 'gzip'
+    response['Content-Disposition'] = content_disposition_header(True, filename)
+    response['Cache-Control'] = 'no-store'
+    return response
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, HasAccount])
 def list_short_urls(request):
     """
     List all short URLs for the authenticated account.
@@ -245,8 +581,9 @@ def list_short_urls(request):
     Query params:
     - limit: Number of results (default 50)
     - offset: Pagination offset (default 0)
-    - search: Search in title or original_url
+    - search: Search in title or original_url (best matches first)
     - is_active: Filter by active status (true/false)
+    - health: Filter by destination health (ok/broken/unknown)
     
     Returns: {
         "count": 150,
@@ -258,18 +595,21 @@ def list_short_urls(request):
     offset = int(request.GET.get('offset', 0))
     search = request.GET.get('search', '')
     is_active = request.GET.get('is_active', '')
+    health = request.GET.get('health', '')
     
     # Build query
-    queryset = ShortURL.objects.filter(account=request.user)
+    queryset = ShortURL.objects.filter(account=request.account)
     
     if search:
-        queryset = queryset.filter(
-            Q(title__icontains=search) | Q(original_url__icontains=search)
-        )
+        # Trigram-indexed and ranked on PostgreSQL
+        queryset = trigram_search(queryset, ['title', 'original_url'], search)
     
     if is_active:
         queryset = queryset.filter(is_active=(is_active.lower() == 'true'))
     
+    if health:
+        queryset = queryset.filter(health_status=health)
+    
     # Get total count
     total_count = queryset.count()
     
@@ -286,7 +626,7 @@ def list_short_urls(request):
 
 
 @api_view(['DELETE'])
-@permission_classes([IsAuthenticated])
+@permission_classes([IsAuthenticated, HasAccount])
 def delete_short_url(request, short_code):
     """
     Delete (deactivate) a short URL.
@@ -298,7 +638,7 @@ def delete_short_url(request, short_code):
     short_url = get_object_or_404(
         ShortURL,
         short_code=short_code,
-        account=request.user
+        account=request.account
     )
     
     # Soft delete - just deactivate
@@ -309,7 +649,7 @@ def delete_short_url(request, short_code):
 
 
 @api_view(['PATCH'])
-@permission_classes([IsAuthenticated])
+@permission_classes([IsAuthenticated, HasAccount])
 def update_short_url(request, short_code):
     """
     Update a short URL.
@@ -318,13 +658,15 @@ def update_short_url(request, short_code):
     Body: {
         "title": "New Title",
         "is_active": false,
-        "expires_at": "2024-12-31T23:59:59Z"
+        "expires_at": "2024-12-31T23:59:59Z",
+        "geo_targets": {"DE": "https://example.com/de"},
+        "destinations": [{"url": "https://example.com/a", "weight": 1}, ...]
     }
     """
     short_url = get_object_or_404(
         ShortURL,
         short_code=short_code,
-        account=request.user
+        account=request.account
     )
     
     # Only allow updating certain fields
@@ -333,6 +675,18 @@ def update_short_url(request, short_code):
         if field in request.data:
             setattr(short_url, field, request.data[field])
     
+    if 'geo_targets' in request.data:
+        try:
+            short_url.geo_targets = validate_geo_targets(request.data['geo_targets'])
+        except ValidationError as e:
+            return Response({'geo_targets': e.detail}, status=status.HTTP_400_BAD_REQUEST)
+    
+    if 'destinations' in request.data:
+        try:
+            short_url.destinations = validate_destinations(request.data['destinations'])
+        except ValidationError as e:
+            return Response({'destinations': e.detail}, status=status.HTTP_400_BAD_REQUEST)
+    
     short_url.save()
     
     serializer = ShortURLResponseSerializer(short_url)
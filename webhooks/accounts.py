@@ -0,0 +1,106 @@
+"""
+Resolution of the account a request acts for.
+
+A user acts for the account sharing their email address; users whose
+email matches no account act for none, and get a 403 from views that
+need one (HasAccount). Superusers can act for any account by sending its
+id in the X-Account-Id header.
+
+The user -> account map is cached in the Django cache. Entries are
+versioned: saving or deleting an Account, or changing a User, bumps the
+version, which retires every entry at once, since an email change on
+either side can move users between accounts.
+"""
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.permissions import BasePermission
+
+from .models import Account
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'account:map:version'
+
+ACCOUNT_HEADER = 'X-Account-Id'
+
+# Cached in place of None, for users without an account
+NO_ACCOUNT = 0
+
+# Credentials stay out of the cache; they load on first access
+UNCACHED_FIELDS = ('stripe_api_key', 'trz_api_key')
+
+
+def _map_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Seeded from the clock so an evicted version is not simply restarted
+        cache.add(VERSION_KEY, int(time.time()), None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def _lookup_account(user):
+    if not user.email:
+        return None
+    return Account.objects.defer(*UNCACHED_FIELDS).filter(email=user.email).first()
+
+
+def account_for_user(user):
+    """The account a user acts for, or None"""
+    if not user or not user.is_authenticated:
+        return None
+    
+    try:
+        key = f'account:user:{_map_version()}:{user.pk}'
+        account = cache.get(key)
+    except Exception as e:
+        logger.warning(f"Account cache unavailable: {str(e)}")
+        return _lookup_account(user)
+    
+    if account is None:
+        account = _lookup_account(user)
+        try:
+            cache.set(key, account or NO_ACCOUNT, settings.ACCOUNT_CACHE_TIMEOUT)
+        except Exception as e:
+            logger.warning(f"Account cache write failed: {str(e)}")
+    return account or None
+
+
+def resolve_request_account(request):
+    """
+    The account a request acts for: the superuser's selected account if
+    any, otherwise the user's own, or None.
+    """
+    user = request.user
+    selected = request.headers.get(ACCOUNT_HEADER)
+    if selected and user.is_authenticated and user.is_superuser:
+        try:
+            return Account.objects.filter(pk=int(selected)).first()
+        except ValueError:
+            return None
+    return account_for_user(user)
+
+
+class HasAccount(BasePermission):
+    """Allows requests acting for an account (request.account)"""
+    
+    message = 'No account found. Please contact support.'
+    
+    def has_permission(self, request, view):
+        return bool(request.account)
+
+
+def invalidate_account_map(sender=None, update_fields=None, **kwargs):
+    """Signal handler: retire all cached user -> account entries"""
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        # Not set yet: nothing cached under a version to retire
+        pass
+    except Exception as e:
+        logger.warning(f"Account cache invalidation failed: {str(e)}")
@@ -4,3 +4,24 @@ from django.apps import AppConfig
 class WebhooksConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'webhooks'
+
+    def ready(self):
+        from django.contrib.auth.models import User
+        from django.db.models.signals import post_delete, post_save
+        from rest_framework.authtoken.models import Token
+        from .accounts import invalidate_account_map
+        from .authentication import token_deleted, user_saved
+        from .fastjson import register_celery_serializer
+        from .models import Account
+        
+        # Drop cached token lookups on logout, token deletion and user changes
+        post_delete.connect(token_deleted, sender=Token, dispatch_uid='webhooks_token_cache_delete')
+        post_save.connect(user_saved, sender=User, dispatch_uid='webhooks_token_cache_user')
+        
+        # Retire cached user -> account entries when either side changes
+        post_save.connect(invalidate_account_map, sender=Account, dispatch_uid='webhooks_account_map_account_save')
+        post_delete.connect(invalidate_account_map, sender=Account, dispatch_uid='webhooks_account_map_account_delete')
+        post_save.connect(invalidate_account_map, sender=User, dispatch_uid='webhooks_account_map_user_save')
+        
+        # Celery messages through the fast JSON backend
+        register_celery_serializer()
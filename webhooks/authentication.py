@@ -0,0 +1,179 @@
+"""
+Token authentication with cached lookups and expiring tokens.
+
+DRF's TokenAuthentication joins Token and User on every request. Here the
+lookup is cached per token in the Django cache (shared between processes)
+and, for a few seconds, in process memory, so a polling frontend costs no
+database queries. Only non-sensitive user fields are cached.
+
+Entries are dropped on logout, token deletion and user deactivation.
+Other processes may keep serving a revoked token from memory for at most
+TOKEN_LOCAL_CACHE_TIMEOUT seconds. The Django cache is only used when it
+is shared (CACHE_URL): a local memory one couldn't be invalidated from
+other processes, so lookups then go to the database once the in-process
+copy expires.
+
+Tokens older than TOKEN_EXPIRATION_HOURS (0 disables expiry) are
+rejected; logging in again issues a new one.
+"""
+import hashlib
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from .caching import cache_is_shared
+
+logger = logging.getLogger(__name__)
+
+# User fields kept in the cache (never the password hash), in model
+# field order as Model.from_db expects for a partial row
+CACHED_USER_FIELDS = (
+    'id',
+    'is_superuser',
+    'username',
+    'first_name',
+    'last_name',
+    'email',
+    'is_staff',
+    'is_active',
+)
+
+# Entries kept in process memory before the oldest are evicted
+LOCAL_CACHE_SIZE = 1024
+
+_local_cache = {}
+
+
+def token_cache_key(key):
+    """Cache key for a token (the token itself never appears in keys)"""
+    return f'authtoken:{hashlib.sha256(key.encode()).hexdigest()}'
+
+
+def is_token_expired(created, now=None):
+    hours = settings.TOKEN_EXPIRATION_HOURS
+    if not hours:
+        return False
+    now = timezone.now() if now is None else now
+    return created + timedelta(hours=hours) <= now
+
+
+def _token_entry(token):
+    return {
+        'user': [getattr(token.user, field) for field in CACHED_USER_FIELDS],
+        'created': token.created,
+    }
+
+
+def _local_get(cache_key):
+    cached = _local_cache.get(cache_key)
+    if cached is None:
+        return None
+    expires_at, entry = cached
+    if time.monotonic() >= expires_at:
+        _local_cache.pop(cache_key, None)
+        return None
+    return entry
+
+
+def _local_set(cache_key, entry):
+    if len(_local_cache) >= LOCAL_CACHE_SIZE:
+        # Dicts keep insertion order: drop the oldest half
+        for stale in list(_local_cache)[:LOCAL_CACHE_SIZE // 2]:
+            _local_cache.pop(stale, None)
+    _local_cache[cache_key] = (time.monotonic() + settings.TOKEN_LOCAL_CACHE_TIMEOUT, entry)
+
+
+def get_token_entry(key):
+    """
+    Cached user and creation time for a token key, loading it on a miss.
+    Returns None if the token doesn't exist.
+    """
+    cache_key = token_cache_key(key)
+    entry = _local_get(cache_key)
+    if entry is not None:
+        return entry
+    
+    shared = cache_is_shared()
+    entry = None
+    if shared:
+        try:
+            entry = cache.get(cache_key)
+        except Exception as e:
+            logger.warning(f"Token cache unavailable: {str(e)}")
+    
+    if entry is None:
+        try:
+            token = Token.objects.select_related('user').get(key=key)
+        except Token.DoesNotExist:
+            return None
+        entry = _token_entry(token)
+        if shared:
+            try:
+                cache.set(cache_key, entry, settings.TOKEN_CACHE_TIMEOUT)
+            except Exception as e:
+                logger.warning(f"Token cache write failed: {str(e)}")
+    
+    _local_set(cache_key, entry)
+    return entry
+
+
+def invalidate_tokens(keys):
+    """Drop cached lookups for token keys"""
+    cache_keys = [token_cache_key(key) for key in keys]
+    if not cache_keys:
+        return
+    for cache_key in cache_keys:
+        _local_cache.pop(cache_key, None)
+    try:
+        cache.delete_many(cache_keys)
+    except Exception as e:
+        logger.warning(f"Token cache invalidation failed: {str(e)}")
+
+
+def clear_local_token_cache():
+    _local_cache.clear()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication with cached lookups and token expiry.
+    
+    request.user is rebuilt from cached fields without a query; other
+    User fields load on first access.
+    """
+    
+    def authenticate_credentials(self, key):
+        entry = get_token_entry(key)
+        if entry is None:
+            raise exceptions.AuthenticationFailed('Invalid token.')
+        
+        user = User.from_db('default', CACHED_USER_FIELDS, entry['user'])
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed('User inactive or deleted.')
+        
+        if is_token_expired(entry['created']):
+            raise exceptions.AuthenticationFailed('Token has expired.')
+        
+        token = Token.from_db('default', ('key', 'user_id', 'created'), (key, user.pk, entry['created']))
+        token.user = user
+        return (user, token)
+
+
+def token_deleted(sender, instance, **kwargs):
+    """post_delete handler for Token (logout, rotation, admin deletes)"""
+    invalidate_tokens([instance.key])
+
+
+def user_saved(sender, instance, update_fields=None, **kwargs):
+    """post_save handler for User: drop cached lookups on any change that could matter"""
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    invalidate_tokens(Token.objects.filter(user_id=instance.pk).values_list('key', flat=True))
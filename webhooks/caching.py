@@ -0,0 +1,20 @@
+"""
+Checks on the Django cache backend.
+
+CACHES defaults to local memory, which each web and Celery worker process
+keeps to itself. Features that count in the cache, or that invalidate
+cached entries when data changes, only work across processes with a
+shared backend such as Redis (set CACHE_URL).
+"""
+from django.conf import settings
+
+# Backends whose entries live in a single process, or nowhere
+LOCAL_BACKENDS = frozenset((
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+))
+
+
+def cache_is_shared(alias='default'):
+    """Whether every process sees the same entries in the cache"""
+    return settings.CACHES[alias]['BACKEND'] not in LOCAL_BACKENDS
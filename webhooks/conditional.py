@@ -0,0 +1,143 @@
+"""
+Conditional GET for the endpoints the frontend polls.
+
+Each response gets a weak ETag derived from cheap validators: row counts
+and the latest updated_at of the rows it is built from, computed with
+aggregate queries in the database, without loading or serializing rows.
+A request whose If-None-Match matches is answered 304 Not Modified.
+
+Responses are sent with Cache-Control: private, no-cache, so browsers
+keep them and revalidate on every poll. Last-Modified is informational
+only: a deletion can't move it forward, so If-Modified-Since alone is
+never answered with 304.
+"""
+import hashlib
+from datetime import datetime
+
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Max
+from django.utils.cache import patch_cache_control
+from django.utils.http import http_date, parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+from .accounts import ACCOUNT_HEADER
+
+
+def aggregate_validator(queryset, **aggregates):
+    """Row count and latest updated_at of a queryset, plus any extra aggregates"""
+    return queryset.order_by().aggregate(
+        count=Count('pk'),
+        latest=Max('updated_at'),
+        **aggregates
+    )
+
+
+def make_etag(request, validators):
+    """
+    Weak ETag for a response to request built from validators.
+    The user, selected account, URL and rendered format are part of it,
+    so one user's tag never matches another's response.
+    """
+    renderer = getattr(request, 'accepted_renderer', None)
+    scope = (
+        request.user.pk,
+        request.headers.get(ACCOUNT_HEADER),
+        request.get_full_path(),
+        renderer.format if renderer else None,
+    )
+    digest = hashlib.sha256(repr((scope, validators)).encode('utf-8')).hexdigest()
+    return 'W/' + quote_etag(digest[:32])
+
+
+def etag_matches(request, etag):
+    """Weak comparison of etag with the request's If-None-Match"""
+    header = request.headers.get('If-None-Match')
+    if not header:
+        return False
+    
+    def opaque(tag):
+        return tag[2:] if tag.startswith('W/') else tag
+    
+    return opaque(etag) in {opaque(tag) for tag in parse_etags(header)}
+
+
+def last_modified(validators):
+    """Latest timestamp among the validators' values, or None"""
+    timestamps = [
+        value
+        for validator in validators
+        for value in validator.values()
+        if isinstance(value, datetime)
+    ]
+    return max(timestamps) if timestamps else None
+
+
+def conditional_response(request, validators, respond):
+    """
+    304 if the request's If-None-Match matches the validators' ETag,
+    otherwise respond(). Successful responses carry the validators.
+    """
+    etag = make_etag(request, validators)
+    if etag_matches(request, etag):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        response = respond()
+    
+    if response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+        response['ETag'] = etag
+        modified = last_modified(validators)
+        if modified:
+            response['Last-Modified'] = http_date(modified.timestamp())
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+class ConditionalGetMixin:
+    """
+    ViewSet mixin answering conditional GETs on list and retrieve.
+    
+    get_validators(queryset) returns a list of aggregate dicts for the
+    rows a response over queryset depends on. Retrieve uses the list
+    queryset narrowed to the requested object, so a 304 costs no object
+    lookup.
+    """
+    
+    def get_validators(self, queryset):
+        """
+        Validators for a response over queryset. By default the rows'
+        count and latest updated_at, which fits serializers that only read
+        the model's own columns; views showing related rows override this.
+        """
+        return [aggregate_validator(queryset)]
+    
+    def get_object_queryset(self):
+        """
+        The filtered queryset narrowed to the object in the URL, or None
+        for a malformed lookup (which get_object answers with 404).
+        """
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        queryset = self.filter_queryset(self.get_queryset())
+        try:
+            return queryset.filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        except (TypeError, ValueError, ValidationError):
+            return None
+    
+    def list(self, request, *args, **kwargs):
+        validators = self.get_validators(self.filter_queryset(self.get_queryset()))
+        return conditional_response(
+            request,
+            validators,
+            lambda: super(ConditionalGetMixin, self).list(request, *args, **kwargs)
+        )
+    
+    def retrieve(self, request, *args, **kwargs):
+        queryset = self.get_object_queryset()
+        if queryset is None:
+            return super().retrieve(request, *args, **kwargs)
+        validators = self.get_validators(queryset)
+        return conditional_response(
+            request,
+            validators,
+            lambda: super(ConditionalGetMixin, self).retrieve(request, *args, **kwargs)
+        )
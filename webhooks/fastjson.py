@@ -0,0 +1,169 @@
+"""
+Fast JSON encoding and decoding.
+
+Uses orjson when it is installed (and JSON_BACKEND isn't 'json'),
+otherwise the standard library. dumps() produces exactly the bytes of
+json.dumps(obj, separators=(',', ':'), ensure_ascii=False): orjson
+writes the same compact UTF-8 JSON except for floats with exponents
+(1e16 rather than 1e+16), so output containing one, and anything orjson
+can't encode (integers beyond 64 bits, non-string keys), is re-encoded
+with the standard library. So is data containing NaN or Infinity,
+which orjson would write as null: the standard library writes them as
+literals or, with allow_nan=False, raises ValueError.
+
+loads() goes to the standard library for documents with integers of 19
+or more digits, which orjson would turn into floats.
+
+Also registers a Celery (kombu) 'json' serializer backed by orjson. Its
+messages are plain JSON under the same content type, so workers on
+either serializer read each other's messages; UUIDs are sent as strings
+rather than kombu's typed envelope.
+"""
+import json
+import math
+import re
+from decimal import Decimal
+
+from django.conf import settings
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+# An exponent as orjson writes it (1e16, 1e-7). Starting the pattern
+# with the literal 'e' lets the regex engine skip ahead quickly.
+EXPONENT_RE = re.compile(rb'e(?<=[0-9]e)-?[0-9]')
+
+# Digit runs of this length may be integers beyond 64 bits
+BIG_INT_DIGITS = b'0' * 19
+
+# Maps digits to '0' and everything else to ' ', for finding digit runs
+DIGIT_RUNS = bytes(0x30 if 0x30 <= i <= 0x39 else 0x20 for i in range(256))
+
+# Scalar types that can't hold NaN or Infinity
+FINITE_TYPES = frozenset((str, int, bool, type(None)))
+
+# Types handed to the default function rather than encoded natively, so
+# they are formatted as the standard library encoders would
+if orjson is not None:
+    ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+
+
+def use_orjson():
+    """Whether the fast backend is available and enabled"""
+    return orjson is not None and getattr(settings, 'JSON_BACKEND', 'auto') != 'json'
+
+
+def _stdlib_dumps(obj, default=None, allow_nan=True):
+    return json.dumps(
+        obj,
+        default=default,
+        ensure_ascii=False,
+        allow_nan=allow_nan,
+        separators=(',', ':'),
+    ).encode('utf-8')
+
+
+def has_non_finite(obj):
+    """Whether obj holds a NaN or infinite float or Decimal, in any container"""
+    if type(obj) is float:
+        return not math.isfinite(obj)
+    if isinstance(obj, dict):
+        obj = obj.values()
+    elif not isinstance(obj, (list, tuple)):
+        return isinstance(obj, Decimal) and not obj.is_finite()
+    # Strings, integers and None make up most of the data; skip them
+    # without a call
+    return any(
+        has_non_finite(value)
+        for value in obj
+        if type(value) not in FINITE_TYPES
+    )
+
+
+def _checked_default(default):
+    """default, refusing results orjson would turn into null"""
+    def convert(value):
+        result = default(value)
+        if has_non_finite(result):
+            raise ValueError('Out of range float values are not JSON compliant')
+        return result
+    return convert
+
+
+def dumps(obj, default=None, allow_nan=True):
+    """
+    Compact UTF-8 JSON bytes for obj, byte-identical to the standard
+    library's. default converts objects JSON can't represent.
+    """
+    if use_orjson():
+        try:
+            data = orjson.dumps(
+                obj,
+                default=_checked_default(default) if default else None,
+                option=ORJSON_OPTIONS
+            )
+        except (orjson.JSONEncodeError, TypeError):
+            pass
+        else:
+            # NaN and Infinity come out as null, so only output with a
+            # null needs looking through
+            if not EXPONENT_RE.search(data) and not (b'null' in data and has_non_finite(obj)):
+                return data
+    return _stdlib_dumps(obj, default=default, allow_nan=allow_nan)
+
+
+def loads(data, parse_constant=None):
+    """
+    Decode UTF-8 JSON bytes or text. parse_constant is called for NaN and
+    Infinity, as with json.loads; orjson rejects them, so documents that
+    contain them (or that orjson can't decode, or long digit runs that
+    may be big integers) go to the standard library.
+    """
+    if use_orjson():
+        raw = data.encode('utf-8', 'surrogatepass') if isinstance(data, str) else bytes(data)
+        if BIG_INT_DIGITS not in raw.translate(DIGIT_RUNS):
+            try:
+                return orjson.loads(data)
+            except orjson.JSONDecodeError:
+                pass
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        data = bytes(data).decode('utf-8')
+    return json.loads(data, parse_constant=parse_constant)
+
+
+def register_celery_serializer():
+    """
+    Replace kombu's 'json' serializer with one backed by orjson, when
+    the fast backend is enabled.
+    """
+    if not use_orjson():
+        return
+    from kombu.serialization import register
+    from kombu.utils import json as kombu_json
+    
+    encoder = kombu_json.JSONEncoder()
+    
+    def encode(obj):
+        try:
+            data = orjson.dumps(obj, default=encoder.default, option=ORJSON_OPTIONS)
+        except (orjson.JSONEncodeError, TypeError):
+            return kombu_json.dumps(obj)
+        if b'null' in data and has_non_finite(obj):
+            return kombu_json.dumps(obj)
+        return data.decode('utf-8')
+    
+    def decode(data):
+        if isinstance(data, memoryview):
+            data = data.tobytes()
+        # kombu's typed envelopes ({"__type__": ...}) need its object hook
+        marker = b'"__type__"' if isinstance(data, (bytes, bytearray)) else '"__type__"'
+        if marker not in data:
+            try:
+                return orjson.loads(data)
+            except orjson.JSONDecodeError:
+                pass
+        return kombu_json.loads(data)
+    
+    register('json', encode, decode, content_type='application/json', content_encoding='utf-8')
@@ -0,0 +1,86 @@
+"""
+Sparse fieldsets for the webhook APIs.
+
+GET requests can name the fields they need, e.g. ?fields=id,name for the
+move-to-folder picker. Serializers drop the other fields, and querysets
+load only the columns, joins and prefetches the remaining fields read, so
+headers, payloads and response bodies are never pulled from the database
+unless asked for. Unknown names are ignored.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+
+FIELDS_PARAM = 'fields'
+
+
+def requested_fields(request):
+    """Field names listed in a GET request's ?fields=, or None for all fields"""
+    if request is None or request.method != 'GET':
+        return None
+    value = request.query_params.get(FIELDS_PARAM)
+    if not value:
+        return None
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+def _prefetch_lookup(prefetch):
+    return prefetch.prefetch_to if isinstance(prefetch, Prefetch) else prefetch
+
+
+def project_queryset(queryset, serializer_class, fields, columns=None, prefetches=None):
+    """
+    Narrow queryset to what fields of serializer_class read.
+    
+    Model fields (and 'relation.field' sources) map to their columns and
+    joins. columns names the columns of fields backed by properties;
+    prefetches names the prefetch each field needs. Prefetches already
+    on queryset are dropped.
+    """
+    columns = columns or {}
+    prefetches = prefetches or {}
+    model = queryset.model
+    serializer_fields = serializer_class().fields
+    
+    only = {model._meta.pk.name}
+    related = set()
+    lookups = {}
+    for name in fields:
+        if name not in serializer_fields or serializer_fields[name].write_only:
+            continue
+        only.update(columns.get(name, ()))
+        if name in prefetches:
+            prefetch = prefetches[name]
+            lookups[_prefetch_lookup(prefetch)] = prefetch
+        
+        source = serializer_fields[name].source
+        if source == '*':
+            continue
+        parts = source.split('.')
+        try:
+            field = model._meta.get_field(parts[0])
+        except FieldDoesNotExist:
+            continue
+        if not field.concrete:
+            continue
+        only.add(parts[0])
+        if len(parts) > 1 and field.is_relation:
+            related.add(parts[0])
+            only.add('__'.join(parts))
+    
+    queryset = queryset.only(*only).prefetch_related(None)
+    if related:
+        queryset = queryset.select_related(*related)
+    if lookups:
+        queryset = queryset.prefetch_related(*lookups.values())
+    return queryset
+
+
+class SparseFieldsetSerializerMixin:
+    """Serializer mixin dropping the fields a GET request's ?fields= leaves out"""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields = requested_fields(self.context.get('request'))
+        if fields is not None:
+            for name in set(self.fields) - fields:
+                self.fields.pop(name)
@@ -0,0 +1,101 @@
+"""
+Management command to benchmark JSON rendering and parsing of API payloads.
+"""
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from io import BytesIO
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from webhooks import fastjson
+from webhooks.parsers import FastJSONParser
+from webhooks.renderers import FastJSONRenderer
+
+
+def webhook_page(size):
+    """A paginated webhook list shaped like WebhookSerializer output"""
+    now = timezone.now()
+    results = []
+    for i in range(size):
+        results.append(OrderedDict([
+            ('id', i + 1),
+            ('name', f'Nightly sync #{i} – Zürich'),
+            ('url', f'https://hooks.example.com/sync/{i}?source=cronhooks'),
+            ('http_method', 'POST'),
+            ('headers', {'Authorization': 'Bearer ' + 'x' * 40, 'X-Request-Source': 'cronhooks'}),
+            ('payload', {
+                'event': 'sync',
+                'batch': list(range(20)),
+                'options': {'dry_run': False, 'ratio': 0.25, 'note': 'ünïcode ✓'},
+            }),
+            ('schedule_type', 'recurring'),
+            ('cron_expression', '0 2 * * *'),
+            ('scheduled_at', None),
+            ('timezone', 'Europe/Zurich'),
+            ('is_active', True),
+            ('max_retries', 3),
+            ('retry_delay', 60),
+            ('timeout', 30),
+            ('folder', 7),
+            ('folder_name', 'Integrations'),
+            ('folder_color', '#6366f1'),
+            ('account', 2),
+            ('account_name', 'Example Fitness'),
+            ('last_execution_at', (now - timedelta(minutes=i)).isoformat()),
+            ('execution_count', 1000 + i),
+            ('last_execution_status', 'success'),
+            ('created_at', (now - timedelta(days=i)).isoformat()),
+            ('updated_at', now.isoformat()),
+        ]))
+    return OrderedDict([('count', size), ('next', None), ('previous', None), ('results', results)])
+
+
+class Command(BaseCommand):
+    help = 'Measure JSON rendering and parsing of a webhook list with DRF and the fast JSON backend'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--items',
+            type=int,
+            default=500,
+            help='Webhooks in the rendered page (default: 500)',
+        )
+        parser.add_argument(
+            '--rounds',
+            type=int,
+            default=200,
+            help='Renders and parses per variant (default: 200)',
+        )
+
+    def handle(self, *args, **options):
+        rounds = options['rounds']
+        data = webhook_page(options['items'])
+        
+        if not fastjson.use_orjson():
+            self.stdout.write(self.style.WARNING(
+                'orjson is not installed or JSON_BACKEND is "json": both variants use the standard library'
+            ))
+        
+        body = JSONRenderer().render(data)
+        if FastJSONRenderer().render(data) != body:
+            self.stdout.write(self.style.ERROR('Fast renderer output differs from JSONRenderer'))
+            return
+        
+        def run(fn):
+            fn()  # warm up
+            start = time.perf_counter()
+            for _ in range(rounds):
+                fn()
+            return rounds / (time.perf_counter() - start)
+        
+        renders = [run(lambda r=r: r.render(data)) for r in (JSONRenderer(), FastJSONRenderer())]
+        parses = [run(lambda p=p: p.parse(BytesIO(body))) for p in (JSONParser(), FastJSONParser())]
+        
+        self.stdout.write(f'{len(body):,} byte response, {rounds} rounds\n')
+        for label, (standard, fast) in (('Render', renders), ('Parse', parses)):
+            self.stdout.write(f'{label + ", DRF":<20} {standard:>10,.0f} /s')
+            self.stdout.write(f'{label + ", fast JSON":<20} {fast:>10,.0f} /s  ({fast / standard:.1f}x)')
@@ -0,0 +1,35 @@
+"""
+Middleware for webhooks.
+"""
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.utils.functional import SimpleLazyObject
+
+from .accounts import resolve_request_account
+
+
+class AccountMiddleware:
+    """
+    Attach the account a request acts for as request.account.
+    
+    Resolved lazily, on first use, so it sees users authenticated by DRF
+    inside the view (DRF sets the user on the underlying request) and
+    requests that never need an account (such as redirects) cost nothing.
+    Works in both sync and async middleware chains.
+    """
+    sync_capable = True
+    async_capable = True
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+    
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        request.account = SimpleLazyObject(lambda: resolve_request_account(request))
+        return self.get_response(request)
+    
+    async def __acall__(self, request):
+        request.account = SimpleLazyObject(lambda: resolve_request_account(request))
+        return await self.get_response(request)
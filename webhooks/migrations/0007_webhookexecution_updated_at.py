@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('webhooks', '0006_trigram_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='webhookexecution',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
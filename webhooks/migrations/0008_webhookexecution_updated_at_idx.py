@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('webhooks', '0007_webhookexecution_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='webhookexecution',
+            index=models.Index(fields=['webhook', 'updated_at'], name='webhooks_we_webhook_bb9f62_idx'),
+        ),
+    ]
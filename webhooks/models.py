@@ -32,11 +32,11 @@ class Account(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     trz_group_id = models.IntegerField(null=True, blank=True, unique=True)
     trz_admin_user_id = models.IntegerField(null=True, blank=True, unique=True)
-
+    
     class Meta:
         db_table = 'accounts'  # Use existing table
         ordering = ['name']
-
+    
     def __str__(self):
         return self.name
 
@@ -222,6 +222,11 @@ class Webhook(models.Model):
     
     def save(self, *args, **kwargs):
         self.full_clean()
+        # Partial saves (execution results, scheduling) still bump
+        # updated_at, which the API's ETags are derived from
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'updated_at'}
         super().save(*args, **kwargs)
 
 
@@ -248,14 +253,17 @@ class WebhookExecution(models.Model):
     # Retry tracking
     attempt_number = models.IntegerField(default=1, help_text="Current attempt number")
     
-    # Timestamp
+    # Timestamps
     executed_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['-executed_at']
         indexes = [
             models.Index(fields=['webhook', '-executed_at']),
             models.Index(fields=['status']),
+            # Conditional GET validators (count and latest updated_at per webhook)
+            models.Index(fields=['webhook', 'updated_at']),
         ]
     
     def __str__(self):
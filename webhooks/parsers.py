@@ -0,0 +1,27 @@
+"""
+DRF parser backed by webhooks.fastjson.
+"""
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.utils import json
+
+from . import fastjson
+from .renderers import FastJSONRenderer
+
+
+class FastJSONParser(JSONParser):
+    """JSONParser decoding UTF-8 bodies through the fast JSON backend"""
+    renderer_class = FastJSONRenderer
+    
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if encoding.lower() not in ('utf-8', 'utf8'):
+            return super().parse(stream, media_type, parser_context)
+        
+        try:
+            parse_constant = json.strict_constant if self.strict else None
+            return fastjson.loads(stream.read(), parse_constant=parse_constant)
+        except ValueError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
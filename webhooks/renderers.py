@@ -0,0 +1,30 @@
+"""
+DRF renderer backed by webhooks.fastjson.
+"""
+from rest_framework.renderers import JSONRenderer
+
+from . import fastjson
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer producing the same bytes through the fast JSON backend.
+    Indented output (the browsable API, 'indent=' media type parameters)
+    and non-default COMPACT_JSON / UNICODE_JSON settings are left to
+    JSONRenderer.
+    """
+    
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if indent is not None or not self.compact or self.ensure_ascii:
+            return super().render(data, accepted_media_type, renderer_context)
+        
+        ret = fastjson.dumps(data, default=self.encoder_class().default, allow_nan=not self.strict)
+        
+        # Escaped as JSONRenderer does, so the output is a strict javascript subset
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
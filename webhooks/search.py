@@ -0,0 +1,68 @@
+"""
+Substring search backed by pg_trgm.
+
+On PostgreSQL, ``icontains`` filters on the indexed columns are served by
+the gin_trgm_ops indexes created in the migrations, and results are ranked
+by trigram word similarity. Other databases (SQLite test runs) fall back
+to a plain ``icontains`` scan without ranking.
+"""
+from functools import reduce
+from operator import or_
+
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db import connections
+from django.db.models import Q
+from django.db.models.functions import Greatest
+from rest_framework import filters
+
+
+def supports_trigram_search(queryset):
+    """Whether the queryset's database can use pg_trgm"""
+    return connections[queryset.db].vendor == 'postgresql'
+
+
+def trigram_search(queryset, fields, terms):
+    """
+    Filter ``queryset`` to rows where, for every search term, at least one
+    of ``fields`` contains it. ``terms`` is a single term or a list.
+    On PostgreSQL the best match across fields is ranked first.
+    """
+    if isinstance(terms, str):
+        terms = [terms]
+    terms = [term.strip() for term in terms if term.strip()]
+    if not terms:
+        return queryset
+    
+    for term in terms:
+        queryset = queryset.filter(
+            reduce(or_, (Q(**{f'{field}__icontains': term}) for field in fields))
+        )
+    
+    if not supports_trigram_search(queryset):
+        return queryset
+    
+    phrase = ' '.join(terms)
+    similarities = [TrigramWordSimilarity(phrase, field) for field in fields]
+    rank = similarities[0] if len(similarities) == 1 else Greatest(*similarities)
+    ordering = queryset.query.order_by or queryset.model._meta.ordering
+    return queryset.annotate(search_rank=rank).order_by('-search_rank', *ordering)
+
+
+class TrigramSearchFilter(filters.SearchFilter):
+    """
+    SearchFilter that uses trigram_search for plain search_fields.
+    Fields with SearchFilter prefixes ('^', '=', '@', '$') keep the
+    default behaviour.
+    """
+    
+    def filter_queryset(self, request, queryset, view):
+        search_fields = self.get_search_fields(view, request)
+        search_terms = self.get_search_terms(request)
+        
+        if not search_fields or not search_terms:
+            return queryset
+        
+        if any(field[0] in self.lookup_prefixes for field in search_fields):
+            return super().filter_queryset(request, queryset, view)
+        
+        return trigram_search(queryset, search_fields, search_terms)
@@ -5,6 +5,8 @@ from rest_framework import serializers
 from django.contrib.auth.models import User
 from django.utils import timezone
 from croniter import croniter
+from .accounts import resolve_request_account
+from .fieldsets import SparseFieldsetSerializerMixin
 from .models import Webhook, WebhookExecution, WebhookFolder, Account
 
 
@@ -30,7 +32,7 @@ class AccountSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at', 'updated_at']
 
 
-class WebhookFolderSerializer(serializers.ModelSerializer):
+class WebhookFolderSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     """Serializer for webhook folders."""
     
     webhook_count = serializers.ReadOnlyField()
@@ -75,7 +77,7 @@ class WebhookFolderSerializer(serializers.ModelSerializer):
         return data
 
 
-class WebhookExecutionSerializer(serializers.ModelSerializer):
+class WebhookExecutionSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     """Serializer for webhook execution history."""
     
     class Meta:
@@ -87,7 +89,7 @@ class WebhookExecutionSerializer(serializers.ModelSerializer):
         read_only_fields = fields
 
 
-class WebhookSerializer(serializers.ModelSerializer):
+class WebhookSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     """Serializer for webhook CRUD operations."""
     
     execution_count = serializers.SerializerMethodField()
@@ -182,11 +184,12 @@ class WebhookSerializer(serializers.ModelSerializer):
         if account_id:
             validated_data['account_id'] = account_id
         elif 'account' not in validated_data:
-            # Fallback: check if user is acting on behalf of an account
-            # (stored in request session/context for superusers)
+            # Fallback: the account selected with X-Account-Id (superusers)
+            # or matching the user's email; never an arbitrary account
             request = self.context.get('request')
-            if request and hasattr(request, 'selected_account_id'):
-                validated_data['account_id'] = request.selected_account_id
+            account = resolve_request_account(request) if request else None
+            if account:
+                validated_data['account_id'] = account.pk
         
         webhook = super().create(validated_data)
         
@@ -233,7 +236,7 @@ class WebhookCreateSerializer(WebhookSerializer):
                            'execution_count', 'last_execution_status', 'created_at', 'updated_at']
 
 
-class WebhookListSerializer(serializers.ModelSerializer):
+class WebhookListSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     """Lightweight serializer for listing webhooks."""
     
     execution_count = serializers.SerializerMethodField()
@@ -8,11 +8,22 @@ from celery import shared_task
 from django.utils import timezone
 from django.conf import settings
 from django_celery_beat.models import PeriodicTask, CrontabSchedule
-import json
+from . import fastjson
 
 logger = logging.getLogger(__name__)
 
 
+def _report_failure(webhook, reason):
+    """
+    Count a webhook that failed its last attempt towards the account's
+    Slack failure digest.
+    """
+    if not webhook.account_id:
+        return
+    from slack_integration.alerts import record_webhook_failure
+    record_webhook_failure(webhook.account_id, webhook.url, webhook.name, reason)
+
+
 @shared_task(bind=True, max_retries=None)
 def execute_webhook(self, webhook_id, attempt_number=1):
     """
@@ -104,6 +115,8 @@ def execute_webhook(self, webhook_id, attempt_number=1):
                     countdown=delay
                 )
             else:
+                _report_failure(webhook, f"HTTP {response.status_code}")
+                
                 # CRITICAL FIX: Deactivate one-time webhooks after all retries exhausted
                 if webhook.schedule_type == 'once':
                     webhook.is_active = False
@@ -133,6 +146,8 @@ def execute_webhook(self, webhook_id, attempt_number=1):
                 countdown=delay
             )
         else:
+            _report_failure(webhook, execution.error_message)
+            
             # CRITICAL FIX: Deactivate one-time webhooks after all retries exhausted
             if webhook.schedule_type == 'once':
                 webhook.is_active = False
@@ -156,6 +171,8 @@ def execute_webhook(self, webhook_id, attempt_number=1):
                 countdown=delay
             )
         else:
+            _report_failure(webhook, type(e).__name__)
+            
             # CRITICAL FIX: Deactivate one-time webhooks after all retries exhausted
             if webhook.schedule_type == 'once':
                 webhook.is_active = False
@@ -254,7 +271,7 @@ def schedule_webhook(webhook_id):
                 defaults={
                     'crontab': schedule,
                     'task': 'webhooks.tasks.execute_webhook',
-                    'args': json.dumps([webhook_id]),
+                    'args': fastjson.dumps([webhook_id]).decode(),
                     'enabled': webhook.is_active,
                 }
             )
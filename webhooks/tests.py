@@ -1,13 +1,33 @@
 """
 Tests for webhooks app.
 """
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from collections import OrderedDict
 from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO
+import uuid
+from unittest import mock
+from kombu import serialization
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APITestCase
 from rest_framework import status
-from .models import Webhook, WebhookExecution
+from rest_framework.authtoken.models import Token
+from .accounts import account_for_user
+from . import fastjson
+from .authentication import CachedTokenAuthentication, clear_local_token_cache
+from .conditional import ConditionalGetMixin
+from .models import Account, Webhook, WebhookExecution, WebhookFolder
+from .parsers import FastJSONParser
+from .renderers import FastJSONRenderer
 
 
 class WebhookModelTest(TestCase):
@@ -92,6 +112,29 @@ class WebhookAPITest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data['results']), 1)
     
+    def test_search_webhooks(self):
+        """Test searching webhooks by name and url."""
+        Webhook.objects.create(
+            user=self.user,
+            name='Stripe sync',
+            url='https://example.com/stripe',
+            schedule_type='recurring',
+            cron_expression='*/5 * * * *'
+        )
+        Webhook.objects.create(
+            user=self.user,
+            name='Nightly report',
+            url='https://reports.example.com/run',
+            schedule_type='recurring',
+            cron_expression='0 0 * * *'
+        )
+        response = self.client.get('/api/webhooks/', {'search': 'stripe'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([w['name'] for w in response.data['results']], ['Stripe sync'])
+        
+        response = self.client.get('/api/webhooks/', {'search': 'reports run'})
+        self.assertEqual([w['name'] for w in response.data['results']], ['Nightly report'])
+    
     def test_cancel_webhook(self):
         """Test canceling a webhook."""
         webhook = Webhook.objects.create(
@@ -106,3 +149,342 @@ class WebhookAPITest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         webhook.refresh_from_db()
         self.assertFalse(webhook.is_active)
+
+
+class CachedTokenAuthenticationTest(APITestCase):
+    """Test cached token authentication and its invalidation."""
+    
+    def setUp(self):
+        cache.clear()
+        clear_local_token_cache()
+        self.addCleanup(clear_local_token_cache)
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+    
+    @mock.patch('webhooks.authentication.cache_is_shared', return_value=True)
+    def test_lookups_are_cached(self, shared):
+        """Only the first lookup of a token hits the database."""
+        auth = CachedTokenAuthentication()
+        with self.assertNumQueries(1):
+            user, token = auth.authenticate_credentials(self.token.key)
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertEqual(user.username, 'testuser')
+        self.assertEqual(token.key, self.token.key)
+        
+        with self.assertNumQueries(0):
+            auth.authenticate_credentials(self.token.key)
+        # Served from the shared cache once the in-process copy is gone
+        clear_local_token_cache()
+        with self.assertNumQueries(0):
+            auth.authenticate_credentials(self.token.key)
+    
+    def test_local_memory_cache_is_not_used(self):
+        """A per-process Django cache can't be invalidated, so it is skipped."""
+        auth = CachedTokenAuthentication()
+        auth.authenticate_credentials(self.token.key)
+        clear_local_token_cache()
+        with self.assertNumQueries(1):
+            auth.authenticate_credentials(self.token.key)
+    
+    def test_logout_ends_session(self):
+        """Session-authenticated users are logged out too."""
+        self.client.credentials()
+        self.client.login(username='testuser', password='testpass')
+        self.assertEqual(self.client.get('/api/webhooks/').status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.post('/api/auth/logout/').status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.client.get('/api/webhooks/').status_code, status.HTTP_401_UNAUTHORIZED)
+    
+    def test_logout_revokes_token(self):
+        """Logging out deletes the token and its cached lookup."""
+        self.assertEqual(self.client.get('/api/webhooks/').status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.post('/api/auth/logout/').status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(Token.objects.filter(user=self.user).exists())
+        self.assertEqual(self.client.get('/api/webhooks/').status_code, status.HTTP_401_UNAUTHORIZED)
+    
+    def test_deactivation_revokes_cached_lookup(self):
+        """A deactivated user is rejected straight away."""
+        self.assertEqual(self.client.get('/api/webhooks/').status_code, status.HTTP_200_OK)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/api/webhooks/').status_code, status.HTTP_401_UNAUTHORIZED)
+    
+    @override_settings(TOKEN_EXPIRATION_HOURS=24)
+    def test_expired_tokens_are_rejected_and_rotated(self):
+        """Expired tokens fail authentication; logging in issues a new one."""
+        Token.objects.filter(key=self.token.key).update(created=timezone.now() - timedelta(hours=25))
+        response = self.client.get('/api/webhooks/')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response.data['detail'], 'Token has expired.')
+        
+        self.client.credentials()
+        response = self.client.post('/api/auth/login/', {'username': 'testuser', 'password': 'testpass'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response.data['token'], self.token.key)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {response.data['token']}")
+        self.assertEqual(self.client.get('/api/webhooks/').status_code, status.HTTP_200_OK)
+
+
+class AccountResolutionTest(APITestCase):
+    """Test request-scoped account resolution."""
+    
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass', email='owner@example.com')
+        self.other = Account.objects.create(name='A Other', email='other@example.com')
+        self.account = Account.objects.create(name='Owner', email='owner@example.com')
+        self.client.force_authenticate(user=self.user)
+    
+    def test_account_map_is_cached_and_invalidated(self):
+        """Lookups are cached until an account or user changes."""
+        self.assertEqual(account_for_user(self.user), self.account)
+        with self.assertNumQueries(0):
+            self.assertEqual(account_for_user(self.user), self.account)
+        
+        self.account.email = 'someone-else@example.com'
+        self.account.save()
+        self.other.email = 'owner@example.com'
+        self.other.save()
+        self.assertEqual(account_for_user(self.user), self.other)
+    
+    def test_webhooks_default_to_request_account(self):
+        """Webhooks created without an account belong to the acting account."""
+        data = {
+            'name': 'Account Webhook',
+            'url': 'https://example.com/webhook',
+            'schedule_type': 'recurring',
+            'cron_expression': '0 * * * *',
+        }
+        response = self.client.post('/api/webhooks/', data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Webhook.objects.get().account, self.account)
+    
+    def test_unmatched_users_create_unassigned_webhooks(self):
+        """Users whose email matches no account create unassigned webhooks."""
+        self.user.email = 'nobody@example.com'
+        self.user.save()
+        data = {
+            'name': 'Unassigned Webhook',
+            'url': 'https://example.com/webhook',
+            'schedule_type': 'recurring',
+            'cron_expression': '0 * * * *',
+        }
+        response = self.client.post('/api/webhooks/', data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertIsNone(Webhook.objects.get().account)
+    
+    def test_superuser_selects_account(self):
+        """Superusers act for the account named in X-Account-Id; others can't."""
+        data = {
+            'name': 'Selected Webhook',
+            'url': 'https://example.com/webhook',
+            'schedule_type': 'recurring',
+            'cron_expression': '0 * * * *',
+        }
+        self.client.post('/api/webhooks/', data, format='json', HTTP_X_ACCOUNT_ID=str(self.other.id))
+        self.assertEqual(Webhook.objects.get().account, self.account)
+        
+        self.user.is_superuser = True
+        self.user.save()
+        data['name'] = 'Selected Webhook 2'
+        self.client.post('/api/webhooks/', data, format='json', HTTP_X_ACCOUNT_ID=str(self.other.id))
+        self.assertEqual(Webhook.objects.get(name='Selected Webhook 2').account, self.other)
+
+
+class ConditionalGetTest(APITestCase):
+    """Test ETag validation of polled endpoints."""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='etaguser', password='testpass')
+        self.client.force_authenticate(user=self.user)
+        self.folder = WebhookFolder.objects.create(user=self.user, name='Billing')
+        self.webhook = Webhook.objects.create(
+            user=self.user,
+            folder=self.folder,
+            name='Polled',
+            url='https://example.com/webhook',
+            schedule_type='recurring',
+            cron_expression='*/5 * * * *'
+        )
+        self.execution = WebhookExecution.objects.create(webhook=self.webhook, status='pending')
+    
+    def assertNotModified(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('no-cache', response['Cache-Control'])
+        etag = response['ETag']
+        with self.assertNumQueries(2):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+        return etag
+    
+    def test_default_validators_cover_the_queryset(self):
+        """Without an override, rows are validated by count and updated_at."""
+        validators = ConditionalGetMixin().get_validators(Webhook.objects.all())
+        self.assertEqual(validators, [{'count': 1, 'latest': self.webhook.updated_at}])
+    
+    def test_unchanged_responses_are_not_modified(self):
+        """Lists, details and execution history answer 304 from aggregates alone."""
+        self.assertNotModified('/api/webhooks/')
+        self.assertNotModified(f'/api/webhooks/{self.webhook.id}/')
+        self.assertNotModified(f'/api/webhooks/{self.webhook.id}/executions/')
+        self.assertNotModified('/api/folders/')
+        self.assertNotModified(f'/api/folders/{self.folder.id}/')
+    
+    def test_changes_replace_the_etag(self):
+        """Execution updates, partial saves, bulk moves and folder renames are seen."""
+        url = '/api/webhooks/'
+        
+        def changed(etag):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            return response['ETag']
+        
+        etag = self.assertNotModified(url)
+        self.execution.status = 'success'
+        self.execution.save()
+        etag = changed(etag)
+        
+        self.webhook.is_active = False
+        self.webhook.save(update_fields=['is_active'])
+        etag = changed(etag)
+        
+        self.client.post('/api/webhooks/bulk_move/', {'webhook_ids': [self.webhook.id]}, format='json')
+        etag = changed(etag)
+        
+        self.client.post(
+            f'/api/folders/{self.folder.id}/move_webhooks/', {'webhook_ids': [self.webhook.id]}, format='json'
+        )
+        etag = changed(etag)
+        
+        self.folder.name = 'Invoices'
+        self.folder.save()
+        changed(etag)
+    
+    def test_etags_are_scoped_to_the_user(self):
+        """Another user's request never matches, and missing objects still 404."""
+        etag = self.client.get('/api/webhooks/')['ETag']
+        detail_etag = self.client.get(f'/api/webhooks/{self.webhook.id}/')['ETag']
+        other = User.objects.create_user(username='otheruser', password='testpass')
+        self.client.force_authenticate(user=other)
+        response = self.client.get('/api/webhooks/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        
+        response = self.client.get(f'/api/webhooks/{self.webhook.id}/', HTTP_IF_NONE_MATCH=detail_etag)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get('/api/webhooks/abc/').status_code, status.HTTP_404_NOT_FOUND)
+
+
+class SparseFieldsetTest(APITestCase):
+    """Test ?fields= on the webhook APIs."""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='fieldsuser', password='testpass')
+        self.client.force_authenticate(user=self.user)
+        self.folder = WebhookFolder.objects.create(user=self.user, name='Reports')
+        self.webhook = Webhook.objects.create(
+            user=self.user,
+            folder=self.folder,
+            name='Sparse',
+            url='https://example.com/webhook',
+            schedule_type='recurring',
+            cron_expression='*/5 * * * *',
+            payload={'large': 'x' * 1000}
+        )
+        WebhookExecution.objects.create(webhook=self.webhook, status='success', response_body='ok')
+    
+    def test_webhook_fieldsets_narrow_output_and_columns(self):
+        """Only the requested fields are serialized and loaded."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/api/webhooks/{self.webhook.id}/', {'fields': 'id,name,unknown'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'id': self.webhook.id, 'name': 'Sparse'})
+        selects = [q['sql'] for q in queries.captured_queries if '"webhooks_webhook"."name"' in q['sql']]
+        self.assertTrue(selects)
+        self.assertTrue(all('"payload"' not in sql and '"headers"' not in sql for sql in selects))
+        self.assertFalse(any('webhooks_webhookexecution' in q['sql'] and 'SELECT "' in q['sql']
+                             for q in queries.captured_queries))
+        
+        response = self.client.get('/api/webhooks/', {'fields': 'id,folder_name,execution_count,last_execution_status'})
+        self.assertEqual(response.data['results'], [{
+            'id': self.webhook.id,
+            'folder_name': 'Reports',
+            'execution_count': 1,
+            'last_execution_status': 'success',
+        }])
+    
+    def test_folder_and_execution_fieldsets(self):
+        """Folders and execution history accept fields too; writes ignore it."""
+        response = self.client.get('/api/folders/', {'fields': 'id,full_path,total_webhook_count'})
+        self.assertEqual(response.data['results'], [
+            {'id': self.folder.id, 'full_path': 'Reports', 'total_webhook_count': 1}
+        ])
+        
+        response = self.client.get(f'/api/webhooks/{self.webhook.id}/executions/', {'fields': 'status'})
+        self.assertEqual(response.data['results'], [{'status': 'success'}])
+        
+        response = self.client.patch(
+            f'/api/webhooks/{self.webhook.id}/?fields=id', {'name': 'Renamed'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['name'], 'Renamed')
+
+
+class FastJSONTest(TestCase):
+    """Test the fast JSON renderer, parser and Celery serializer."""
+    
+    def sample(self):
+        return OrderedDict([
+            ('id', 2 ** 70),
+            ('names', ('Zürich', 'line\u2028break', _('Webhooks'))),
+            ('floats', [0.1, 1.0, 1e16, 1e-07, -0.0]),
+            ('when', timezone.now()),
+            ('price', Decimal('9.99')),
+            ('uuid', uuid.UUID('12345678-1234-5678-1234-567812345678')),
+            ('keys', {1: 'int key'}),
+            ('nested', {'empty': [], 'none': None, 'flag': True}),
+        ])
+    
+    def test_renderer_and_parser_match_drf(self):
+        """Output and parsed data are identical to DRF's JSON classes."""
+        data = self.sample()
+        for media_type in (None, 'application/json; indent=4'):
+            self.assertEqual(
+                FastJSONRenderer().render(data, media_type),
+                JSONRenderer().render(data, media_type)
+            )
+        # Without the values orjson can't match, so the fast path is taken
+        for key in ('id', 'floats', 'keys'):
+            data.pop(key)
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+        
+        body = JSONRenderer().render(self.sample())
+        self.assertEqual(FastJSONParser().parse(BytesIO(body)), JSONParser().parse(BytesIO(body)))
+        with self.assertRaises(ParseError):
+            FastJSONParser().parse(BytesIO(b'{"value": NaN}'))
+        
+        big = b'{"payload": {"amount": 123456789012345678901234567890, "neg": -9223372036854775809}}'
+        self.assertEqual(FastJSONParser().parse(BytesIO(big)), JSONParser().parse(BytesIO(big)))
+        self.assertEqual(fastjson.loads(big.decode())['payload']['amount'], 123456789012345678901234567890)
+        
+        for value in (float('nan'), float('inf'), Decimal('NaN')):
+            with self.assertRaises(ValueError):
+                FastJSONRenderer().render({'value': [value, None]})
+        self.assertEqual(fastjson.dumps([float('nan')]), b'[NaN]')
+        
+        with override_settings(JSON_BACKEND='json'):
+            self.assertFalse(fastjson.use_orjson())
+            self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+    
+    def test_celery_serializer_round_trip(self):
+        """Task messages decode the same, including kombu's typed values."""
+        fastjson.register_celery_serializer()
+        message = {'args': [5], 'kwargs': {'when': timezone.now(), 'price': Decimal('1.50')}}
+        content_type, encoding, body = serialization.dumps(message, serializer='json')
+        self.assertEqual(content_type, 'application/json')
+        self.assertEqual(serialization.loads(body, content_type, encoding), message)
+        self.assertEqual(
+            serialization.loads(b'{"args": [1, 2]}', content_type, encoding),
+            {'args': [1, 2]}
+        )
@@ -3,7 +3,7 @@ URL routing for webhooks API.
 """
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import WebhookViewSet, WebhookFolderViewSet, AccountViewSet, custom_login
+from .views import WebhookViewSet, WebhookFolderViewSet, AccountViewSet, custom_login, logout
 
 router = DefaultRouter()
 router.register(r'webhooks', WebhookViewSet, basename='webhook')
@@ -14,4 +14,5 @@ urlpatterns = [
     path('', include(router.urls)),
     path('auth/login/', custom_login, name='api-login'),
     path('auth/token/', custom_login, name='api-token-auth'),  # Keep for backwards compatibility
+    path('auth/logout/', logout, name='api-logout'),
 ]
@@ -6,7 +6,9 @@ from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny
 from rest_framework.authtoken.models import Token
-from django.contrib.auth import authenticate
+from django.contrib.auth import authenticate, logout as end_session
+from django.db.models import Count, Max, Prefetch
+from django.utils import timezone
 from django_filters.rest_framework import DjangoFilterBackend
 from .models import Webhook, WebhookExecution, WebhookFolder, Account
 from .serializers import (
@@ -18,8 +20,15 @@ from .serializers import (
     AccountSerializer,
     UserSerializer
 )
+from .authentication import is_token_expired
+from .conditional import ConditionalGetMixin, aggregate_validator, conditional_response
+from .fieldsets import project_queryset, requested_fields
+from .search import TrigramSearchFilter
 from .tasks import cancel_webhook_schedule
 
+# Actions whose querysets follow the ?fields= sparse fieldset
+FIELDSET_ACTIONS = ('list', 'retrieve')
+
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
@@ -45,6 +54,10 @@ def custom_login(request):
         )
     
     token, created = Token.objects.get_or_create(user=user)
+    if not created and is_token_expired(token.created):
+        # Expired tokens are replaced, not extended
+        token.delete()
+        token = Token.objects.create(user=user)
     user_serializer = UserSerializer(user)
     
     return Response({
@@ -53,6 +66,18 @@ def custom_login(request):
     })
 
 
+@api_view(['POST'])
+def logout(request):
+    """
+    Log out by deleting the API token used for the request and ending
+    the session, if any.
+    """
+    if isinstance(request.auth, Token):
+        Token.objects.filter(key=request.auth.key).delete()
+    end_session(request)
+    return Response(status=status.HTTP_204_NO_CONTENT)
+
+
 class AccountViewSet(viewsets.ReadOnlyModelViewSet):
     """
     ViewSet for account management (superuser only).
@@ -70,7 +95,7 @@ class AccountViewSet(viewsets.ReadOnlyModelViewSet):
     ordering = ['name']
 
 
-class WebhookFolderViewSet(viewsets.ModelViewSet):
+class WebhookFolderViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     """
     ViewSet for folder management.
     
@@ -93,14 +118,35 @@ class WebhookFolderViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         """Filter folders by authenticated user and optionally by account."""
-        queryset = WebhookFolder.objects.filter(user=self.request.user).prefetch_related('subfolders')
+        queryset = WebhookFolder.objects.filter(user=self.request.user)
         
         # Filter by account if provided in query params (for superuser viewing specific account)
         account_id = self.request.query_params.get('account')
         if account_id:
             queryset = queryset.filter(account_id=account_id)
         
-        return queryset
+        fields = requested_fields(self.request) if self.action in FIELDSET_ACTIONS else None
+        if fields is None:
+            return queryset.prefetch_related('subfolders')
+        return project_queryset(
+            queryset,
+            self.get_serializer_class(),
+            fields,
+            columns={'full_path': ('name', 'parent')},
+            prefetches={'subfolders': 'subfolders', 'total_webhook_count': 'subfolders'},
+        )
+    
+    def get_validators(self, queryset):
+        """
+        Folders nest their subfolders, paths and webhook counts, so every
+        folder response is validated against all of the user's folders
+        and the webhooks in them.
+        """
+        user = self.request.user
+        return [
+            aggregate_validator(WebhookFolder.objects.filter(user=user)),
+            aggregate_validator(Webhook.objects.filter(folder__user=user)),
+        ]
     
     @action(detail=True, methods=['post'])
     def move_webhooks(self, request, pk=None):
@@ -119,7 +165,7 @@ class WebhookFolderViewSet(viewsets.ModelViewSet):
             user=request.user
         )
         
-        count = webhooks.update(folder=folder)
+        count = webhooks.update(folder=folder, updated_at=timezone.now())
         
         return Response({
             'detail': f'Moved {count} webhook(s) to "{folder.name}"',
@@ -143,7 +189,7 @@ class WebhookFolderViewSet(viewsets.ModelViewSet):
         })
 
 
-class WebhookViewSet(viewsets.ModelViewSet):
+class WebhookViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     """
     ViewSet for webhook CRUD operations.
     
@@ -158,20 +204,54 @@ class WebhookViewSet(viewsets.ModelViewSet):
     """
     
     permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
+    filter_backends = [DjangoFilterBackend, TrigramSearchFilter]
     filterset_fields = ['folder', 'schedule_type', 'is_active', 'http_method', 'account']
     search_fields = ['name', 'url']
     
     def get_queryset(self):
         """Filter webhooks by authenticated user and optionally by account."""
-        queryset = Webhook.objects.filter(user=self.request.user).prefetch_related('executions')
+        queryset = Webhook.objects.filter(user=self.request.user)
         
         # Filter by account if provided in query params (for superuser viewing specific account)
         account_id = self.request.query_params.get('account')
         if account_id:
             queryset = queryset.filter(account_id=account_id)
         
-        return queryset
+        if self.action == 'executions':
+            # The history is paginated from its own query
+            return queryset
+        
+        fields = requested_fields(self.request) if self.action in FIELDSET_ACTIONS else None
+        if fields is None:
+            return queryset.prefetch_related('executions')
+        
+        # Execution counts and last status need only these columns
+        executions = Prefetch(
+            'executions',
+            queryset=WebhookExecution.objects.only('id', 'webhook', 'status', 'executed_at')
+        )
+        return project_queryset(
+            queryset,
+            self.get_serializer_class(),
+            fields,
+            prefetches={'execution_count': executions, 'last_execution_status': executions},
+        )
+    
+    def get_validators(self, queryset):
+        """
+        Webhooks, the folder and account names shown with them, and
+        their executions (counts and last status).
+        """
+        webhooks = queryset.order_by().values('pk')
+        return [
+            aggregate_validator(
+                queryset,
+                foldered=Count('folder'),
+                folders_latest=Max('folder__updated_at'),
+                accounts_latest=Max('account__updated_at'),
+            ),
+            aggregate_validator(WebhookExecution.objects.filter(webhook__in=webhooks)),
+        ]
     
     def get_serializer_class(self):
         """Return appropriate serializer based on action."""
@@ -218,15 +298,32 @@ class WebhookViewSet(viewsets.ModelViewSet):
         
         Returns paginated list of webhook executions with response details.
         """
+        queryset = self.get_object_queryset()
+        if queryset is None:
+            return self._execution_history(request)
+        executions = WebhookExecution.objects.filter(webhook__in=queryset.order_by().values('pk'))
+        return conditional_response(
+            request,
+            # The webhook's own row, so a deletion shows even without executions
+            [{'count': queryset.count()}, aggregate_validator(executions)],
+            lambda: self._execution_history(request)
+        )
+    
+    def _execution_history(self, request):
         webhook = self.get_object()
         executions = webhook.executions.all()
         
+        fields = requested_fields(request)
+        if fields is not None:
+            executions = project_queryset(executions, WebhookExecutionSerializer, fields)
+        
+        context = self.get_serializer_context()
         page = self.paginate_queryset(executions)
         if page is not None:
-            serializer = WebhookExecutionSerializer(page, many=True)
+            serializer = WebhookExecutionSerializer(page, many=True, context=context)
             return self.get_paginated_response(serializer.data)
         
-        serializer = WebhookExecutionSerializer(executions, many=True)
+        serializer = WebhookExecutionSerializer(executions, many=True, context=context)
         return Response(serializer.data)
     
     @action(detail=True, methods=['post'])
@@ -291,7 +388,7 @@ class WebhookViewSet(viewsets.ModelViewSet):
             user=request.user
         )
         
-        count = webhooks.update(folder=folder)
+        count = webhooks.update(folder=folder, updated_at=timezone.now())
         
         if folder:
             message = f'Moved {count} webhook(s) to "{folder.name}"'